@@ -0,0 +1,168 @@
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+# --- CONFIGURACIÓN ---
+ARCHIVO_CALIBRACION = "calibracion_audio.json"
+VIGENCIA_CALIBRACION = 7 * 24 * 3600   # Segundos que vale un nivel de ruido medido
+
+
+def inicio_proceso():
+    """time.monotonic() en que arrancó el proceso (Linux: /proc); si no se sabe, ahora"""
+    try:
+        with open("/proc/self/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            encendido = float(f.read().split()[0])
+        # Campo 22 (starttime), en ticks desde el arranque del sistema
+        edad = encendido - int(campos[19]) / os.sysconf("SC_CLK_TCK")
+        return time.monotonic() - max(0.0, edad)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic()
+
+
+def esperar_puerto(puerto, host="127.0.0.1", timeout=30.0):
+    """Bloquea hasta que algo acepta conexiones en ``puerto`` (p. ej. el servidor web)"""
+    limite = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, puerto), timeout=0.5).close()
+            return
+        except OSError:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.01)
+
+
+class Arranque:
+    """Inicializaciones en paralelo y tiempo hasta estar listo.
+
+    ``tarea(nombre, funcion)`` lanza cada subsistema (servidor web, modelos,
+    STT, voz...) en su propio hilo y devuelve un Future para quien lo
+    necesite antes. Tras ``lanzadas()``, el arranque queda listo cuando
+    terminan todas las tareas necesarias. Los tiempos se cuentan desde que
+    arrancó el proceso, así que incluyen los imports.
+    """
+
+    def __init__(self, inicio=None):
+        self.inicio = inicio_proceso() if inicio is None else inicio
+        self.listo = threading.Event()
+        self.segundos_listo = None
+        self._tareas = {}           # nombre -> {'desde', 'hasta', 'necesaria', 'error'}
+        self._pendientes = 0
+        self._lanzadas = False
+        self._al_estar_listo = []
+        self._lock = threading.Lock()
+
+    def tarea(self, nombre, funcion, *args, necesaria=True):
+        futuro = Future()
+        with self._lock:
+            self._tareas[nombre] = {'desde': time.monotonic() - self.inicio, 'hasta': None,
+                                    'necesaria': necesaria, 'error': None}
+            self._pendientes += necesaria
+
+        def ejecutar():
+            try:
+                futuro.set_result(funcion(*args))
+            except Exception as e:
+                print(f"Error arrancando {nombre}: {e}")
+                self._tareas[nombre]['error'] = str(e)
+                futuro.set_exception(e)
+            finally:
+                self._terminar(nombre)
+
+        threading.Thread(target=ejecutar, daemon=True, name=f"arranque-{nombre}").start()
+        return futuro
+
+    def lanzadas(self, al_estar_listo=None):
+        """No habrá más tareas: en cuanto acaben las necesarias, listo"""
+        with self._lock:
+            if al_estar_listo is not None:
+                self._al_estar_listo.append(al_estar_listo)
+            self._lanzadas = True
+        self._comprobar()
+        return self
+
+    def _terminar(self, nombre):
+        with self._lock:
+            tarea = self._tareas[nombre]
+            tarea['hasta'] = time.monotonic() - self.inicio
+            self._pendientes -= tarea['necesaria']
+        self._comprobar()
+
+    def _comprobar(self):
+        with self._lock:
+            if not self._lanzadas or self._pendientes or self.listo.is_set():
+                return
+            self.segundos_listo = time.monotonic() - self.inicio
+            self.listo.set()
+            avisos = list(self._al_estar_listo)
+        for aviso in avisos:
+            try:
+                aviso(self)
+            except Exception as e:
+                print(f"Error al terminar el arranque: {e}")
+
+    # --- CONSULTA ---
+    def duraciones(self):
+        """{tarea: segundos desde el inicio del proceso hasta que terminó}, más 'listo'"""
+        with self._lock:
+            tiempos = {n: t['hasta'] for n, t in self._tareas.items() if t['hasta'] is not None}
+        if self.segundos_listo is not None:
+            tiempos['listo'] = self.segundos_listo
+        return tiempos
+
+    def resumen(self):
+        """Una línea para la consola: 'Listo en 2.41 s (servidor_web 0.62 s, stt 2.40 s, ...)'"""
+        partes = ", ".join(f"{n} {s:.2f} s" for n, s in self.duraciones().items() if n != 'listo')
+        return f"Listo en {self.segundos_listo:.2f} s ({partes})"
+
+    def informe(self):
+        with self._lock:
+            return {
+                'listo': self.listo.is_set(),
+                'segundos_listo': self.segundos_listo,
+                'tareas': {n: dict(t) for n, t in self._tareas.items()},
+            }
+
+
+# --- CALIBRACIÓN DEL MICRO ---
+def cargar_calibracion(clave, ruta=ARCHIVO_CALIBRACION, vigencia=VIGENCIA_CALIBRACION):
+    """Nivel de ruido guardado para ``clave`` (micro y frecuencia), o None si no hay o caducó"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            entrada = json.load(f).get(clave)
+    except (OSError, ValueError):
+        return None
+    if not entrada or time.time() - entrada.get('instante', 0) > vigencia:
+        return None
+    return entrada.get('valor')
+
+
+def guardar_calibracion(clave, valor, ruta=ARCHIVO_CALIBRACION):
+    if valor is None:
+        return
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        datos = {}
+    datos[clave] = {'valor': float(valor), 'instante': time.time()}
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+def calibrar_reconocedor(recognizer, source, clave, duracion=1):
+    """``adjust_for_ambient_noise`` solo si no hay una calibración reciente guardada"""
+    umbral = cargar_calibracion(clave)
+    if umbral is not None:
+        recognizer.energy_threshold = umbral
+        return False
+    recognizer.adjust_for_ambient_noise(source, duration=duracion)
+    guardar_calibracion(clave, recognizer.energy_threshold)
+    return True
@@ -1,265 +1,877 @@
 import asyncio
-import ollama
+import atexit
 import threading
 import queue
 import re
 import time
 import io
-import base64
-import speech_recognition as sr
-import win32com.client
-import pythoncom
-from mss import mss
-from PIL import Image
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+import tempfile
+from functools import partial
+from flask import Flask, render_template, jsonify, request, Response, abort
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 
-import json
 import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from cache_vision import CacheVision, calcular_dhash
+from memoria import AlmacenMemoria
+from memoria_vectorial import IndiceVectorial, embeddings_ollama, MODELO_EMBEDDINGS
+from contexto import VentanaContexto
+from prompts import ensamblar_mensajes
+from modelos import GestorModelos
+from servicio_ollama import obtener_servicio, GeneracionCancelada
+from captura import CapturadorPantalla
+from ocr import LectorPantalla, crear_motor_ocr
+from vigilante import VigilantePantalla
+from frames import AlmacenFrames
+from streaming_ui import CanalStreaming
+from stt import crear_motor
+from audio_entrada import EscuchaContinua, FuenteMicrofono, DetectorVoz, leer_wav, remuestrear
+from tts import crear_motor_tts, VozEnCola, CacheAudio, SalidaRemota
+from segmentador import SegmentadorFrases
+from sesiones import Sesion, GestorSesiones, id_seguro
+from planificador import PlanificadorOllama, MicroLotes, Saturado
+from metricas import RegistroMetricas, TrazaTurno, LIMITES_TOKENS_SEGUNDO
+from arranque import Arranque, esperar_puerto, cargar_calibracion, guardar_calibracion
 
 # --- CONFIGURACIÓN ---
 MODELO_VISION = "moondream:1.8b"   # El que tiene ojos
 MODELO_CHAT = "llama3.2:3b"        # El que habla bien español
 NOMBRE_IA = "Raid"
 IDIOMA = "es-ES"
+UMBRAL_CACHE_VISION = 6            # Bits de diferencia tolerados entre pantallas
+TTL_CACHE_VISION = 300             # Segundos que vale una descripción
+ARCHIVO_CACHE_VISION = "cache_vision.json"  # None para no persistir
+ARCHIVO_INDICE = "memoria_vectorial"  # Prefijo de los ficheros del índice de recuerdos
+TOP_K_RECUERDOS = 8
+PRESUPUESTO_RECUERDOS = 200        # Tokens máximos de recuerdos en el system prompt
+PRESUPUESTO_HISTORIAL = 600        # Tokens de historial literal; lo anterior se resume
+KEEP_ALIVE = {MODELO_VISION: "30m", MODELO_CHAT: "60m"}  # Tiempo residente en Ollama
+BARGE_IN = True                    # Hablar encima de Raid corta su respuesta
+FACTOR_UMBRAL_BARGE_IN = 2.5       # Energía extra exigida al VAD mientras Raid habla
+MOTOR_STT = "vosk"                 # 'vosk' / 'whisper' (locales) o 'google' (red)
+MOTOR_TTS = "auto"                 # 'auto', 'sapi' (Windows), 'piper', 'espeak' o 'pyttsx3'
+REGION_CAPTURA = None              # None: monitores enteros, 'ventana': ventana activa, o dict left/top/width/height
+MONITORES_CAPTURA = 1              # Índice de mss (1: principal), lista de índices o 'todos'
+VIGILAR_PANTALLA = False           # Describir la pantalla en segundo plano cuando cambia (sesión local)
+INTERVALO_VIGILANCIA = 2.0         # Segundos entre muestras del vigilante
+PRESUPUESTO_CPU_VIGILANCIA = 0.05  # Fracción de un núcleo que puede gastar el muestreo
+MOTOR_OCR = "tesseract"            # Lee el texto de la pantalla a resolución real; None: solo visión
+MIN_FRACCION_IMAGEN = 0.1          # Con menos pantalla que no sea texto, no se llama al modelo de visión
+
+PUERTO_WEB = 5000
+
+# --- SESIONES ---
+SESION_LOCAL = "local"             # La del micro, altavoces y pantalla de esta máquina
+AUDIO_LOCAL = True                 # False: servidor sin micro/altavoces (solo clientes remotos)
+SESION_POR_DEFECTO = SESION_LOCAL  # Conexiones sin ?usuario=: a la local, o None para una sesión propia
+CARPETA_SESIONES = "sesiones"      # Memoria e índice de cada usuario remoto
+VOZ_REMOTA = True                  # Enviar la voz sintetizada a los clientes remotos
+MAX_TURNOS_SIMULTANEOS = 16        # Turnos en vuelo (la mayoría esperando al planificador)
+MAX_SUBIDA = 8 * 1024 * 1024       # Bytes máximos por audio o captura subidos
+MAX_OLLAMA_SIMULTANEAS = 3         # Peticiones a la vez contra el Ollama compartido
+LIMITES_MODELO = {MODELO_VISION: 1, MODELO_CHAT: 2}  # Y por modelo (el resto sin límite propio)
+MAX_LOTE_APRENDIZAJE = 4           # Turnos que se analizan juntos para aprender del usuario
+ESPERA_LOTE_APRENDIZAJE = 20.0     # Segundos máximos que un turno espera a su lote
 
 # --- INICIALIZACIÓN WEB ---
+# Los tiempos de arranque cuentan desde que empezó el proceso (imports incluidos)
+arranque = Arranque()
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', max_http_buffer_size=MAX_SUBIDA)
+
+# --- MODELOS RESIDENTES ---
+servicio_ollama = obtener_servicio()
+# Histogramas de latencia por etapa y de Ollama, servidos en /metrics
+metricas = RegistroMetricas()
+metricas.describir('raid_etapa_segundos', "Duración o latencia de cada etapa del turno")
+metricas.describir('raid_ollama_segundos', "Tiempos que informa Ollama (carga, prompt, eval)")
+metricas.describir('raid_ollama_tokens_por_segundo', "Velocidad de generación según Ollama", LIMITES_TOKENS_SEGUNDO)
+gestor_modelos = GestorModelos(KEEP_ALIVE, metricas=metricas)
+# Un solo Ollama para todas las sesiones: huecos limitados por modelo, primero
+# el chat interactivo, luego la visión y al final el aprendizaje de fondo
+planificador = PlanificadorOllama(MAX_OLLAMA_SIMULTANEAS, LIMITES_MODELO)
+metricas.medidor('raid_planificador_pendientes', lambda: {
+    (('prioridad', p),): d['pendientes'] for p, d in planificador.estadisticas()['por_prioridad'].items()
+}, "Peticiones a Ollama esperando hueco")
+metricas.medidor('raid_planificador_activos', lambda: planificador.estadisticas()['activos'],
+                 "Peticiones a Ollama en curso")
+metricas.medidor('raid_arranque_segundos', lambda: {
+    (('tarea', t),): s for t, s in arranque.duraciones().items()
+}, "Segundos desde el inicio del proceso hasta que cada subsistema quedó listo")
+
+# --- PIPELINE DE ETAPAS ---
+# Las etapas independientes de un turno se solapan: la visión arranca en cuanto
+# se detecta voz (en paralelo con el reconocimiento) y el aprendizaje se hace
+# fuera del camino crítico, sin retrasar la siguiente escucha.
+pool_etapas = ThreadPoolExecutor(max_workers=4, thread_name_prefix="raid-etapa")
+pool_aprendizaje = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raid-memoria")
+pool_stt = ThreadPoolExecutor(max_workers=2, thread_name_prefix="raid-stt")
+pool_turnos = ThreadPoolExecutor(max_workers=MAX_TURNOS_SIMULTANEOS, thread_name_prefix="raid-turno")
+pool_ocr = ThreadPoolExecutor(max_workers=2, thread_name_prefix="raid-lectura")  # OCR en paralelo con la visión
 
-# --- PERSISTENCIA DE MEMORIA ---
+# --- PERSISTENCIA DE MEMORIA (POR SESIÓN) ---
 ARCHIVO_MEMORIA = "memoria_ia.json"
 
-def cargar_memoria():
-    if os.path.exists(ARCHIVO_MEMORIA):
-        with open(ARCHIVO_MEMORIA, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {
-        "perfil_usuario": "Usuario nuevo",
-        "historial_corto": [],
-        "datos_aprendidos": []
-    }
+def en_segundo_plano(funcion, *args):
+    """Ejecuta con prioridad de aprendizaje todo lo que pida al planificador"""
+    with planificador.con_prioridad('aprendizaje'):
+        return funcion(*args)
+
+def embeddings_planificados(sesion_id):
+    """Embeddings que también pasan por el planificador (comparten el mismo Ollama)"""
+    def embeber(textos):
+        # Prioridad del hilo que los pide: chat al buscar recuerdos, aprendizaje al indexar
+        with planificador.turno(sesion_id, modelo=MODELO_EMBEDDINGS):
+            return embeddings_ollama(textos)
+    return embeber
+
+def resumir_historial(sesion_id, resumen_anterior, mensajes):
+    """Pliega mensajes antiguos en el resumen acumulado (nunca en el camino de la respuesta)"""
+    charla = "\n".join(f"{m['role']}: {m['content']}" for m in mensajes)
+    with planificador.turno(sesion_id, modelo=MODELO_CHAT, prioridad='aprendizaje'):
+        resp = servicio_ollama.chat(
+            model=MODELO_CHAT,
+            messages=[{'role': 'user', 'content': (
+                f"Resumen previo de la conversación: {resumen_anterior or '(vacío)'}\n"
+                f"Nuevos mensajes:\n{charla}\n"
+                "Escribe un resumen actualizado en español, en 3 frases como máximo, "
+                "con lo importante sobre el usuario y los temas tratados."
+            )}],
+            keep_alive=gestor_modelos.keep_alive(MODELO_CHAT)
+        )
+    return resp['message']['content'].strip()
+
+def crear_sesion(id, efimera=False):
+    """Memoria, índice, ventana de contexto, canal y voz propios de una sesión"""
+    local = id == SESION_LOCAL
+    if local:
+        # La sesión local conserva los ficheros de siempre
+        carpeta, ruta_memoria, ruta_indice, ruta_cache = None, ARCHIVO_MEMORIA, ARCHIVO_INDICE, ARCHIVO_CACHE_VISION
+    else:
+        carpeta = tempfile.mkdtemp(prefix="raid-") if efimera else os.path.join(CARPETA_SESIONES, id)
+        os.makedirs(carpeta, exist_ok=True)
+        ruta_memoria = os.path.join(carpeta, "memoria_ia.json")
+        ruta_indice = os.path.join(carpeta, "memoria_vectorial")
+        ruta_cache = None if efimera or not ARCHIVO_CACHE_VISION else os.path.join(carpeta, "cache_vision.json")
 
-def guardar_memoria(memoria):
-    with open(ARCHIVO_MEMORIA, 'w', encoding='utf-8') as f:
-        json.dump(memoria, f, ensure_ascii=False, indent=4)
+    # Carga la instantánea + log; migra un memoria_ia.json antiguo en el primer arranque
+    almacen = AlmacenMemoria(ruta_memoria)
+    almacen.cargar()
+    sala = f"sesion:{id}"
+    sesion = Sesion(
+        id, almacen,
+        indice=IndiceVectorial(ruta_indice, funcion_embedding=embeddings_planificados(id)),
+        ventana=VentanaContexto(almacen, partial(resumir_historial, id), presupuesto_tokens=PRESUPUESTO_HISTORIAL),
+        # Respuestas parciales: solo deltas, agrupados cada ~40 ms y solo a esta sesión
+        canal=CanalStreaming(lambda evento, datos, to=None: socketio.emit(evento, datos, to=to or sala)),
+        emitir=socketio.emit,
+        cache_vision=CacheVision(umbral=UMBRAL_CACHE_VISION, ttl=TTL_CACHE_VISION, ruta=ruta_cache),
+        frames=AlmacenFrames(),
+        carpeta=carpeta, efimera=efimera,
+        remota=not (local and AUDIO_LOCAL)
+    )
+    if sesion.remota and VOZ_REMOTA:
+        pool_etapas.submit(iniciar_voz, sesion, SalidaRemota(sesion.emitir))
+    # Lo que quede por aprender se hace antes de cerrar la memoria (o se tira si es efímera)
+    sesion.al_cerrar.append(lambda s: lotes_aprendizaje.vaciar(s.id, descartar=s.efimera))
+    pool_aprendizaje.submit(en_segundo_plano, indexar_memoria_existente, sesion)
+    return sesion
 
-memoria_global = cargar_memoria()
+gestor_sesiones = GestorSesiones(crear_sesion)
 
-# --- ESTADO GLOBAL ---
-cola_voz = queue.Queue()
-esta_hablando = threading.Event()
+def indexar_memoria_existente(sesion):
+    """Primer arranque con índice: indexa los datos y charlas ya guardados"""
+    if len(sesion.indice):
+        return
+    historial = sesion.memoria['historial_corto']
+    charlas = [f"Usuario: {u['content']} / {NOMBRE_IA}: {a['content']}"
+               for u, a in zip(historial[::2], historial[1::2])]
+    try:
+        sesion.indice.agregar_varios(sesion.memoria['datos_aprendidos'] + charlas)
+    except Exception as e:
+        print(f"Error indexando memoria: {e}")
 
-def update_ui(state=None, msg=None, role='ai', image=None, is_partial=False):
-    """Envia actualizaciones en tiempo real a la interfaz web"""
+def recuperar_recuerdos(sesion, prompt, contexto_visual):
+    """Solo los recuerdos relevantes para este turno, dentro del presupuesto de tokens"""
     try:
-        socketio.emit('update_status', {
-            'state': state,
-            'msg': msg,
-            'role': role,
-            'image': image,
-            'is_partial': is_partial
-        })
-    except: pass
+        return sesion.indice.buscar(f"{prompt} {contexto_visual}", k=TOP_K_RECUERDOS,
+                                    presupuesto_tokens=PRESUPUESTO_RECUERDOS)
+    except Exception as e:
+        print(f"Error recuperando recuerdos: {e}")
+        return sesion.memoria['datos_aprendidos'][-3:]
+
+# --- INTERFAZ ---
+def update_ui(sesion, state=None, msg=None, role='ai', frame=None, is_partial=False, pantalla=None):
+    """Envia actualizaciones en tiempo real a la interfaz web de esa sesión"""
+    sesion.emitir('update_status', {
+        'state': state,
+        'msg': msg,
+        'role': role,
+        'frame': frame,
+        'pantalla': pantalla,
+        'is_partial': is_partial
+    })
+
+def update_stt_parcial(sesion, texto):
+    """Hipótesis parcial del reconocimiento mientras el usuario habla"""
+    sesion.emitir('stt_partial', {'texto': texto})
+
+def notificar_memoria(sesion):
+    """Avisa a la UI de la sesión de que su memoria ha cambiado"""
+    sesion.emitir('update_memory', {
+        'identity': sesion.memoria['perfil_usuario'],
+        'interests': sesion.memoria['datos_aprendidos']
+    })
+
+def mostrar_etapa(sesion, etapa, segundos, detalles, resumen):
+    """Cada etapa medida llega en vivo al panel de latencias de la sesión"""
+    sesion.emitir('metrica_etapa', {
+        'etapa': etapa,
+        'ms': segundos * 1000,
+        'p50_ms': resumen['p50'] * 1000,
+        'p95_ms': resumen['p95'] * 1000,
+        'detalles': detalles or {}
+    })
+
+def nueva_traza(sesion):
+    return TrazaTurno(metricas, al_registrar=partial(mostrar_etapa, sesion))
 
 # --- FUNCION: CAPTURA DE PANTALLA ---
-def capturar_pantalla_b64():
-    """Captura y devuelve la imagen optimizada"""
+capturador = CapturadorPantalla(tamano_modelo=(800, 450), tamano_ui=(450, 250), region=REGION_CAPTURA,
+                                monitores=MONITORES_CAPTURA, conservar_completa=bool(MOTOR_OCR))
+
+def url_frame(sesion, jpeg):
+    return f"/frame/{sesion.id}/{sesion.frames.guardar(jpeg)}"
+
+def preparar_pantalla(sesion, captura):
+    """(captura, url de su miniatura, huella) de cada pantalla capturada"""
+    return captura, url_frame(sesion, captura.jpeg_ui), calcular_dhash(captura.imagen)
+
+def capturar_pantalla(sesion, traza):
+    """Captura la ventana activa o los monitores configurados; las miniaturas quedan en /frame/..."""
     try:
-        with mss() as sct:
-            monitor = sct.monitors[1]
-            sct_img = sct.grab(monitor)
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-            
-            # Alta calidad para Ollama (Pero no gigante)
-            img_ollama = img.copy()
-            img_ollama.thumbnail((800, 450))
-            buffer_ollama = io.BytesIO()
-            img_ollama.save(buffer_ollama, format='JPEG', quality=85)
-            raw_bytes = buffer_ollama.getvalue()
-            
-            # Baja calidad para UI (Velocidad)
-            img.thumbnail((450, 250))
-            buffer_ui = io.BytesIO()
-            img.save(buffer_ui, format='JPEG', quality=50)
-            b64_str = base64.b64encode(buffer_ui.getvalue()).decode('utf-8')
-            
-            return raw_bytes, b64_str
+        capturas = capturador.capturar_todas()
+        # Los monitores se capturan en paralelo: cuenta el más lento de cada etapa
+        for etapa in capturas[0].tiempos:
+            traza.registrar(etapa, max(c.tiempos[etapa] for c in capturas))
+        return [preparar_pantalla(sesion, c) for c in capturas]
     except Exception as e:
         print(f"Error captura: {e}")
-        return None, None
+        return []
 
-# --- PROCESADOR DE VOZ ---
-def procsador_voz_thread():
-    pythoncom.CoInitialize()
+def recibir_captura(sesion, imagen):
+    """Pantalla subida por un cliente remoto: pasa a ser la que ve Raid en esa sesión"""
     try:
-        speaker = win32com.client.Dispatch("SAPI.SpVoice")
-        voices = speaker.GetVoices()
-        for i in range(voices.Count):
-            if "Spanish" in voices.Item(i).GetDescription():
-                speaker.Voice = voices.Item(i)
-                break
-        
-        while True:
-            frase = cola_voz.get()
-            if frase is None: break
+        sesion.ultima_captura = [preparar_pantalla(sesion, capturador.procesar_subida(imagen))]
+        update_ui(sesion, frame=sesion.ultima_captura[0][1])
+    except Exception as e:
+        print(f"Error captura subida: {e}")
+
+# --- LECTURA DE TEXTO (OCR) ---
+lector_ocr = None
+ocr_probado = False
+lock_ocr = threading.Lock()
+
+def obtener_lector_ocr():
+    """Lector por teselas compartido; None si no hay motor OCR (entonces solo se usa el modelo de visión)"""
+    global lector_ocr, ocr_probado
+    with lock_ocr:
+        if not ocr_probado and MOTOR_OCR:
+            ocr_probado = True
             try:
-                esta_hablando.set()
-                update_ui(state='speaking')
-                speaker.Speak(frase)
-            except: pass
-            finally:
-                cola_voz.task_done()
-                if cola_voz.empty():
-                    time.sleep(0.4)
-                    esta_hablando.clear()
-                    update_ui(state='idle')
+                lector_ocr = LectorPantalla(crear_motor_ocr(MOTOR_OCR))
+            except Exception as e:
+                print(f"OCR no disponible ({e}), solo modelo de visión.")
+                capturador.conservar_completa = False
+        return lector_ocr
+
+# --- PROCESADOR DE VOZ ---
+cache_audio = None   # Frases sintetizadas, compartidas por todas las sesiones
+lock_voz = threading.Lock()
+
+def obtener_cache_audio():
+    global cache_audio
+    with lock_voz:
+        if cache_audio is None:
+            cache_audio = CacheAudio(crear_motor_tts(MOTOR_TTS))
+            # Las frases típicas quedan sintetizadas de antemano
+            cache_audio.precalentar()
+        return cache_audio
+
+def al_empezar_a_hablar(sesion):
+    if sesion.traza is not None:
+        sesion.traza.marcar('primer_audio')   # Solo cuenta la primera vez
+    if not sesion.esta_hablando.is_set():
+        sesion.esta_hablando.set()
+        sesion.voz_libre.clear()
+        update_ui(sesion, state='speaking')
+
+def al_terminar_de_hablar(sesion):
+    time.sleep(0.4)
+    if sesion.cola_voz.unfinished_tasks == 0:
+        sesion.esta_hablando.clear()
+        sesion.voz_libre.set()
+        update_ui(sesion, state='idle')
+
+def iniciar_voz(sesion, salida=None):
+    """VozEnCola de la sesión: sintetiza la siguiente frase mientras suena la actual"""
+    try:
+        cache = obtener_cache_audio()
+        sesion.voz = VozEnCola(cache.motor, sesion.cola_voz, cache=cache, salida=salida,
+                               al_hablar=partial(al_empezar_a_hablar, sesion),
+                               al_callar=partial(al_terminar_de_hablar, sesion)).iniciar()
     except Exception as e:
         print(f"Error voz: {e}")
 
-# --- TRABAJADOR DE IA CON MEMORIA ---
-def ai_worker():
-    global memoria_global
-    print("Iniciando IA Híbrida con Memoria...")
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-    
-    with mic as source:
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-    
+def decir(sesion, frase):
+    if sesion.voz is not None:
+        sesion.cola_voz.put(frase)
+
+# --- ETAPAS DEL TURNO ---
+def describir_imagen(sesion, jpeg, prioridad, cancelacion=None):
+    """Llamada al modelo de visión (pasa por el planificador); devuelve la respuesta entera"""
+    with planificador.turno(sesion.id, modelo=MODELO_VISION, prioridad=prioridad, cancelacion=cancelacion):
+        return servicio_ollama.chat(
+            model=MODELO_VISION,
+            messages=[{'role': 'user', 'content': 'Describe briefly the key elements on screen.', 'images': [jpeg]}],
+            keep_alive=gestor_modelos.keep_alive(MODELO_VISION)
+        )
+
+def describir_pantalla(sesion, jpeg, huella, completa, prioridad, cancelacion=None, traza=None):
+    """Descripción de la pantalla para el prompt.
+
+    Con OCR, el texto se lee a resolución real en las teselas con texto
+    (en paralelo con la visión) y moondream solo ve el recorte de lo que no
+    es texto; si casi todo es texto, ni se le llama. La cache de visión guarda
+    solo la descripción de moondream: el texto se relee siempre, y la cache
+    por tesela del lector hace que eso cueste solo las zonas que cambiaron.
+    """
+    # Sin traza (vigilante) los tiempos no se mezclan con los de los turnos
+    traza = traza or TrazaTurno(RegistroMetricas())
+    lector = obtener_lector_ocr() if completa is not None else None
+    lectura = None
+    if lector is not None:
+        analisis = lector.analizar(completa)
+        if analisis.caja('texto') is not None:
+            lectura = pool_ocr.submit(lector.leer, analisis)
+        caja = analisis.caja('imagen')
+        if caja is None or analisis.fraccion('imagen') < MIN_FRACCION_IMAGEN:
+            jpeg = None
+        elif analisis.fraccion('texto') > 0:
+            jpeg = capturador.codificar_recorte(completa, caja)
+
+    descripcion = sesion.cache_vision.buscar(huella)
+    if descripcion is not None:
+        print("Pantalla sin cambios, usando descripción en cache.")
+    elif jpeg is not None:
+        print("Analizando imagen...")
+        with traza.span('vision') as detalles:
+            resp = describir_imagen(sesion, jpeg, prioridad, cancelacion)
+            detalles.update(gestor_modelos.registrar(MODELO_VISION, resp, mostrar=prioridad == 'vision'))
+        descripcion = resp['message']['content']
+        sesion.cache_vision.guardar(huella, descripcion)
+
+    if lectura is None:
+        return descripcion or ""
+    with traza.span('ocr') as detalles:
+        texto = lectura.result()
+        detalles['caracteres'] = len(texto)
+    if not texto:
+        return descripcion or ""
+    return f"{descripcion}\nTexto en pantalla:\n{texto}" if descripcion else f"Texto en pantalla:\n{texto}"
+
+def describir_pantallas(sesion, pantallas, prioridad, cancelacion=None, traza=None):
+    """Descripción de una o varias pantallas; con varias, cada una lleva delante su monitor"""
+    partes = []
+    for captura, _, huella in pantallas:
+        descripcion = describir_pantalla(sesion, captura.jpeg_modelo, huella, captura.completa,
+                                         prioridad, cancelacion, traza)
+        partes.append(descripcion if len(pantallas) == 1 else f"{captura.etiqueta()}: {descripcion}")
+    return "\n".join(partes)
+
+def analizar_pantalla(sesion, cancelacion=None, traza=None):
+    """Captura la pantalla y devuelve la descripción del modelo de visión"""
+    traza = traza or TrazaTurno(metricas)
+    # Con el vigilante, la pantalla suele estar ya descrita: ni captura ni visión. Se usa
+    # la que había cuando el usuario empezó a hablar (la traza nace al detectar voz)
+    if sesion.vigilante is not None:
+        observacion = sesion.vigilante.en(time.time() - (time.monotonic() - traza.inicio))
+        if observacion is not None:
+            print("Pantalla ya descrita en segundo plano.")
+            update_ui(sesion, frame=observacion.url_frame)
+            return observacion.descripcion
+
+    # La sesión local mira esta pantalla; las remotas, la última captura que subieron
+    pantallas = capturar_pantalla(sesion, traza) if not sesion.remota else (sesion.ultima_captura or [])
+    if not pantallas:
+        return ""
+    captura = pantallas[0][0]
+    update_ui(sesion, frame=pantallas[0][1], pantalla={**captura.geometria(), 'etiqueta': captura.etiqueta()})
+    # Pantalla casi idéntica a una reciente: se reutiliza la descripción en cache
+    return describir_pantallas(sesion, pantallas, 'vision', cancelacion, traza)
+
+def describir_en_segundo_plano(sesion, capturas):
+    """El vigilante vio una pantalla nueva: se describe con prioridad de fondo y queda en la cache"""
+    pantallas = [preparar_pantalla(sesion, c) for c in capturas]
+    # Prioridad de fondo: nunca retrasa el chat ni la visión de un turno
+    return describir_pantallas(sesion, pantallas, 'aprendizaje'), pantallas[0][1]
+
+def iniciar_vigilante(sesion, intervalo=INTERVALO_VIGILANCIA, presupuesto_cpu=PRESUPUESTO_CPU_VIGILANCIA):
+    """Vigilante de la pantalla de esta máquina (solo tiene sentido en la sesión local)"""
+    sesion.vigilante = VigilantePantalla(capturador, partial(describir_en_segundo_plano, sesion),
+                                         intervalo, presupuesto_cpu).iniciar()
+    return sesion.vigilante
+
+motor_stt = None
+lock_stt = threading.Lock()
+
+def obtener_motor_stt():
+    global motor_stt
+    with lock_stt:
+        if motor_stt is None:
+            motor_stt = crear_motor(MOTOR_STT)
+        return motor_stt
+
+def transcribir_en_vivo(sesion, motor, cola_audio):
+    """Decodifica los fragmentos según llegan y devuelve el texto final de la frase"""
+    sesion_stt = motor.nueva_sesion()
     while True:
-        while esta_hablando.is_set(): time.sleep(0.1)
-        
-        update_ui(state='listening')
-        try:
-            with mic as source:
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
-            
-            update_ui(state='thinking')
-            prompt = recognizer.recognize_google(audio, language=IDIOMA)
-            
-            # Pasos de procesamiento
-            img_raw, img_b64 = capturar_pantalla_b64()
-            
-            # 1. Mostrar prompt del usuario inmediatamente con la imagen
-            update_ui(msg=prompt, role='user', image=img_b64)
-
-            # PASO 1: Analizar imagen (Visión)
-            update_ui(state='thinking')
-            print("Analizando imagen...")
-            vision_resp = ollama.chat(
-                model=MODELO_VISION,
-                messages=[{'role': 'user', 'content': 'Describe briefly the key elements on screen.', 'images': [img_raw]}]
+        pcm = cola_audio.get()
+        if pcm is None:
+            return sesion_stt.finalizar()
+        parcial = sesion_stt.alimentar(pcm)
+        if parcial:
+            update_stt_parcial(sesion, parcial)
+
+def escuchar_frase(sesion, escucha, motor, al_detectar_voz, timeout=None):
+    """Espera a la próxima frase del VAD y la transcribe mientras se habla.
+
+    ``al_detectar_voz()`` devuelve la TrazaTurno del turno que empieza. Sin
+    voz en ``timeout`` segundos lanza ``queue.Empty``.
+    """
+    cola_audio = queue.Queue()
+    futuro_texto = None
+    traza = None
+    try:
+        for pcm in escucha.frase(timeout):
+            if futuro_texto is None:
+                traza = al_detectar_voz()
+                futuro_texto = pool_stt.submit(transcribir_en_vivo, sesion, motor, cola_audio)
+            cola_audio.put(pcm)
+    finally:
+        cola_audio.put(None)
+    if futuro_texto is None:
+        return ""
+    traza.marcar('vad_fin')
+    texto = futuro_texto.result()
+    traza.marcar('stt')      # Lo que tarda el texto final tras callarse el usuario
+    return texto
+
+def transcribir_subida(sesion, datos):
+    """Frase grabada por un cliente remoto: WAV o PCM 16 bits mono con su frecuencia"""
+    traza = nueva_traza(sesion)   # El origen es la llegada de la frase ya terminada
+    try:
+        motor = obtener_motor_stt()
+        if datos.get('wav'):
+            muestras = leer_wav(io.BytesIO(datos['wav']), motor.frecuencia)
+        else:
+            muestras = remuestrear(np.frombuffer(datos['pcm'], dtype=np.int16),
+                                   int(datos.get('frecuencia', motor.frecuencia)), motor.frecuencia)
+        update_ui(sesion, state='thinking')
+        prompt = motor.transcribir(muestras.tobytes())
+        traza.marcar('stt')
+    except Exception as e:
+        print(f"Error audio subido: {e}")
+        prompt = ""
+    if prompt:
+        iniciar_turno(sesion, prompt, traza=traza)
+    else:
+        update_ui(sesion, state='idle')
+
+def aprender_de_turnos(sesion, turnos):
+    """Indexa varios turnos y extrae lo aprendido del usuario con una sola llamada"""
+    inicio = time.monotonic()
+    try:
+        sesion.indice.agregar_varios([f"Usuario: {prompt} / {NOMBRE_IA}: {respuesta}" for prompt, respuesta in turnos])
+        print(f"Actualizando memoria ({len(turnos)} turnos)...")
+        frases = "\n".join(f"- {prompt}" for prompt, _ in turnos)
+        with planificador.turno(sesion.id, modelo=MODELO_CHAT, prioridad='aprendizaje'):
+            resp_aprendizaje = servicio_ollama.chat(
+                model=MODELO_CHAT,
+                messages=[{'role': 'user', 'content': f"Basado en estas frases del usuario:\n{frases}\n¿Qué aprendiste del usuario? Responde con un dato por línea, cada uno de 2 o 3 palabras clave. Si dijo su nombre, añade una línea 'Nombre: [nombre]'."}],
+                keep_alive=gestor_modelos.keep_alive(MODELO_CHAT)
             )
-            contexto_visual = vision_resp['message']['content']
+        datos = []
+        for linea in resp_aprendizaje['message']['content'].splitlines():
+            nueva_info = linea.strip(" -*•\t")
+            if not nueva_info:
+                continue
+            if "Nombre:" in nueva_info:
+                sesion.almacen.fijar_perfil(nueva_info.replace("Nombre:", "").strip())
+            else:
+                sesion.almacen.agregar_dato(nueva_info)
+                datos.append(nueva_info)
+        if datos:
+            sesion.indice.agregar_varios(datos)
+
+        # Los cambios ya están en el log; solo se pide el volcado (en el hilo escritor)
+        sesion.almacen.guardar()
+        notificar_memoria(sesion)
+        sesion.ventana.plegar_si_hace_falta()
+        metricas.observar('raid_etapa_segundos', time.monotonic() - inicio, etapa='aprendizaje')
+    except Exception as e:
+        print(f"Error aprendizaje: {e}")
+
+# Los turnos se acumulan por sesión y se aprenden de varios en varios
+lotes_aprendizaje = MicroLotes(partial(en_segundo_plano, aprender_de_turnos),
+                               MAX_LOTE_APRENDIZAJE, ESPERA_LOTE_APRENDIZAJE)
+
+# --- TURNO EN CURSO Y BARGE-IN ---
+def interrumpir(sesion):
+    """Barge-in: aborta la generación en curso y todo lo que quedaba por decir"""
+    sesion.interrumpir()
+    print(f"Interrumpido por el usuario ({sesion.id}).")
+
+def procesar_turno(sesion, prompt, futuro_vision, cancelacion, traza):
+    """Visión -> recuerdos -> respuesta en streaming -> voz; el aprendizaje queda en segundo plano"""
+    # Tras un barge-in este turno puede seguir deshaciéndose mientras empieza
+    # el siguiente: solo toca su propia generación y su propio stream
+    stream, id_stream = None, None
+    try:
+        # PASO 2: Esperar la descripción visual (normalmente ya en curso)
+        contexto_visual = futuro_vision.result() if futuro_vision else analizar_pantalla(sesion, cancelacion, traza)
+        if cancelacion.is_set():
+            return
+
+        # PASO 3: Generar respuesta con Contexto Histórico
+        update_ui(sesion, state='remembering') # Nuevo estado para la UI
+        recuerdos = recuperar_recuerdos(sesion, prompt, contexto_visual)
+        print("Generando respuesta contextual con Llama...")
 
-            # PASO 2: Generar respuesta con Contexto Histórico
-            update_ui(state='remembering') # Nuevo estado para la UI
-            print("Generando respuesta contextual con Llama...")
-            
-            system_prompt = (
+        # De lo más estable a lo más volátil para reutilizar la caché KV de Ollama
+        mensajes = ensamblar_mensajes(
+            estables=[
                 f"Eres un amigo español llamado {NOMBRE_IA}. Tienes memoria a largo plazo. "
-                f"Lo que has aprendido del usuario: {memoria_global['perfil_usuario']}. "
-                f"Datos adicionales: {', '.join(memoria_global['datos_aprendidos'])}. "
-                f"Contexto visual actual: {contexto_visual}. "
-                f"Responde de forma muy natural y breve (máximo 1 frase)."
-            )
+                f"Responde de forma muy natural y breve (máximo 1 frase).",
+                f"Lo que has aprendido del usuario: {sesion.memoria['perfil_usuario']}.",
+                f"Resumen de charlas anteriores: {sesion.ventana.resumen or 'ninguna'}."
+            ],
+            historial=sesion.ventana.mensajes(), # Lo reciente que cabe en el presupuesto
+            volatiles=[
+                f"[Datos adicionales: {', '.join(recuerdos)}.]" if recuerdos else "",
+                f"[Contexto visual actual: {contexto_visual}.]" if contexto_visual else ""
+            ],
+            prompt=prompt
+        )
 
-            stream = ollama.chat(
+        # El hueco en el planificador se mantiene mientras dura el stream
+        with planificador.turno(sesion.id, modelo=MODELO_CHAT, prioridad='chat', cancelacion=cancelacion):
+            stream = servicio_ollama.chat_stream(
                 model=MODELO_CHAT,
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    *memoria_global['historial_corto'][-6:], # Últimos 6 mensajes
-                    {'role': 'user', 'content': prompt}
-                ],
-                stream=True,
-                options={'num_predict': 80}
+                messages=mensajes,
+                options={'num_predict': 80},
+                keep_alive=gestor_modelos.keep_alive(MODELO_CHAT)
             )
-            
+            if sesion.cancelacion is cancelacion:
+                sesion.generacion = stream
+            if cancelacion.is_set():
+                stream.cancelar()
+                return
+
             full_response = ""
-            sentence_buffer = ""
-            
+            segmentador = SegmentadorFrases()
+
             # Iniciamos el stream en el frontend
-            update_ui(state='thinking', msg="", role='ai', is_partial=True)
+            update_ui(sesion, state='thinking')
+            id_stream = sesion.canal.iniciar()
 
             for chunk in stream:
                 text_chunk = chunk['message']['content']
+                if text_chunk:
+                    traza.marcar('primer_token')
+                if chunk.get('done'):
+                    traza.marcar('ultimo_token', gestor_modelos.registrar(MODELO_CHAT, chunk, mostrar=True))
                 full_response += text_chunk
-                sentence_buffer += text_chunk
-                
-                # Actualizar el mismo mensaje en la UI
-                update_ui(msg=full_response, role='ai', is_partial=True)
-
-                if any(p in text_chunk for p in ['.', '!', '?', ',', '\n']):
-                    if len(sentence_buffer.strip()) > 1:
-                        cola_voz.put(sentence_buffer.strip())
-                        sentence_buffer = ""
-
-            if sentence_buffer.strip():
-                cola_voz.put(sentence_buffer.strip())
-            
-            # --- APRENDIZAJE POST-INTERACCIÓN ---
-            memoria_global['historial_corto'].append({'role': 'user', 'content': prompt})
-            memoria_global['historial_corto'].append({'role': 'assistant', 'content': full_response})
-            
-            # Pedir a Llama que extraiga algo nuevo sobre el usuario (en segundo plano)
-            if len(memoria_global['historial_corto']) % 2 == 0:
-                print("Actualizando memoria...")
-                resp_aprendizaje = ollama.chat(
-                    model=MODELO_CHAT,
-                    messages=[{'role': 'user', 'content': f"Basado en esta charla: '{prompt}', ¿qué aprendiste del usuario? Responde solo con 2 o 3 palabras clave. Si dijo su nombre, responde 'Nombre: [nombre]'."}]
-                )
-                nueva_info = resp_aprendizaje['message']['content'].strip()
-                if "Nombre:" in nueva_info:
-                    memoria_global['perfil_usuario'] = nueva_info.replace("Nombre:", "").strip()
-                else:
-                    memoria_global['datos_aprendidos'].append(nueva_info)
-            
-            guardar_memoria(memoria_global)
-            
-            # Notificar a la UI
-            try:
-                import __main__
-                if hasattr(__main__, 'signal_memory_update'):
-                    __main__.signal_memory_update()
-            except: pass
 
-            update_ui(msg=full_response, role='ai', is_partial=False)
+                # Solo lo nuevo; el canal lo agrupa antes de enviarlo
+                sesion.canal.agregar(text_chunk, id_stream)
+
+                for frase in segmentador.agregar(text_chunk):
+                    if not cancelacion.is_set():
+                        decir(sesion, frase)
+
+        if stream.cancelada or cancelacion.is_set():
+            # El usuario habló encima: lo que quedaba ya no lo va a escuchar nadie
+            sesion.canal.terminar(full_response + "…", id_stream)
+            return
+
+        for frase in segmentador.terminar():
+            decir(sesion, frase)
+
+        sesion.canal.terminar(full_response, id_stream)
+        if sesion.voz is None:
+            update_ui(sesion, state='idle')
+
+        # --- APRENDIZAJE POST-INTERACCIÓN (fuera del camino crítico) ---
+        with traza.span('memoria'):
+            sesion.almacen.agregar_mensaje('user', prompt)
+            sesion.almacen.agregar_mensaje('assistant', full_response)
+        lotes_aprendizaje.agregar(sesion.id, (prompt, full_response), contexto=sesion)
+
+    except GeneracionCancelada:
+        pass
+    except Saturado:
+        # Back-pressure: mejor avisar que encolar sin límite
+        update_ui(sesion, state='busy')
+    except Exception as e:
+        print(f"Error turno: {e}")
+        update_ui(sesion, state='idle')
+    finally:
+        if stream is not None and sesion.generacion is stream:
+            sesion.generacion = None
+        if id_stream is not None:
+            sesion.canal.terminar(id=id_stream)
+
+def iniciar_turno(sesion, prompt, futuro_vision=None, traza=None):
+    """Lanza el turno de una sesión; si ya había uno, barge-in (o 'ocupado' sin barge-in)"""
+    sesion.tocar()
+    if sesion.turno_en_curso():
+        if not BARGE_IN:
+            update_ui(sesion, state='busy')
+            return None
+        interrumpir(sesion)
+    update_ui(sesion, state='thinking')
+
+    # Mostrar prompt del usuario inmediatamente
+    update_ui(sesion, msg=prompt, role='user')
+
+    sesion.cancelacion = threading.Event()
+    sesion.traza = traza or nueva_traza(sesion)
+    sesion.turno_actual = pool_turnos.submit(procesar_turno, sesion, prompt, futuro_vision, sesion.cancelacion, sesion.traza)
+    return sesion.turno_actual
+
+# --- TRABAJADOR DE IA CON MEMORIA (MICRO LOCAL) ---
+def ai_worker(sesion, fuente=None, motor=None):
+    """Bucle de escucha de la sesión local.
+
+    Por defecto usa el micro; con una fuente que se acaba (``FuenteArchivo``,
+    con su Event ``terminada``) vuelve cuando ya no queda voz por atender.
+    """
+    print("Iniciando IA Híbrida con Memoria...")
+    motor = motor or obtener_motor_stt()
+    fuente = fuente or FuenteMicrofono(motor.frecuencia)
+    terminada = getattr(fuente, 'terminada', None)
+    # Micro siempre abierto + VAD por tramas; el ruido de fondo se calibra solo,
+    # partiendo del que se midió la última vez (se guarda al salir)
+    # Mientras hay un turno en curso se exige más energía para no oírse a sí mismo
+    clave_calibracion = f"vad:{motor.frecuencia}"
+    detector = DetectorVoz(
+        motor.frecuencia,
+        factor_umbral=lambda: FACTOR_UMBRAL_BARGE_IN if sesion.turno_en_curso() else 1.0,
+        ruido_inicial=cargar_calibracion(clave_calibracion) if terminada is None else None
+    )
+    if terminada is None:
+        atexit.register(lambda: guardar_calibracion(clave_calibracion, detector.ruido))
+    escucha = EscuchaContinua(fuente, detector, motor.frecuencia).iniciar()
+
+    while True:
+        if not BARGE_IN:
+            # Re-armar el micro en cuanto termine de hablar (sin esperar al aprendizaje)
+            sesion.cola_voz.join()
+            sesion.voz_libre.wait()
+            escucha.descartar()  # Lo oído mientras hablaba era su propia voz
+
+        if not sesion.turno_en_curso():
+            update_ui(sesion, state='listening')
+        futuro_vision = None
+        traza = None
+        try:
+            # PASO 1: Escuchar. La visión arranca al detectar voz, en paralelo
+            def al_detectar_voz():
+                nonlocal futuro_vision, traza
+                if sesion.turno_en_curso():
+                    interrumpir(sesion)
+                traza = nueva_traza(sesion)
+                futuro_vision = pool_etapas.submit(analizar_pantalla, sesion, None, traza)
+                return traza
+
+            prompt = escuchar_frase(sesion, escucha, motor, al_detectar_voz,
+                                    timeout=None if terminada is None else 1.0)
+            if not prompt:
+                # No se entendió nada
+                if not sesion.turno_en_curso():
+                    update_ui(sesion, state='idle')
+                continue
 
-        except sr.UnknownValueError:
-            update_ui(state='idle')
+            turno = iniciar_turno(sesion, prompt, futuro_vision, traza)
+            if not BARGE_IN and turno is not None:
+                turno.result()
+
+        except queue.Empty:
+            # Solo con fuentes finitas: acabada y sin frases pendientes
+            if terminada.is_set():
+                escucha.detener()
+                return
         except Exception as e:
             print(f"Error bucle: {e}")
-            update_ui(state='idle')
+            update_ui(sesion, state='idle')
+
+def liberar_sesiones():
+    """Cierra (y vuelca a disco) las sesiones remotas sin clientes"""
+    while True:
+        time.sleep(60)
+        try:
+            if gestor_sesiones.cerrar_inactivas():
+                print(f"Sesiones activas: {len(gestor_sesiones)}")
+        except Exception as e:
+            print(f"Error liberando sesiones: {e}")
+
+sesion_local = None
+
+def preparar_sesion_local():
+    """La sesión local existe siempre, aunque no haya ningún navegador abierto.
+
+    Se crea al arrancar (carga la memoria, el índice y la cache de visión),
+    no al importar. Si un navegador conectó antes, se reutiliza la suya.
+    """
+    global sesion_local
+    if sesion_local is None:
+        sesion_local = gestor_sesiones.obtener(SESION_LOCAL, fija=True)
+    return sesion_local
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/frame/<sesion_id>/<frame_id>')
+def servir_frame(sesion_id, frame_id):
+    # El id es el hash del JPEG: sirve de ETag y el frame nunca cambia
+    sesion = gestor_sesiones.buscar(sesion_id)
+    jpeg = sesion.frames.obtener(frame_id) if sesion is not None else None
+    if jpeg is None:
+        abort(404)
+    resp = Response(jpeg, mimetype='image/jpeg')
+    resp.set_etag(frame_id)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 31536000
+    resp.cache_control.immutable = True
+    return resp.make_conditional(request)
+
+@app.route('/cache_vision')
+def estado_cache_vision():
+    # Contadores por sesión para ajustar UMBRAL_CACHE_VISION
+    return jsonify({s.id: s.cache_vision.estadisticas() for s in gestor_sesiones.vivas()})
+
+@app.route('/ocr')
+def estado_ocr():
+    # Teselas leídas frente a reutilizadas por la cache del lector
+    return jsonify(lector_ocr.estadisticas() if lector_ocr is not None else {'activo': False})
+
+@app.route('/arranque')
+def estado_arranque():
+    # Tiempo hasta estar listo y cuándo terminó cada subsistema
+    return jsonify(arranque.informe())
+
+@app.route('/vigilante')
+def estado_vigilante():
+    # Línea de tiempo de pantallas descritas en segundo plano y coste del muestreo
+    vigilante = sesion_local.vigilante if sesion_local is not None else None
+    return jsonify(vigilante.estadisticas() if vigilante is not None else {'activo': False})
+
+@app.route('/modelos')
+def estado_modelos():
+    # Últimos tiempos de carga y evaluación por modelo
+    return jsonify(gestor_modelos.informe())
+
+@app.route('/metrics')
+def exportar_metricas():
+    # Formato de texto de Prometheus: histogramas por etapa y de Ollama, colas del planificador
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/sesiones')
+def estado_sesiones():
+    return jsonify({'sesiones': gestor_sesiones.estadisticas(), 'planificador': planificador.estadisticas(),
+                    'aprendizaje': lotes_aprendizaje.estadisticas()})
+
+def sesion_actual():
+    return gestor_sesiones.de_sid(request.sid)
+
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
+    # ?usuario=<id> (o auth.usuario) da memoria propia y persistente a ese usuario
+    usuario = (auth or {}).get('usuario') or request.args.get('usuario')
+    if usuario:
+        sesion = gestor_sesiones.conectar(request.sid, id_seguro(usuario))
+    elif SESION_POR_DEFECTO:
+        sesion = gestor_sesiones.conectar(request.sid, SESION_POR_DEFECTO)
+    else:
+        sesion = gestor_sesiones.conectar(request.sid, f"anon-{request.sid}", efimera=True)
+    join_room(sesion.sala)
+    emit('sesion', {'id': sesion.id, 'remota': sesion.remota})
     # Enviar memoria actual al conectar
-    socketio.emit('update_memory', {
-        'identity': memoria_global['perfil_usuario'],
-        'interests': memoria_global['datos_aprendidos']
+    emit('update_memory', {
+        'identity': sesion.memoria['perfil_usuario'],
+        'interests': sesion.memoria['datos_aprendidos']
     })
+    # Latencias acumuladas hasta ahora para el panel
+    emit('metricas', {etapa: {'ms': r['ultimo'] * 1000, 'p50_ms': r['p50'] * 1000, 'p95_ms': r['p95'] * 1000}
+                      for etapa, r in metricas.resumen('raid_etapa_segundos', 'etapa').items()})
+    # Si hay una respuesta a medias, el cliente nuevo la recibe entera
+    sesion.canal.sincronizar(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect(*_):
+    gestor_sesiones.desconectar(request.sid)
+
+@socketio.on('stream_resync')
+def handle_stream_resync():
+    sesion = sesion_actual()
+    if sesion is not None:
+        sesion.canal.sincronizar(request.sid)
+
+@socketio.on('texto')
+def handle_texto(datos):
+    sesion = sesion_actual()
+    prompt = (datos or {}).get('texto', '').strip()
+    if sesion is not None and prompt:
+        iniciar_turno(sesion, prompt)
+
+@socketio.on('audio')
+def handle_audio(datos):
+    sesion = sesion_actual()
+    if sesion is not None and datos and (datos.get('wav') or datos.get('pcm')):
+        pool_stt.submit(transcribir_subida, sesion, datos)
+
+@socketio.on('captura')
+def handle_captura(datos):
+    sesion = sesion_actual()
+    if sesion is not None and datos and datos.get('imagen'):
+        pool_etapas.submit(recibir_captura, sesion, datos['imagen'])
 
 if __name__ == "__main__":
-    # Iniciar hilos
-    threading.Thread(target=procsador_voz_thread, daemon=True).start()
-    threading.Thread(target=ai_worker, daemon=True).start()
-    
-    # Emitir actualizaciones de memoria periódicamente o en eventos
-    def signal_memory_update():
-        socketio.emit('update_memory', {
-            'identity': memoria_global['perfil_usuario'],
-            'interests': memoria_global['datos_aprendidos']
-        })
-    
-    # Inyectar una referencia para que ai_worker pueda llamar a esta actualización
-    import __main__
-    __main__.signal_memory_update = signal_memory_update
-    
-    socketio.run(app, debug=False, port=5000)
+    # Todo arranca a la vez: el dashboard se sirve en cuanto escucha el puerto,
+    # mientras Ollama carga los modelos y se preparan el STT, la voz y el OCR,
+    # así el primer turno no paga ninguna inicialización
+    arranque.tarea('servidor_web', esperar_puerto, PUERTO_WEB)
+    arranque.tarea('modelos', gestor_modelos.calentar, [MODELO_VISION, MODELO_CHAT], True)
+    arranque.tarea('ocr', obtener_lector_ocr, necesaria=False)
+    local = arranque.tarea('sesion_local', preparar_sesion_local)
+    threading.Thread(target=liberar_sesiones, daemon=True).start()
+    if VIGILAR_PANTALLA:
+        def vigilar():
+            sesion = local.result()
+            if not sesion.remota:
+                iniciar_vigilante(sesion)
+        arranque.tarea('vigilante', vigilar, necesaria=False)
+    if AUDIO_LOCAL:
+        arranque.tarea('stt', obtener_motor_stt)
+        # La voz y la escucha van sobre la sesión local en cuanto está cargada
+        arranque.tarea('voz', lambda: iniciar_voz(local.result()))
+        # Espera al STT (el mismo motor que está cargando la tarea) y empieza a escuchar
+        threading.Thread(target=lambda: ai_worker(local.result()), daemon=True).start()
+    arranque.lanzadas(al_estar_listo=lambda a: print(a.resumen()))
+
+    socketio.run(app, debug=False, port=PUERTO_WEB)
@@ -1,157 +1,163 @@
 import asyncio
-import ollama
 import threading
 import queue
-import re
-import time
-import io
-import speech_recognition as sr
-import win32com.client
-import pythoncom
-from mss import mss
-from PIL import Image
+from prompts import ensamblar_mensajes
+from modelos import GestorModelos
+from servicio_ollama import obtener_servicio
+from captura import CapturadorPantalla
+from stt import crear_motor
+from tts import crear_motor_tts, VozEnCola
+from segmentador import SegmentadorFrases
+from arranque import Arranque, calibrar_reconocedor
 
 # --- CONFIGURACIÓN ---
 MODELO_OLLAMA = "moondream:1.8b" # El modelo con "ojos" que tienes instalado
 NOMBRE_IA = "Ojo Local"
 IDIOMA = "es-ES"
+MOTOR_STT = "vosk"   # 'vosk' / 'whisper' (locales) o 'google' (red)
+MOTOR_TTS = "auto"   # 'auto', 'sapi' (Windows), 'piper', 'espeak' o 'pyttsx3'
+
+servicio_ollama = obtener_servicio()
+gestor_modelos = GestorModelos({MODELO_OLLAMA: "30m"})
 
 # --- ESTADO GLOBAL ---
 cola_voz = queue.Queue()
 esta_hablando = threading.Event()
 
 # --- FUNCION: CAPTURA DE PANTALLA RAPIDA ---
-def capturar_pantalla():
+# Redimensionar a 720p ahorra mucha velocidad al modelo
+capturador = CapturadorPantalla(tamano_modelo=(1280, 720), calidad_modelo=70)
+
+def capturar_pantalla(traza=None):
     """Captura la pantalla principal y la devuelve como bytes JPG comprimidos"""
     try:
-        with mss() as sct:
-            # Capturar monitor 1
-            monitor = sct.monitors[1]
-            sct_img = sct.grab(monitor)
-            
-            # Convertir a imagen de Pillow para comprimir y redimensionar (ahorra mucha velocidad)
-            img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-            
-            # Opcional: Redimensionar si quieres más velocidad (ej. a 720p)
-            img.thumbnail((1280, 720))
-            
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='JPEG', quality=70)
-            return img_byte_arr.getvalue()
+        captura = capturador.capturar()
+        if traza is not None:
+            for etapa, segundos in captura.tiempos.items():
+                traza.registrar(etapa, segundos)
+        return captura.jpeg_modelo
     except Exception as e:
         print(f"\n[Error Captura]: {e}")
         return None
 
-# --- PROCESADOR DE VOZ (SAPI5 NATIVO) ---
+# --- PROCESADOR DE VOZ (SAPI5 EN WINDOWS, PIPER/ESPEAK-NG EN LINUX) ---
 def procsador_voz():
-    pythoncom.CoInitialize()
     try:
-        speaker = win32com.client.Dispatch("SAPI.SpVoice")
-        voices = speaker.GetVoices()
-        for i in range(voices.Count):
-            if "Spanish" in voices.Item(i).GetDescription():
-                speaker.Voice = voices.Item(i)
-                break
-        
-        while True:
-            frase = cola_voz.get()
-            if frase is None: break
-            try:
-                esta_hablando.set()
-                speaker.Speak(frase)
-            except: pass
-            finally:
-                cola_voz.task_done()
-                if cola_voz.empty():
-                    esta_hablando.clear()
+        motor = crear_motor_tts(MOTOR_TTS)
+        voz = VozEnCola(motor, cola_voz, al_hablar=esta_hablando.set,
+                        al_callar=esta_hablando.clear).iniciar()
+        voz.cache.precalentar()
     except Exception as e:
         print(f"Error en voz: {e}")
 
-threading.Thread(target=procsador_voz, daemon=True).start()
-
-def escuchar_usuario(recognizer, microphone):
-    while esta_hablando.is_set():
-        time.sleep(0.1)
+def escuchar_usuario(recognizer, microphone, motor_stt):
+    # Esperar a que termine de sonar todo lo pendiente
+    cola_voz.join()
 
     print(f"\r🎤 TE ESCUCHO...               ", end="", flush=True)
     try:
         with microphone as source:
             audio = recognizer.listen(source, timeout=5, phrase_time_limit=8)
         print(f"\r⏳ ANALIZANDO PANTALLA...     ", end="", flush=True)
-        texto = recognizer.recognize_google(audio, language=IDIOMA)
+        texto = motor_stt.transcribir_audio(audio)
+        if not texto:
+            return None
         print(f"\n🗣️ TÚ: {texto}")
         return texto
     except:
         return None
 
+def atender(prompt, traza=None):
+    """Un turno: captura lo que ve el usuario y responde con voz según llega el texto.
+
+    ``traza`` (TrazaTurno, opcional) recibe los tiempos de captura y tokens.
+    """
+    # 2. CAPTURAR LO QUE ESTÁ VIENDO EL USUARIO EN ESE MOMENTO
+    imagen_bytes = capturar_pantalla(traza)
+
+    # 3. GENERAR RESPUESTA CON VISIÓN
+    print(f"🤖 {NOMBRE_IA}: ", end="", flush=True)
+
+    full_response = ""
+    segmentador = SegmentadorFrases()
+
+    try:
+        # Enviamos el texto + la imagen a moondream
+        # Nota: Moondream es mejor con descripciones cortas sobre la imagen
+        stream = servicio_ollama.chat_stream(
+            model=MODELO_OLLAMA,
+            messages=ensamblar_mensajes(
+                estables=[],
+                historial=[],
+                volatiles=[],
+                prompt=f'Mira la imagen de mi pantalla y responde brevemente en español a: {prompt}',
+                imagenes=[imagen_bytes] if imagen_bytes else None
+            ),
+            keep_alive=gestor_modelos.keep_alive(MODELO_OLLAMA)
+        )
+
+        for chunk in stream:
+            text_chunk = chunk['message']['content']
+            if traza is not None and text_chunk:
+                traza.marcar('primer_token')
+            if chunk.get('done'):
+                tiempos = gestor_modelos.registrar(MODELO_OLLAMA, chunk)
+                if traza is not None:
+                    traza.marcar('ultimo_token', tiempos)
+            full_response += text_chunk
+            print(text_chunk, end="", flush=True)
+
+            for frase in segmentador.agregar(text_chunk):
+                cola_voz.put(frase)
+
+        for frase in segmentador.terminar():
+            cola_voz.put(frase)
+
+        print()
+
+    except Exception as e:
+        print(f"\n[Error Visión]: {e}")
+        cola_voz.put("Vaya, me ha costado ver eso.")
+    return full_response
+
+def preparar_microfono():
+    """Motor STT, reconocedor y micro calibrado (con la calibración guardada si es reciente)"""
+    import speech_recognition as sr
+    motor_stt = crear_motor(MOTOR_STT)
+    recognizer = sr.Recognizer()
+    mic = sr.Microphone(sample_rate=motor_stt.frecuencia)
+    with mic as source:
+        calibrar_reconocedor(recognizer, source, f"sr:{motor_stt.frecuencia}")
+        recognizer.pause_threshold = 0.8
+    return recognizer, mic, motor_stt
+
 async def main():
     print(f"\n================================")
     print(f"   {NOMBRE_IA} CON VISIÓN ACTIVADA")
     print(f"================================\n")
     print(f"La IA está viendo tu pantalla en vivo.")
-    
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-    
-    with mic as source:
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        recognizer.pause_threshold = 0.8
+    # La voz arranca aquí y no al importar: quien importe el módulo pone la suya.
+    # Voz, modelo y micro se preparan a la vez
+    arranque = Arranque()
+    arranque.tarea('voz', procsador_voz)
+    arranque.tarea('modelos', gestor_modelos.calentar, [MODELO_OLLAMA], True)
+    micro = arranque.tarea('micro', preparar_microfono)
+    arranque.lanzadas(al_estar_listo=lambda a: print(a.resumen()))
+    recognizer, mic, motor_stt = await asyncio.wrap_future(micro)
 
     while True:
         # 1. ESCUCHAR
         loop = asyncio.get_event_loop()
-        prompt = await loop.run_in_executor(None, escuchar_usuario, recognizer, mic)
+        prompt = await loop.run_in_executor(None, escuchar_usuario, recognizer, mic, motor_stt)
         
         if not prompt or len(prompt.strip()) < 2:
             continue
-        
-        # 2. CAPTURAR LO QUE ESTÁ VIENDO EL USUARIO EN ESE MOMENTO
-        imagen_bytes = await loop.run_in_executor(None, capturar_pantalla)
 
-        # 3. GENERAR RESPUESTA CON VISIÓN
-        print(f"🤖 {NOMBRE_IA}: ", end="", flush=True)
-        
-        full_response = ""
-        sentence_buffer = ""
-        
-        try:
-            # Enviamos el texto + la imagen a moondream
-            # Nota: Moondream es mejor con descripciones cortas sobre la imagen
-            stream = ollama.chat(
-                model=MODELO_OLLAMA, 
-                messages=[{
-                    'role': 'user', 
-                    'content': f'Mira la imagen de mi pantalla y responde brevemente en español a: {prompt}',
-                    'images': [imagen_bytes] if imagen_bytes else []
-                }], 
-                stream=True
-            )
-            
-            for chunk in stream:
-                text_chunk = chunk['message']['content']
-                full_response += text_chunk
-                sentence_buffer += text_chunk
-                print(text_chunk, end="", flush=True)
-
-                if any(p in text_chunk for p in ['.', '!', '?', '\n']):
-                    parts = re.split(r'([.!?\n])', sentence_buffer)
-                    for i in range(0, len(parts) - 1, 2):
-                        sentence = parts[i] + parts[i+1]
-                        if sentence.strip():
-                            cola_voz.put(sentence.strip())
-                    sentence_buffer = parts[-1]
-
-            if sentence_buffer.strip():
-                cola_voz.put(sentence_buffer.strip())
-            
-            print() 
-
-        except Exception as e:
-            print(f"\n[Error Visión]: {e}")
-            cola_voz.put("Vaya, me ha costado ver eso.")
+        # 2 y 3. CAPTURAR Y RESPONDER
+        await loop.run_in_executor(None, atender, prompt)
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("\nCerrando visión...")
+        print("\nCerrando visión...")
\ No newline at end of file
@@ -0,0 +1,301 @@
+import collections
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+FRECUENCIA = 16000
+MS_TRAMA = 30                 # Tamaño de trama del VAD (WebRTC admite 10/20/30 ms)
+MS_PREROLL = 300              # Audio previo al inicio de voz que se conserva
+MS_INICIO = 90                # Voz continua necesaria para dar por empezada una frase
+MS_PAUSA = 700                # Silencio que cierra la frase
+MAX_FRASE = 10.0              # Segundos máximos por frase (como phrase_time_limit)
+SEGUNDOS_ANILLO = 10          # Capacidad del buffer circular
+RELACION_RUIDO = 3.0          # Energía mínima de voz respecto al ruido de fondo
+ZCR_MAXIMO = 0.35             # Por encima: siseo/ruido más que voz sonora
+
+
+def remuestrear(muestras, origen, destino):
+    if origen == destino:
+        return muestras
+    posiciones = np.arange(0, len(muestras), origen / destino)
+    return np.interp(posiciones, np.arange(len(muestras)), muestras).astype(np.int16)
+
+
+def leer_wav(ruta, frecuencia=FRECUENCIA):
+    """PCM 16 bits mono a ``frecuencia`` (mezcla canales y re-muestrea si hace falta).
+
+    ``ruta`` también puede ser un fichero abierto o un BytesIO."""
+    with wave.open(ruta, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{ruta}: se esperan muestras de 16 bits")
+        muestras = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        if w.getnchannels() > 1:
+            muestras = muestras.reshape(-1, w.getnchannels()).mean(axis=1).astype(np.int16)
+        origen = w.getframerate()
+    return remuestrear(muestras, origen, frecuencia)
+
+
+# --- BUFFER CIRCULAR ---
+class AnilloAudio:
+    """Buffer circular de muestras para un productor y un consumidor, sin locks.
+
+    El productor copia las muestras y después publica el contador total de
+    escritas (asignación atómica); el consumidor lleva su propia posición de
+    lectura y espera con un Event, sin sondear.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.escritas = 0
+        self._datos = np.zeros(capacidad, dtype=np.int16)
+        self._hay_datos = threading.Event()
+
+    def escribir(self, muestras):
+        muestras = muestras[-self.capacidad:]
+        n = len(muestras)
+        pos = self.escritas % self.capacidad
+        primero = min(n, self.capacidad - pos)
+        self._datos[pos:pos + primero] = muestras[:primero]
+        self._datos[:n - primero] = muestras[primero:]
+        self.escritas += n
+        self._hay_datos.set()
+
+    def esperar(self, desde, timeout=None):
+        """Bloquea hasta que haya muestras posteriores a ``desde``"""
+        self._hay_datos.clear()
+        if self.escritas > desde:
+            return True
+        return self._hay_datos.wait(timeout)
+
+    def leer(self, desde, n):
+        """Devuelve (muestras, nueva_posición); salta lo ya sobrescrito si el lector se retrasó"""
+        escritas = self.escritas
+        desde = max(desde, escritas - self.capacidad)
+        n = min(n, escritas - desde)
+        pos = desde % self.capacidad
+        primero = min(n, self.capacidad - pos)
+        muestras = np.concatenate((self._datos[pos:pos + primero], self._datos[:n - primero]))
+        return muestras, desde + n
+
+
+# --- FUENTES DE AUDIO ---
+class FuenteMicrofono:
+    """Micrófono siempre abierto: el callback de PyAudio escribe directamente en el anillo"""
+
+    def __init__(self, frecuencia=FRECUENCIA, muestras_bloque=480, dispositivo=None):
+        self.frecuencia = frecuencia
+        self.muestras_bloque = muestras_bloque
+        self.dispositivo = dispositivo
+        self._pa = None
+        self._stream = None
+
+    def iniciar(self, anillo):
+        import pyaudio
+
+        def callback(datos, cuantas, info, estado):
+            anillo.escribir(np.frombuffer(datos, dtype=np.int16))
+            return None, pyaudio.paContinue
+
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16, channels=1, rate=self.frecuencia, input=True,
+            frames_per_buffer=self.muestras_bloque, input_device_index=self.dispositivo,
+            stream_callback=callback
+        )
+        self._stream.start_stream()
+
+    def detener(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pa.terminate()
+            self._stream = None
+
+
+class FuenteArchivo:
+    """Reproduce WAVs como si fuesen el micrófono (pruebas y benchmarks sin hardware).
+
+    ``velocidad`` acelera la reproducción (el VAD cuenta tramas, no reloj).
+    ``esperar_turno()``, si se da, se llama antes de cada WAV y bloquea hasta
+    que toca hablar (p. ej. hasta que el asistente ha terminado de responder).
+    """
+
+    def __init__(self, rutas, frecuencia=FRECUENCIA, tiempo_real=True,
+                 silencio_entre=1.0, ms_bloque=30, velocidad=1.0, esperar_turno=None):
+        self.rutas = [rutas] if isinstance(rutas, str) else list(rutas)
+        self.frecuencia = frecuencia
+        self.tiempo_real = tiempo_real
+        self.silencio_entre = silencio_entre
+        self.ms_bloque = ms_bloque
+        self.velocidad = velocidad
+        self.esperar_turno = esperar_turno
+        self.terminada = threading.Event()
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self, anillo):
+        self._hilo = threading.Thread(target=self._reproducir, args=(anillo,), daemon=True)
+        self._hilo.start()
+
+    def _reproducir(self, anillo):
+        bloque = self.frecuencia * self.ms_bloque // 1000
+        silencio = np.zeros(int(self.frecuencia * self.silencio_entre), dtype=np.int16)
+        for ruta in self.rutas:
+            if self.esperar_turno is not None:
+                self.esperar_turno()
+            muestras = np.concatenate((leer_wav(ruta, self.frecuencia), silencio))
+            inicio = time.perf_counter()
+            emitidas = 0
+            for i in range(0, len(muestras), bloque):
+                if self._parar.is_set():
+                    return
+                anillo.escribir(muestras[i:i + bloque])
+                emitidas += len(muestras[i:i + bloque])
+                if self.tiempo_real:
+                    retraso = inicio + emitidas / self.frecuencia / self.velocidad - time.perf_counter()
+                    if retraso > 0:
+                        time.sleep(retraso)
+        self.terminada.set()
+
+    def detener(self):
+        self._parar.set()
+
+
+# --- DETECCIÓN DE VOZ ---
+class DetectorVoz:
+    """VAD por tramas: energía + cruces por cero con ruido de fondo adaptativo.
+
+    Si ``webrtcvad`` está instalado y ``usar_webrtc`` es True se usa además su
+    decisión. ``factor_umbral`` (número o función) endurece el umbral, p. ej.
+    mientras el propio asistente está hablando. ``ruido_inicial`` (el de una
+    sesión anterior) evita tomar como ruido la primera trama, que puede ser voz.
+    """
+
+    def __init__(self, frecuencia=FRECUENCIA, relacion_ruido=RELACION_RUIDO,
+                 zcr_maximo=ZCR_MAXIMO, factor_umbral=1.0, usar_webrtc=True, ruido_inicial=None):
+        self.frecuencia = frecuencia
+        self.relacion_ruido = relacion_ruido
+        self.zcr_maximo = zcr_maximo
+        self.factor_umbral = factor_umbral
+        self.ruido = ruido_inicial
+        self._webrtc = None
+        if usar_webrtc:
+            try:
+                import webrtcvad
+                self._webrtc = webrtcvad.Vad(2)
+            except ImportError:
+                pass
+
+    def _factor(self):
+        return self.factor_umbral() if callable(self.factor_umbral) else self.factor_umbral
+
+    def es_voz(self, trama):
+        muestras = trama.astype(np.float32)
+        energia = float(np.sqrt(np.mean(muestras * muestras))) + 1e-3
+        if self.ruido is None:
+            self.ruido = energia
+        zcr = float(np.mean(np.signbit(trama[1:]) != np.signbit(trama[:-1])))
+
+        umbral = self.ruido * self.relacion_ruido * self._factor()
+        voz = energia > umbral and (zcr < self.zcr_maximo or energia > 2 * umbral)
+        if voz and self._webrtc is not None:
+            voz = self._webrtc.is_speech(trama.tobytes(), self.frecuencia)
+        if not voz:
+            # El ruido de fondo se adapta solo con tramas de silencio (sube despacio, baja rápido)
+            alfa = 0.05 if energia > self.ruido else 0.2
+            self.ruido += alfa * (energia - self.ruido)
+        return voz
+
+
+class EscuchaContinua:
+    """Micrófono continuo + VAD en un hilo propio que publica eventos de frase.
+
+    Produce en una cola ``('inicio', pcm)`` (con el pre-roll), ``('audio', pcm)``
+    y ``('fin', None)``. ``frase()`` bloquea hasta el siguiente inicio de voz y
+    va entregando el audio de esa frase según llega.
+    """
+
+    def __init__(self, fuente, detector=None, frecuencia=FRECUENCIA, ms_trama=MS_TRAMA,
+                 ms_preroll=MS_PREROLL, ms_inicio=MS_INICIO, ms_pausa=MS_PAUSA,
+                 max_frase=MAX_FRASE, segundos_anillo=SEGUNDOS_ANILLO):
+        self.fuente = fuente
+        self.frecuencia = frecuencia
+        self.detector = detector or DetectorVoz(frecuencia)
+        self.anillo = AnilloAudio(int(frecuencia * segundos_anillo))
+        self.muestras_trama = frecuencia * ms_trama // 1000
+        self.tramas_preroll = ms_preroll // ms_trama
+        self.tramas_inicio = max(1, ms_inicio // ms_trama)
+        self.tramas_pausa = ms_pausa // ms_trama
+        self.tramas_max = int(max_frase * 1000) // ms_trama
+        self.eventos = queue.Queue()
+        self._hilo = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        self.fuente.iniciar(self.anillo)
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="escucha-vad")
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        self.fuente.detener()
+
+    def descartar(self):
+        """Olvida los eventos pendientes (p. ej. lo que se oyó mientras hablaba el asistente)"""
+        while True:
+            try:
+                self.eventos.get_nowait()
+            except queue.Empty:
+                return
+
+    def frase(self, timeout=None):
+        """Generador con el PCM (bytes) de la próxima frase; el primer trozo trae el pre-roll"""
+        while True:
+            tipo, pcm = self.eventos.get(timeout=timeout)
+            if tipo == 'inicio':
+                break
+        yield pcm
+        while True:
+            tipo, pcm = self.eventos.get()
+            if tipo == 'fin':
+                return
+            yield pcm
+
+    def _bucle(self):
+        posicion = 0
+        previas = collections.deque(maxlen=self.tramas_preroll)
+        candidatas = []
+        en_voz = False
+        silencio = tramas_frase = 0
+        while not self._parar.is_set():
+            if not self.anillo.esperar(posicion, timeout=0.5):
+                continue
+            while self.anillo.escritas - posicion >= self.muestras_trama:
+                trama, posicion = self.anillo.leer(posicion, self.muestras_trama)
+                voz = self.detector.es_voz(trama)
+                if not en_voz:
+                    if voz:
+                        candidatas.append(trama)
+                        if len(candidatas) >= self.tramas_inicio:
+                            en_voz, silencio, tramas_frase = True, 0, len(candidatas)
+                            audio = np.concatenate(list(previas) + candidatas)
+                            self.eventos.put(('inicio', audio.tobytes()))
+                            previas.clear()
+                            candidatas = []
+                    else:
+                        previas.extend(candidatas)
+                        previas.append(trama)
+                        candidatas = []
+                    continue
+
+                self.eventos.put(('audio', trama.tobytes()))
+                tramas_frase += 1
+                silencio = 0 if voz else silencio + 1
+                if silencio >= self.tramas_pausa or tramas_frase >= self.tramas_max:
+                    en_voz = False
+                    self.eventos.put(('fin', None))
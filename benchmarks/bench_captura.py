@@ -0,0 +1,85 @@
+"""Micro-benchmark del procesado de capturas a 1080p, 1440p y 4K.
+
+Compara el camino antiguo (frombytes + copy + dos thumbnail) con
+``CapturadorPantalla.procesar`` sobre buffers BGRA sintéticos, así que no
+hace falta pantalla. Informa de ms por captura, bytes reservados en el heap
+de Python (tracemalloc: copias ``bytes``, BytesIO, base64) e imágenes
+internas creadas por Pillow (que reserva fuera del heap de Python). Antes
+comprueba que el color sale bien con el byte de relleno a 0 y a 255. Uso:
+
+    python benchmarks/bench_captura.py [--repeticiones 20]
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from captura import CapturadorPantalla
+
+RESOLUCIONES = {"1080p": (1920, 1080), "1440p": (2560, 1440), "4K": (3840, 2160)}
+
+
+def camino_antiguo(bgra, tamano):
+    datos = bytes(bgra)  # sct_img.bgra devuelve una copia
+    img = Image.frombytes("RGB", tamano, datos, "raw", "BGRX")
+    img_ollama = img.copy()
+    img_ollama.thumbnail((800, 450))
+    buffer_ollama = io.BytesIO()
+    img_ollama.save(buffer_ollama, format='JPEG', quality=85)
+    img.thumbnail((450, 250))
+    buffer_ui = io.BytesIO()
+    img.save(buffer_ui, format='JPEG', quality=50)
+    base64.b64encode(buffer_ui.getvalue()).decode('utf-8')
+    return buffer_ollama.getvalue()
+
+
+def comprobar_color(capturador):
+    """El camino nuevo conserva el color sea cual sea el byte de relleno de mss"""
+    for relleno in (0, 255):
+        bgra = bytearray([10, 100, 200, relleno]) * (640 * 360)
+        pixel = capturador.procesar(bgra, (640, 360)).imagen.getpixel((100, 100))
+        assert all(abs(a - b) <= 1 for a, b in zip(pixel, (200, 100, 10))), (relleno, pixel)
+
+
+def medir(funcion, repeticiones):
+    funcion()  # Calentamiento (buffers reutilizables, cachés de Pillow)
+    imagenes_antes = Image.core.get_stats()['new_count']
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    imagenes = (Image.core.get_stats()['new_count'] - imagenes_antes) / repeticiones
+    return ms, pico, imagenes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    capturador = CapturadorPantalla()
+    comprobar_color(capturador)
+    print(f"{'resolución':>10} | {'camino':>7} | {'ms/captura':>10} | {'pico heap':>12} | {'imgs Pillow':>11}")
+    print("-" * 62)
+    for nombre, tamano in RESOLUCIONES.items():
+        bgra = bytearray(os.urandom(1024)) * (tamano[0] * tamano[1] * 4 // 1024)
+        bgra[3::4] = bytes(len(bgra) // 4)   # mss deja el relleno a 0 en algunos sistemas
+        for camino, funcion in (
+            ("antiguo", lambda: camino_antiguo(bgra, tamano)),
+            ("nuevo", lambda: capturador.procesar(bgra, tamano)),
+        ):
+            ms, pico, imagenes = medir(funcion, args.repeticiones)
+            print(f"{nombre:>10} | {camino:>7} | {ms:>10.1f} | {pico / 1024:>9.0f} KB | {imagenes:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark de lip-sync contra el VTS simulado (vts_simulado.py).
+
+Compara el método anterior (un ``requestSetParameterValue`` aleatorio y
+esperado cada 0.1 s) con ``AnimadorBoca``: ritmo real conseguido, jitter,
+parámetros por mensaje y correlación entre la apertura enviada y la energía
+real del audio. ``--retardo`` simula lo que tarda VTS en contestar. Uso:
+
+    python benchmarks/bench_lipsync.py --wav frase.wav --retardo 0.02
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pyvts
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lipsync import AnimadorBoca, envolventes, PARAMETRO_APERTURA
+from tts import AudioVoz
+from vts_simulado import ServidorVTSSimulado
+
+PUERTO = 8765
+
+
+def voz_sintetica(segundos=4.0, frecuencia=22050):
+    """Sílabas de ~0.2 s con armónicos y pausas, suficiente para mover la boca"""
+    t = np.arange(int(segundos * frecuencia)) / frecuencia
+    tono = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 1200, 2400)))
+    silabas = np.clip(np.sin(2 * np.pi * 2.5 * t), 0, None) ** 2
+    frases = (np.sin(2 * np.pi * 0.4 * t) > -0.6)
+    pcm = (tono * silabas * frases * 6000).astype(np.int16)
+    return AudioVoz(pcm.tobytes(), frecuencia)
+
+
+async def conectar():
+    myvts = pyvts.vts(
+        plugin_info={"plugin_name": "bench", "developer": "bench", "authentication_token_path": os.devnull},
+        vts_api_info={"version": "1.0", "name": "VTubeStudioPublicAPI", "host": "localhost", "port": PUERTO},
+    )
+    await myvts.connect()
+    await myvts.request(myvts.vts_request.authentication("token-simulado"))
+    return myvts
+
+
+async def metodo_anterior(servidor, segundos):
+    myvts = await conectar()
+    desde = len(servidor.fotogramas)
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        await myvts.request(myvts.vts_request.requestSetParameterValue("MouthOpen", random.uniform(0.0, 0.6)))
+        await asyncio.sleep(0.1)
+    await myvts.close()
+    return servidor.estadisticas(desde)
+
+
+async def metodo_nuevo(servidor, audio, fps):
+    myvts = await conectar()
+    animador = AnimadorBoca(myvts, fps=fps, latencia=0.0)
+    tarea = asyncio.create_task(animador.ejecutar())
+    desde = len(servidor.fotogramas)
+    animador.hablar(audio)
+    await asyncio.sleep(audio.duracion + 0.2)
+    tarea.cancel()
+    await myvts.close()
+
+    stats = servidor.estadisticas(desde)
+    enviados = np.array([v[PARAMETRO_APERTURA] for _, v in servidor.fotogramas[desde:]])
+    muestras = np.frombuffer(audio.pcm, dtype=np.int16).astype(np.float32)
+    paso = audio.frecuencia // fps
+    rms = np.sqrt([np.mean(muestras[i:i + paso] ** 2) for i in range(0, len(muestras) - paso, paso)])
+    n = min(len(enviados), len(rms))
+    stats['correlacion_rms'] = float(np.corrcoef(enviados[:n], rms[:n])[0, 1])
+    stats['errores'] = animador.errores
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", help="Frase grabada (si no, voz sintética)")
+    parser.add_argument("--fps", type=int, default=45)
+    parser.add_argument("--retardo", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.wav:
+        from audio_entrada import leer_wav
+        audio = AudioVoz(leer_wav(args.wav, 22050).tobytes(), 22050)
+    else:
+        audio = voz_sintetica()
+
+    t = time.perf_counter()
+    envolventes(audio, args.fps)
+    coste = (time.perf_counter() - t) / audio.duracion * 1000
+    print(f"Envolventes: {coste:.2f} ms por segundo de audio")
+
+    servidor = await ServidorVTSSimulado(PUERTO, args.retardo).iniciar()
+    for nombre, corrutina in (("anterior", metodo_anterior(servidor, audio.duracion)),
+                              ("animador", metodo_nuevo(servidor, audio, args.fps))):
+        stats = await corrutina
+        print(f"{nombre:>9} | {stats.get('hz', 0):5.1f} Hz | jitter {stats.get('jitter_ms', 0):5.1f} ms | "
+              f"{stats.get('parametros_por_mensaje', 0):.0f} parámetros/mensaje | "
+              f"correlación con RMS {stats.get('correlacion_rms', float('nan')):.2f}")
+    await servidor.detener()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
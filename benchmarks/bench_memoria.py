@@ -0,0 +1,125 @@
+"""Benchmark de la memoria con un historial enorme (por defecto 1M de mensajes).
+
+Compara el formato antiguo (``json.load`` del fichero entero a dicts y
+``json.dump`` con sangría al volcar) con el actual (``leer_instantanea`` en
+streaming a un ``Historial`` compacto y ``escribir_atomico`` copiando bytes).
+Cada carga se mide en un proceso aparte para que la memoria residente de una
+no contamine a la otra. Informa del tamaño en disco, segundos de carga y de
+volcado (lo que cuesta cada compactación) y MB residentes tras cargar. Uso:
+
+    python benchmarks/bench_memoria.py [--mensajes 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from historial import Historial
+from memoria import escribir_atomico, leer_instantanea, memoria_vacia
+
+PREGUNTAS = ["¿Qué ves en mi pantalla?", "Explícame este error de Python",
+             "¿Cómo se llama el personaje de la imagen?", "Resume el documento abierto",
+             "¿Por qué \"falla\" el test?\nSale un traceback largo"]
+RESPUESTAS = ["Veo un editor con un fichero de Python abierto y una terminal debajo.",
+              "El error viene de una variable sin definir en la línea 42; revisa el import.",
+              "Parece un personaje de anime con el pelo azul, aunque no estoy del todo seguro.",
+              "El documento habla de latencias: captura, visión, primer token y voz.",
+              "Falla porque la función devuelve None cuando la lista está vacía."]
+
+
+def historial_sintetico(n, semilla=0):
+    aleatorio = random.Random(semilla)
+    for i in range(n):
+        if i % 2 == 0:
+            yield {'role': 'user', 'content': f"{aleatorio.choice(PREGUNTAS)} ({i})"}
+        else:
+            yield {'role': 'assistant', 'content': " ".join(aleatorio.sample(RESPUESTAS, 2))}
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def pico_mb():
+    # VmHWM y no ru_maxrss: este se hereda del padre a través de exec
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith("VmHWM:"):
+                return int(linea.split()[1]) / 1024
+    return 0.0
+
+
+def medir(formato, ruta):
+    """Carga y vuelca en este proceso; imprime el resultado en JSON (lo lee main)"""
+    base = rss_mb()
+    inicio = time.perf_counter()
+    if formato == "antiguo":
+        with open(ruta, 'r', encoding='utf-8') as f:
+            memoria = json.load(f)
+    else:
+        memoria = leer_instantanea(ruta)
+    carga = time.perf_counter() - inicio
+    residente = rss_mb() - base
+    pico = pico_mb() - base
+
+    # Lo que hace cada turno con el historial: añadir y leer la cola para el prompt
+    inicio = time.perf_counter()
+    for i in range(1000):
+        memoria['historial_corto'].append({'role': 'user', 'content': f"pregunta {i}"})
+        memoria['historial_corto'][-8:]
+    turno_us = (time.perf_counter() - inicio) * 1e3
+
+    salida = ruta + ".volcado"
+    inicio = time.perf_counter()
+    if formato == "antiguo":
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(memoria, f, ensure_ascii=False, indent=4)
+    else:
+        escribir_atomico(salida, memoria)
+    volcado = time.perf_counter() - inicio
+    os.remove(salida)
+    print(json.dumps({'carga_s': carga, 'volcado_s': volcado, 'residente_mb': residente,
+                      'pico_mb': pico, 'turno_us': turno_us}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensajes", type=int, default=1_000_000)
+    parser.add_argument("--medir", choices=["antiguo", "nuevo"], help=argparse.SUPPRESS)
+    parser.add_argument("--ruta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.medir:
+        return medir(args.medir, args.ruta)
+
+    carpeta = tempfile.mkdtemp(prefix="raid-bench-memoria-")
+    rutas = {'antiguo': os.path.join(carpeta, "antiguo.json"), 'nuevo': os.path.join(carpeta, "nuevo.json")}
+    print(f"Generando {args.mensajes} mensajes sintéticos...")
+    memoria = memoria_vacia()
+    memoria['historial_corto'] = Historial(historial_sintetico(args.mensajes))
+    escribir_atomico(rutas['nuevo'], memoria)
+    with open(rutas['antiguo'], 'w', encoding='utf-8') as f:
+        json.dump({**memoria, 'historial_corto': list(historial_sintetico(args.mensajes))},
+                  f, ensure_ascii=False, indent=4)
+    del memoria
+
+    print(f"{'formato':>8} | {'disco MB':>8} | {'carga s':>7} | {'volcado s':>9} | "
+          f"{'residente MB':>12} | {'pico MB':>7} | {'turno µs':>8}")
+    print("-" * 80)
+    for formato, ruta in rutas.items():
+        salida = subprocess.run([sys.executable, __file__, "--medir", formato, "--ruta", ruta],
+                                capture_output=True, text=True, check=True).stdout
+        r = json.loads(salida.strip().splitlines()[-1])
+        print(f"{formato:>8} | {os.path.getsize(ruta) / 2**20:8.1f} | {r['carga_s']:7.2f} | "
+              f"{r['volcado_s']:9.2f} | {r['residente_mb']:12.1f} | {r['pico_mb']:7.1f} | {r['turno_us']:8.1f}")
+        os.remove(ruta)
+    os.rmdir(carpeta)
+
+
+if __name__ == "__main__":
+    main()
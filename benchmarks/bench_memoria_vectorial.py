@@ -0,0 +1,83 @@
+"""Benchmark del índice de recuerdos: tamaño del prompt y latencia al crecer la memoria.
+
+Usa embeddings sintéticos (deterministas por texto) para no depender de Ollama:
+mide solo el coste del índice. Uso:
+
+    python benchmarks/bench_memoria_vectorial.py [--max 100000] [--dim 768]
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from memoria_vectorial import IndiceVectorial, estimar_tokens
+
+TEMAS = ["python", "música", "fútbol", "cocina", "viajes", "series", "hardware", "idiomas"]
+
+
+def embeddings_sinteticos(dim):
+    def embeber(textos):
+        vectores = np.empty((len(textos), dim), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            rng = np.random.default_rng(zlib.crc32(texto.encode("utf-8")))
+            vectores[i] = rng.standard_normal(dim)
+        return vectores
+    return embeber
+
+
+def dato_sintetico(i):
+    return f"Le gusta {TEMAS[i % len(TEMAS)]} (dato {i})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--presupuesto", type=int, default=200)
+    parser.add_argument("--consultas", type=int, default=50)
+    args = parser.parse_args()
+
+    indice = IndiceVectorial(funcion_embedding=embeddings_sinteticos(args.dim))
+    puntos = [p for p in (100, 1_000, 10_000, 100_000, 1_000_000) if p <= args.max]
+    tokens_antiguo = 0
+    cargados = 0
+
+    print(f"{'recuerdos':>10} | {'tokens antes':>12} | {'tokens ahora':>12} | "
+          f"{'buscar ms':>9} | {'insertar ms':>11}")
+    print("-" * 67)
+    for objetivo in puntos:
+        # Relleno sin deduplicar (solo prepara el estado; no es lo que se mide)
+        umbral, indice.umbral_duplicado = indice.umbral_duplicado, None
+        while cargados < objetivo - 1:
+            lote = [dato_sintetico(i) for i in range(cargados, min(objetivo - 1, cargados + 5_000))]
+            indice.agregar_varios(lote)
+            tokens_antiguo += sum(estimar_tokens(t) + 1 for t in lote)
+            cargados += len(lote)
+        indice.umbral_duplicado = umbral
+
+        # Inserción incremental con deduplicación (camino real del aprendizaje)
+        inicio = time.perf_counter()
+        indice.agregar(dato_sintetico(cargados))
+        insertar_ms = (time.perf_counter() - inicio) * 1000
+        tokens_antiguo += estimar_tokens(dato_sintetico(cargados)) + 1
+        cargados += 1
+
+        tiempos, tokens = [], []
+        for q in range(args.consultas):
+            inicio = time.perf_counter()
+            recuerdos = indice.buscar(f"¿qué opinas de {TEMAS[q % len(TEMAS)]}?", k=args.k,
+                                      presupuesto_tokens=args.presupuesto)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            tokens.append(estimar_tokens(", ".join(recuerdos)))
+
+        print(f"{len(indice):>10} | {tokens_antiguo:>12} | {max(tokens):>12} | "
+              f"{np.median(tiempos):>9.2f} | {insertar_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
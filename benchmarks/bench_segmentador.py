@@ -0,0 +1,184 @@
+"""Benchmark de segmentación para TTS: tiempo hasta el primer audio.
+
+Reproduce streams de tokens grabados (o sintéticos) a su ritmo original y los
+trocea con cada estrategia. La síntesis y la reproducción se simulan con un
+solo hilo de síntesis por delante de la reproducción (como ``VozEnCola``):
+
+- TTFA: segundos desde el primer token hasta que empieza a sonar la voz.
+- Huecos: silencio total entre trozos una vez empezó a hablar.
+- Llamadas: número de trozos enviados al TTS.
+- Cortes malos: trozos partidos entre dos cifras ("3." | "5 euros").
+
+El coste de síntesis es ``--coste-fijo + --coste-caracter * len`` o, con
+``--tts espeak`` (u otro motor), el tiempo real de ese motor. Para grabar un
+stream de Ollama (una línea JSON ``{"t": s, "delta": "..."}`` por token):
+
+    python benchmarks/bench_segmentador.py --grabar "Cuéntame algo de Marte" -o streams/marte.jsonl
+    python benchmarks/bench_segmentador.py streams/*.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from segmentador import SegmentadorFrases
+
+CARACTERES_POR_SEGUNDO = 14   # Velocidad típica de habla en español
+TEXTOS_SINTETICOS = [
+    "Claro, te lo explico. El Sr. Pérez pagó 3.5 euros, o sea unos 2,75 dólares... "
+    "¿Caro? Depende. Si miras la pág. 12 verás que el precio subió un 4.2% el año pasado, "
+    "aunque la mayoría de la gente ni se dio cuenta porque el cambio fue poco a poco.",
+    "¡Hola! Veo que tienes abierto el editor con un archivo de Python. Parece que estás "
+    "trabajando en una función que procesa imágenes, p. ej. redimensionándolas a 1280x720. "
+    "Te recomendaría revisar la línea 42, donde se calcula el tamaño.",
+    "Jaja, eso es un gato encima de un teclado. No sé si está programando o destruyendo "
+    "tu trabajo, pero desde luego tiene más confianza que muchos desarrolladores.",
+]
+
+
+def stream_sintetico(texto, tokens_por_segundo, latencia_primero):
+    trozos = re.findall(r"\s*\S{1,4}", texto)
+    return [(latencia_primero + i / tokens_por_segundo, t) for i, t in enumerate(trozos)]
+
+
+def leer_stream(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        eventos = [json.loads(linea) for linea in f if linea.strip()]
+    return [(e['t'], e['delta']) for e in eventos]
+
+
+def grabar(prompt, ruta, modelo):
+    from servicio_ollama import obtener_servicio
+    inicio = time.perf_counter()
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for chunk in obtener_servicio().chat_stream(model=modelo, messages=[{'role': 'user', 'content': prompt}]):
+            delta = chunk['message']['content']
+            if delta:
+                f.write(json.dumps({'t': time.perf_counter() - inicio, 'delta': delta}, ensure_ascii=False) + "\n")
+
+
+# --- ESTRATEGIAS ---
+def por_comas(eventos):
+    """La de asistente_gui.py: vacía el buffer si el delta trae puntuación"""
+    salida, buffer = [], ""
+    for t, delta in eventos:
+        buffer += delta
+        if any(p in delta for p in ['.', '!', '?', ',', '\n']) and len(buffer.strip()) > 1:
+            salida.append((t, buffer.strip()))
+            buffer = ""
+    if buffer.strip():
+        salida.append((eventos[-1][0], buffer.strip()))
+    return salida
+
+
+def por_regex(eventos):
+    """La de asistente_voz.py: re.split sobre el buffer acumulado"""
+    salida, buffer = [], ""
+    for t, delta in eventos:
+        buffer += delta
+        if any(p in delta for p in ['.', '!', '?', '\n']):
+            partes = re.split(r'([.!?\n])', buffer)
+            for i in range(0, len(partes) - 1, 2):
+                if (partes[i] + partes[i + 1]).strip():
+                    salida.append((t, (partes[i] + partes[i + 1]).strip()))
+            buffer = partes[-1]
+    if buffer.strip():
+        salida.append((eventos[-1][0], buffer.strip()))
+    return salida
+
+
+def por_segmentador(eventos):
+    reloj = [0.0]
+    segmentador = SegmentadorFrases(reloj=lambda: reloj[0])
+    salida = []
+    for t, delta in eventos:
+        reloj[0] = t
+        salida += [(t, frase) for frase in segmentador.agregar(delta)]
+    salida += [(eventos[-1][0], frase) for frase in segmentador.terminar()]
+    return salida
+
+
+ESTRATEGIAS = {'comas': por_comas, 'regex': por_regex, 'segmentador': por_segmentador}
+
+
+# --- SIMULACIÓN ---
+def simular(trozos, coste):
+    fin_sintesis = fin_audio = 0.0
+    ttfa, huecos = None, 0.0
+    for t, frase in trozos:
+        fin_sintesis = max(t, fin_sintesis) + coste(frase)
+        empieza = max(fin_sintesis, fin_audio)
+        if ttfa is None:
+            ttfa = empieza
+        else:
+            huecos += empieza - fin_audio
+        fin_audio = empieza + len(frase) / CARACTERES_POR_SEGUNDO
+    cortes_malos = sum(
+        1 for (_, a), (_, b) in zip(trozos, trozos[1:])
+        if a[-1:].isdigit() or (a[-1:] in ".," and a[-2:-1].isdigit() and b[:1].isdigit())
+    )
+    return {'ttfa': ttfa, 'huecos': huecos, 'llamadas': len(trozos), 'cortes_malos': cortes_malos}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("streams", nargs="*", help="Ficheros .jsonl grabados con --grabar")
+    parser.add_argument("--grabar", metavar="PROMPT")
+    parser.add_argument("-o", "--salida", default="stream.jsonl")
+    parser.add_argument("--modelo", default="llama3.2")
+    parser.add_argument("--tokens-por-segundo", type=float, default=30.0)
+    parser.add_argument("--latencia-primero", type=float, default=0.25)
+    parser.add_argument("--coste-fijo", type=float, default=0.15)
+    parser.add_argument("--coste-caracter", type=float, default=0.004)
+    parser.add_argument("--tts", help="Medir con un motor real de tts.py (espeak, piper...)")
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    if args.grabar:
+        grabar(args.grabar, args.salida, args.modelo)
+        print(f"Stream guardado en {args.salida}")
+        return
+
+    if args.streams:
+        streams = {os.path.basename(r): leer_stream(r) for r in args.streams}
+    else:
+        streams = {f"sintetico_{i}": stream_sintetico(t, args.tokens_por_segundo, args.latencia_primero)
+                   for i, t in enumerate(TEXTOS_SINTETICOS)}
+
+    if args.tts:
+        from tts import crear_motor_tts
+        motor = crear_motor_tts(args.tts)
+        costes = {}
+
+        def coste(frase):
+            if frase not in costes:
+                t = time.perf_counter()
+                motor.sintetizar(frase)
+                costes[frase] = time.perf_counter() - t
+            return costes[frase]
+    else:
+        def coste(frase):
+            return args.coste_fijo + args.coste_caracter * len(frase)
+
+    resultados = {}
+    print(f"{'estrategia':>12} | {'TTFA':>7} | {'huecos':>7} | llamadas | cortes malos")
+    for nombre, estrategia in ESTRATEGIAS.items():
+        filas = {s: simular(estrategia(eventos), coste) for s, eventos in streams.items()}
+        resultados[nombre] = filas
+        media = {k: np.mean([f[k] for f in filas.values()]) for k in ('ttfa', 'huecos', 'llamadas')}
+        malos = sum(f['cortes_malos'] for f in filas.values())
+        print(f"{nombre:>12} | {media['ttfa']:6.2f}s | {media['huecos']:6.2f}s | "
+              f"{media['llamadas']:8.1f} | {malos}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
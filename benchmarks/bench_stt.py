@@ -0,0 +1,97 @@
+"""Benchmark de motores STT reproduciendo ficheros WAV.
+
+Cada WAV (mono, 16 bits; se re-muestrea a 16 kHz si hace falta) se trocea en
+fragmentos como los del micrófono y se pasa por cada motor. Se mide:
+
+- RTF (factor de tiempo real): tiempo de CPU del motor / duración del audio.
+- Finalización: ms desde el último fragmento hasta tener el texto definitivo,
+  que es lo que espera el usuario tras dejar de hablar.
+- Primer parcial: ms de audio hasta la primera hipótesis parcial.
+
+Con ``--tiempo-real`` los fragmentos se entregan al ritmo del audio, como en
+vivo. Los WAV no se incluyen en el repo: graba unas frases y pásalas. Uso:
+
+    python benchmarks/bench_stt.py frases/*.wav --motores vosk whisper
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from stt import FRECUENCIA_STT, crear_motor
+
+MS_FRAGMENTO = 64   # Tamaño aproximado de los fragmentos de speech_recognition (1024 muestras)
+
+
+def leer_wav(ruta, frecuencia=FRECUENCIA_STT):
+    with wave.open(ruta, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{ruta}: se esperan muestras de 16 bits")
+        muestras = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        if w.getnchannels() > 1:
+            muestras = muestras.reshape(-1, w.getnchannels()).mean(axis=1).astype(np.int16)
+        origen = w.getframerate()
+    if origen != frecuencia:
+        posiciones = np.arange(0, len(muestras), origen / frecuencia)
+        muestras = np.interp(posiciones, np.arange(len(muestras)), muestras).astype(np.int16)
+    return muestras.tobytes()
+
+
+def medir(motor, pcm, tiempo_real):
+    bytes_fragmento = int(motor.frecuencia * MS_FRAGMENTO / 1000) * 2
+    duracion = len(pcm) / 2 / motor.frecuencia
+    sesion = motor.nueva_sesion()
+    cpu, primer_parcial = 0.0, None
+    for inicio in range(0, len(pcm), bytes_fragmento):
+        t = time.perf_counter()
+        parcial = sesion.alimentar(pcm[inicio:inicio + bytes_fragmento])
+        cpu += time.perf_counter() - t
+        if parcial and primer_parcial is None:
+            primer_parcial = inicio / 2 / motor.frecuencia * 1000
+        if tiempo_real:
+            time.sleep(max(0.0, MS_FRAGMENTO / 1000 - (time.perf_counter() - t)))
+    t = time.perf_counter()
+    texto = sesion.finalizar()
+    final = time.perf_counter() - t
+    return {
+        'rtf': (cpu + final) / duracion,
+        'finalizacion_ms': final * 1000,
+        'primer_parcial_ms': primer_parcial,
+        'texto': texto,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--motores", nargs="+", default=["vosk", "whisper"])
+    parser.add_argument("--tiempo-real", action="store_true")
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    audios = {os.path.basename(r): leer_wav(r) for r in args.wavs}
+    resultados = {}
+    for nombre in args.motores:
+        motor = crear_motor(nombre, respaldo=None)
+        filas = {wav: medir(motor, pcm, args.tiempo_real) for wav, pcm in audios.items()}
+        resultados[nombre] = filas
+        print(f"\n== {nombre} ==")
+        for wav, r in filas.items():
+            parcial = f"{r['primer_parcial_ms']:.0f}" if r['primer_parcial_ms'] is not None else "-"
+            print(f"{wav:>24} | RTF {r['rtf']:.2f} | final {r['finalizacion_ms']:6.0f} ms | "
+                  f"1er parcial {parcial:>5} ms | {r['texto']}")
+        print(f"{'media':>24} | RTF {np.mean([r['rtf'] for r in filas.values()]):.2f} | "
+              f"final {np.mean([r['finalizacion_ms'] for r in filas.values()]):6.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Prueba de carga del servidor multi-sesión (asistente_gui.py).
+
+Simula N clientes Socket.IO, cada uno con su propio ``usuario`` (y por tanto
+su memoria y su sala), que envían mensajes de texto (o audio/capturas si se
+pasan ficheros) con una pausa entre turnos. Mide por turno:
+
+- TTFT: segundos desde el envío hasta el primer ``stream_delta``.
+- Total: segundos hasta el ``stream_end``.
+- Rechazos: turnos respondidos con estado ``busy`` (back-pressure).
+
+Al final muestra el estado de ``/sesiones`` (sesiones vivas y planificador).
+Necesita el cliente de python-socketio (``pip install "python-socketio[client]"``).
+Con un Ollama real o el simulado (``python ollama_simulado.py`` y
+``OLLAMA_HOST=http://127.0.0.1:11434`` al arrancar el servidor):
+
+    python benchmarks/carga_sesiones.py --clientes 20 --turnos 5 --url http://127.0.0.1:5000
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import socketio
+
+PREGUNTAS = [
+    "¿Qué estoy viendo en la pantalla?",
+    "Me llamo {usuario}, ¿te acuerdas de mí?",
+    "Cuéntame algo curioso en una frase.",
+    "¿Qué me recomiendas hacer ahora?",
+]
+
+
+class ClienteSimulado:
+    def __init__(self, url, usuario, turnos, pausa, captura=None, wav=None, timeout=60):
+        self.url = url
+        self.usuario = usuario
+        self.turnos = turnos
+        self.pausa = pausa
+        self.captura = captura
+        self.wav = wav
+        self.timeout = timeout
+        self.resultados = []    # (ttft, total) por turno completado
+        self.rechazos = 0
+        self.fallos = 0
+        self._sio = socketio.Client(reconnection=False)
+        self._fin = threading.Event()
+        self._envio = 0.0
+        self._primer_delta = None
+        self._sio.on('stream_delta', self._al_delta)
+        self._sio.on('stream_end', self._al_fin)
+        self._sio.on('update_status', self._al_estado)
+
+    def _al_delta(self, datos):
+        if self._primer_delta is None:
+            self._primer_delta = time.perf_counter()
+
+    def _al_fin(self, datos):
+        ahora = time.perf_counter()
+        ttft = (self._primer_delta or ahora) - self._envio
+        self.resultados.append((ttft, ahora - self._envio))
+        self._fin.set()
+
+    def _al_estado(self, datos):
+        if datos.get('state') == 'busy':
+            self.rechazos += 1
+            self._fin.set()
+
+    def ejecutar(self):
+        try:
+            self._sio.connect(self.url, auth={'usuario': self.usuario}, transports=['websocket'])
+        except Exception as e:
+            print(f"{self.usuario}: no conecta ({e})")
+            self.fallos = self.turnos
+            return
+        for i in range(self.turnos):
+            self._fin.clear()
+            self._primer_delta = None
+            if self.captura:
+                self._sio.emit('captura', {'imagen': self.captura})
+            self._envio = time.perf_counter()
+            if self.wav:
+                self._sio.emit('audio', {'wav': self.wav})
+            else:
+                texto = PREGUNTAS[i % len(PREGUNTAS)].format(usuario=self.usuario)
+                self._sio.emit('texto', {'texto': texto})
+            if not self._fin.wait(self.timeout):
+                self.fallos += 1
+            time.sleep(self.pausa)
+        self._sio.disconnect()
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clientes", type=int, default=10)
+    parser.add_argument("--turnos", type=int, default=3)
+    parser.add_argument("--pausa", type=float, default=1.0, help="Segundos entre turnos de un cliente")
+    parser.add_argument("--escalonado", type=float, default=0.1, help="Segundos entre arranques de clientes")
+    parser.add_argument("--captura", help="JPEG/PNG que cada cliente sube antes de preguntar")
+    parser.add_argument("--wav", help="Frase WAV que se envía como audio en vez de texto")
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    captura = open(args.captura, 'rb').read() if args.captura else None
+    wav = open(args.wav, 'rb').read() if args.wav else None
+    clientes = [ClienteSimulado(args.url, f"carga-{i}", args.turnos, args.pausa, captura, wav)
+                for i in range(args.clientes)]
+    hilos = []
+    inicio = time.perf_counter()
+    for cliente in clientes:
+        hilo = threading.Thread(target=cliente.ejecutar, daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+        time.sleep(args.escalonado)
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    ttft = [r[0] for c in clientes for r in c.resultados]
+    total = [r[1] for c in clientes for r in c.resultados]
+    resumen = {
+        'clientes': args.clientes,
+        'turnos_completados': len(total),
+        'rechazos': sum(c.rechazos for c in clientes),
+        'fallos': sum(c.fallos for c in clientes),
+        'turnos_por_segundo': len(total) / duracion,
+        'ttft_p50': percentil(ttft, 50), 'ttft_p95': percentil(ttft, 95),
+        'total_p50': percentil(total, 50), 'total_p95': percentil(total, 95),
+        # Equidad: diferencia entre el cliente mejor y peor servido
+        'ttft_medio_por_cliente_min': min((np.mean([r[0] for r in c.resultados]) for c in clientes if c.resultados), default=float('nan')),
+        'ttft_medio_por_cliente_max': max((np.mean([r[0] for r in c.resultados]) for c in clientes if c.resultados), default=float('nan')),
+    }
+    for clave, valor in resumen.items():
+        print(f"{clave:>28}: {valor:.3f}" if isinstance(valor, float) else f"{clave:>28}: {valor}")
+
+    try:
+        with urllib.request.urlopen(args.url + "/sesiones", timeout=5) as r:
+            print(json.dumps(json.load(r)['planificador'], indent=2))
+    except Exception as e:
+        print(f"/sesiones no disponible: {e}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""Benchmark de regresión del bucle completo del asistente, sin hardware.
+
+Arranca un Ollama simulado (``ollama_simulado.py``) con tokens enlatados y
+retardos configurables y conduce la lógica real de los turnos:
+
+- ``--asistente gui`` (por defecto): la sesión local de ``asistente_gui``.
+  Con ``--audio`` los WAV pasan por ``FuenteArchivo`` -> VAD -> STT dentro
+  de ``ai_worker``, igual que el micro; sin audio, los textos van directos
+  a ``iniciar_turno`` (rápido, para series de miles de turnos).
+- ``--asistente voz``: el turno de ``asistente_voz.atender``.
+
+La pantalla son capturas guardadas (``--capturas``, si no una sintética) y
+la voz un motor mudo que tarda lo que duraría la frase. El STT por defecto
+devuelve la transcripción de ``<wav>.txt`` (una frase por WAV); con
+``--stt vosk`` o ``whisper`` se usa el motor real. Mide los percentiles de
+cada etapa, turnos por minuto y el crecimiento de memoria (RSS y, con
+``--tracemalloc``, dónde crece), y guarda todo en JSON. ``--comparar``
+contrasta con un JSON anterior y sale con código 1 si algo empeora más de
+``--tolerancia``. Uso:
+
+    python benchmarks/replay.py --turnos 200 --json base.json
+    python benchmarks/replay.py --audio frases/*.wav --capturas capturas/*.png --json audio.json
+    python benchmarks/replay.py --turnos 5000 --retardo-token 0 --retardo-primer-token 0 --sin-voz --json soak.json
+    python benchmarks/replay.py --turnos 200 --comparar base.json --json nuevo.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+from audio_entrada import FuenteArchivo, leer_wav
+from captura import CapturadorArchivos
+from metricas import RegistroMetricas, TrazaTurno
+from ollama_simulado import ServidorOllamaSimulado
+from stt import MotorSTT, SesionSTT, crear_motor
+from tts import AudioVoz, CacheAudio, MotorTTS, VozEnCola
+
+PREGUNTAS = [
+    "¿Qué estoy viendo en la pantalla?",
+    "Me llamo Ana, ¿te acuerdas de mí?",
+    "¿Qué hace esta función de Python?",
+    "Cuéntame algo curioso en una frase.",
+    "¿Qué me recomiendas hacer ahora?",
+]
+SEGUNDOS_POR_CARACTER = 0.06   # Ritmo aproximado de la voz sintetizada
+
+
+# --- ENTRADAS Y SALIDAS SIMULADAS ---
+class _SesionTranscripcion(SesionSTT):
+    def __init__(self, motor):
+        self.motor = motor
+
+    def alimentar(self, pcm):
+        return None
+
+    def finalizar(self):
+        time.sleep(self.motor.retardo)
+        return self.motor.siguiente()
+
+
+class MotorTranscripciones(MotorSTT):
+    """STT que devuelve, en orden, las transcripciones de los WAV reproducidos"""
+    nombre = "transcripciones"
+
+    def __init__(self, textos, retardo=0.0):
+        self.textos = list(textos)
+        self.retardo = retardo
+        self._i = 0
+        self._lock = threading.Lock()
+
+    def siguiente(self):
+        with self._lock:
+            texto = self.textos[self._i % len(self.textos)]
+            self._i += 1
+            return texto
+
+    def nueva_sesion(self):
+        return _SesionTranscripcion(self)
+
+
+class MotorMudo(MotorTTS):
+    """Silencio de la duración que tendría la frase"""
+    nombre = "mudo"
+
+    def __init__(self, velocidad=1.0, frecuencia=16000):
+        self.velocidad = velocidad
+        self.frecuencia = frecuencia
+
+    def sintetizar(self, texto):
+        muestras = int(len(texto) * SEGUNDOS_POR_CARACTER / self.velocidad * self.frecuencia)
+        return AudioVoz(bytes(2 * muestras), self.frecuencia)
+
+
+class SalidaNula:
+    """Altavoz que no suena pero tarda lo que dura el audio (y se puede cortar)"""
+
+    def reproducir(self, audio, cortar=None):
+        fin = time.monotonic() + audio.duracion
+        while time.monotonic() < fin:
+            if cortar is not None and cortar():
+                return False
+            time.sleep(min(0.02, max(0.0, fin - time.monotonic())))
+        return True
+
+
+def transcripcion(ruta_wav):
+    ruta = os.path.splitext(ruta_wav)[0] + ".txt"
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def captura_sintetica(carpeta):
+    """PNG con bloques de colores y texto, por si no se pasan capturas"""
+    from PIL import Image, ImageDraw
+    imagen = Image.new("RGB", (1920, 1080), (30, 30, 30))
+    dibujo = ImageDraw.Draw(imagen)
+    for i in range(40):
+        dibujo.rectangle((40, 40 + i * 25, 40 + (i * 37) % 900 + 200, 58 + i * 25), fill=(90 + i * 3, 160, 220 - i * 2))
+        dibujo.text((1000, 40 + i * 25), f"def funcion_{i}(x): return x * {i}", fill=(220, 220, 220))
+    ruta = os.path.join(carpeta, "captura_sintetica.png")
+    imagen.save(ruta)
+    return ruta
+
+
+# --- MEDIDAS ---
+def rss_mb():
+    """Memoria residente actual (Linux); en otros sistemas, el pico"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+
+def resumen_etapas(etapas):
+    return {etapa: {
+        'p50_ms': float(np.percentile(valores, 50)) * 1000,
+        'p95_ms': float(np.percentile(valores, 95)) * 1000,
+        'p99_ms': float(np.percentile(valores, 99)) * 1000,
+        'media_ms': float(np.mean(valores)) * 1000,
+        'max_ms': float(np.max(valores)) * 1000,
+        'n': len(valores),
+    } for etapa, valores in sorted(etapas.items()) if valores}
+
+
+class Medidor:
+    """Reúne las trazas de los turnos y muestrea la memoria cada ``cada`` turnos"""
+
+    def __init__(self, calentamiento, cada, tracemalloc_activo):
+        self.calentamiento = calentamiento
+        self.cada = max(1, cada)
+        self.tracemalloc = tracemalloc_activo
+        self.turnos = 0
+        self.etapas = {}
+        self.muestras = []      # (turno, rss en MB)
+        self.inicio = None
+        self.rss_inicio = None
+        self._foto = None
+        if not calentamiento:
+            self._empezar()
+
+    def _empezar(self):
+        # Lo anterior (cargas de modelos, primeras capturas) no cuenta
+        self.inicio = time.perf_counter()
+        self.rss_inicio = rss_mb()
+        if self.tracemalloc:
+            self._foto = tracemalloc.take_snapshot()
+
+    def turno(self, traza):
+        self.turnos += 1
+        if self.turnos <= self.calentamiento:
+            if self.turnos == self.calentamiento:
+                self._empezar()
+            return
+        if traza is not None:
+            for etapa, segundos in traza.informe()['etapas'].items():
+                self.etapas.setdefault(etapa, []).append(segundos)
+        if (self.turnos - self.calentamiento) % self.cada == 0:
+            self.muestras.append((self.turnos, rss_mb()))
+
+    def resultados(self):
+        medidos = self.turnos - self.calentamiento
+        duracion = time.perf_counter() - self.inicio if self.inicio else 0.0
+        rss_fin = rss_mb()
+        resultado = {
+            'turnos_medidos': max(0, medidos),
+            'duracion_s': duracion,
+            'turnos_por_minuto': medidos / duracion * 60 if duracion else 0.0,
+            'etapas': resumen_etapas(self.etapas),
+            'memoria': {
+                'rss_inicio_mb': self.rss_inicio,
+                'rss_fin_mb': rss_fin,
+                'crecimiento_kb_por_turno': (rss_fin - self.rss_inicio) * 1024 / medidos
+                if self.rss_inicio is not None and medidos > 0 else None,
+                'muestras': self.muestras,
+            },
+        }
+        if self._foto is not None:
+            cambios = tracemalloc.take_snapshot().compare_to(self._foto, 'lineno')[:10]
+            resultado['memoria']['mayor_crecimiento'] = [
+                {'donde': str(c.traceback), 'kb': c.size_diff / 1024, 'bloques': c.count_diff} for c in cambios
+            ]
+        return resultado
+
+
+# --- CONDUCTORES ---
+def esperar_fin_turno(sesion, medidor, ultima):
+    """Espera a que termine el turno en curso (y su voz) y registra su traza una vez"""
+    if sesion.turno_actual is not None:
+        try:
+            sesion.turno_actual.result()
+        except Exception as e:
+            print(f"Error turno: {e}", file=sys.__stdout__)
+    if sesion.voz is not None:
+        sesion.cola_voz.join()
+        sesion.voz_libre.wait()
+    # Una frase que no se entendió no abre turno: la traza sigue siendo la anterior
+    if sesion.traza is not None and sesion.traza is not ultima[0]:
+        ultima[0] = sesion.traza
+        medidor.turno(sesion.traza)
+
+
+def ejecutar_gui(args, capturas, wavs, motor, textos, medidor):
+    import asistente_gui as g
+    g.capturador = CapturadorArchivos(capturas, tamano_modelo=(800, 450), tamano_ui=(450, 250),
+                                      conservar_completa=bool(g.MOTOR_OCR))
+    sesion = g.preparar_sesion_local()
+    if args.vigilante:
+        g.iniciar_vigilante(sesion, intervalo=args.vigilante)
+    if not args.sin_voz:
+        g.cache_audio = CacheAudio(MotorMudo(args.velocidad))
+        g.iniciar_voz(sesion, SalidaNula())
+    ultima = [None]
+
+    if wavs:
+        rutas = [wavs[i % len(wavs)] for i in range(args.turnos)]
+        fuente = FuenteArchivo(rutas, motor.frecuencia, velocidad=args.velocidad,
+                               esperar_turno=lambda: esperar_fin_turno(sesion, medidor, ultima))
+        g.ai_worker(sesion, fuente, motor)
+    else:
+        for i in range(args.turnos):
+            g.iniciar_turno(sesion, textos[i % len(textos)])
+            esperar_fin_turno(sesion, medidor, ultima)
+    esperar_fin_turno(sesion, medidor, ultima)
+    estado = {
+        'historial': len(sesion.memoria['historial_corto']),
+        'datos_aprendidos': len(sesion.memoria['datos_aprendidos']),
+        'indice': len(sesion.indice),
+        'cache_vision': sesion.cache_vision.estadisticas(),
+        'planificador': g.planificador.estadisticas(),
+        'aprendizaje': g.lotes_aprendizaje.estadisticas(),
+        'vigilante': sesion.vigilante.estadisticas() if sesion.vigilante is not None else None,
+        'metricas_registro': {e: r for e, r in g.metricas.resumen('raid_etapa_segundos', 'etapa').items()
+                              if e not in medidor.etapas},
+    }
+    sesion.cerrar()
+    return estado
+
+
+def ejecutar_voz(args, capturas, wavs, motor, textos, medidor):
+    import asistente_voz as v
+    v.capturador = CapturadorArchivos(capturas, tamano_modelo=(1280, 720), calidad_modelo=70)
+    registro = RegistroMetricas()
+    traza = None
+
+    def al_hablar():
+        if traza is not None:
+            traza.marcar('primer_audio')
+
+    if not args.sin_voz:
+        VozEnCola(MotorMudo(args.velocidad), v.cola_voz, al_hablar=al_hablar,
+                  salida=SalidaNula()).iniciar()
+    for i in range(args.turnos):
+        traza = TrazaTurno(registro)
+        if wavs:
+            pcm = leer_wav(wavs[i % len(wavs)], motor.frecuencia).tobytes()
+            traza.marcar('vad_fin')
+            prompt = motor.transcribir(pcm)
+            traza.marcar('stt')
+        else:
+            prompt = textos[i % len(textos)]
+        v.atender(prompt, traza)
+        if args.sin_voz:
+            while not v.cola_voz.empty():
+                v.cola_voz.get_nowait()
+                v.cola_voz.task_done()
+        else:
+            v.cola_voz.join()
+        medidor.turno(traza)
+    return {}
+
+
+# --- COMPARACIÓN ---
+def comparar(base, nuevo, tolerancia):
+    """Imprime las diferencias; devuelve las regresiones que superan la tolerancia"""
+    regresiones = []
+
+    def fila(nombre, antes, ahora, mayor_es_mejor=False):
+        if not antes or ahora is None:
+            return
+        cambio = (ahora - antes) / antes
+        peor = -cambio if mayor_es_mejor else cambio
+        marca = "  <-- REGRESIÓN" if peor > tolerancia else ""
+        print(f"{nombre:>32}: {antes:10.1f} -> {ahora:10.1f} ({cambio:+.0%}){marca}")
+        if marca:
+            regresiones.append(nombre)
+
+    print(f"\nComparación con {base.get('commit') or 'base'}:")
+    fila("turnos/min", base['turnos_por_minuto'], nuevo['turnos_por_minuto'], mayor_es_mejor=True)
+    for etapa, r in nuevo['etapas'].items():
+        anterior = base['etapas'].get(etapa)
+        if anterior:
+            fila(f"{etapa} p50 ms", anterior['p50_ms'], r['p50_ms'])
+            fila(f"{etapa} p95 ms", anterior['p95_ms'], r['p95_ms'])
+    fila("crecimiento KB/turno", base['memoria']['crecimiento_kb_por_turno'],
+         nuevo['memoria']['crecimiento_kb_por_turno'])
+    return regresiones
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--asistente", choices=["gui", "voz"], default="gui")
+    parser.add_argument("--turnos", type=int, default=100)
+    parser.add_argument("--calentamiento", type=int, default=3, help="Turnos iniciales que no se miden")
+    parser.add_argument("--audio", nargs="+", help="WAVs de frases (con su transcripción en <wav>.txt)")
+    parser.add_argument("--capturas", nargs="+", help="Capturas PNG/JPEG que se usan en ronda")
+    parser.add_argument("--textos", help="Fichero con una pregunta por línea (modo sin audio)")
+    parser.add_argument("--stt", default="transcripciones", help="transcripciones, vosk, whisper o google")
+    parser.add_argument("--retardo-stt", type=float, default=0.0, help="Segundos del STT simulado por frase")
+    parser.add_argument("--velocidad", type=float, default=1.0, help="Aceleración del audio y de la voz")
+    parser.add_argument("--sin-voz", action="store_true", help="No sintetizar ni esperar a la voz")
+    parser.add_argument("--vigilante", type=float, metavar="SEGUNDOS",
+                        help="Activar el vigilante de pantalla con este intervalo (solo gui)")
+    parser.add_argument("--retardo-primer-token", type=float, default=0.15)
+    parser.add_argument("--retardo-token", type=float, default=0.02)
+    parser.add_argument("--retardo-carga", type=float, default=0.5)
+    parser.add_argument("--retardo-embed", type=float, default=0.01)
+    parser.add_argument("--muestreo", type=int, help="Turnos entre muestras de memoria (por defecto 20 muestras)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Dónde crece la memoria (más lento)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida del asistente")
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    args = parser.parse_args()
+
+    wavs = [os.path.abspath(r) for r in args.audio or []]
+    if wavs and args.stt == "transcripciones":
+        textos = [transcripcion(r) for r in wavs]
+        if None in textos:
+            parser.error("falta <wav>.txt con la transcripción (o usa --stt vosk/whisper)")
+    elif args.textos:
+        with open(args.textos, encoding='utf-8') as f:
+            textos = [linea.strip() for linea in f if linea.strip()]
+    else:
+        textos = PREGUNTAS
+    args.json = args.json and os.path.abspath(args.json)
+    args.comparar = args.comparar and os.path.abspath(args.comparar)
+
+    motor = None
+    if wavs:
+        # Antes de cambiar de carpeta: los modelos de Vosk/Piper van con rutas relativas
+        motor = MotorTranscripciones(textos, args.retardo_stt) if args.stt == "transcripciones" else \
+            crear_motor(args.stt, respaldo=None)
+
+    simulado = ServidorOllamaSimulado(0, args.retardo_primer_token, args.retardo_token,
+                                      args.retardo_carga, args.retardo_embed).iniciar()
+    os.environ["OLLAMA_HOST"] = simulado.url
+
+    # Memoria, índice y caches del asistente van a una carpeta temporal
+    carpeta = tempfile.mkdtemp(prefix="raid-replay-")
+    capturas = [os.path.abspath(r) for r in args.capturas] if args.capturas else [captura_sintetica(carpeta)]
+    directorio = os.getcwd()
+    os.chdir(carpeta)
+    if args.tracemalloc:
+        tracemalloc.start()
+    medidor = Medidor(args.calentamiento, args.muestreo or args.turnos // 20, args.tracemalloc)
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    try:
+        with salida:
+            ejecutar = ejecutar_gui if args.asistente == "gui" else ejecutar_voz
+            estado = ejecutar(args, capturas, wavs, motor, textos, medidor)
+    finally:
+        os.chdir(directorio)
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    resultados = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': vars(args),
+        **medidor.resultados(),
+        'estado_final': estado,
+        'ollama_simulado': simulado.estadisticas(),
+    }
+    simulado.detener()
+
+    print(f"{resultados['turnos_medidos']} turnos en {resultados['duracion_s']:.1f} s: "
+          f"{resultados['turnos_por_minuto']:.1f} turnos/min")
+    for etapa, r in resultados['etapas'].items():
+        print(f"{etapa:>14} | p50 {r['p50_ms']:8.1f} ms | p95 {r['p95_ms']:8.1f} ms | "
+              f"p99 {r['p99_ms']:8.1f} ms | n {r['n']}")
+    memoria = resultados['memoria']
+    print(f"RSS {memoria['rss_inicio_mb'] or 0:.1f} -> {memoria['rss_fin_mb']:.1f} MB "
+          f"({memoria['crecimiento_kb_por_turno'] or 0:.1f} KB/turno)")
+    for c in memoria.get('mayor_crecimiento', []):
+        print(f"  {c['kb']:9.1f} KB  {c['donde']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            if comparar(json.load(f), resultados, args.tolerancia):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+# --- CONFIGURACIÓN ---
+TAMANO_HASH = 8          # dHash de 8x8 = 64 bits
+UMBRAL_HAMMING = 6       # Bits distintos tolerados para considerar "la misma pantalla"
+MAX_ENTRADAS = 64
+TTL_SEGUNDOS = 300
+
+
+def calcular_dhash(img, tamano=TAMANO_HASH):
+    """Hash perceptual por diferencias (dHash) de una imagen PIL, como entero de 64 bits"""
+    gris = img.convert("L").resize((tamano + 1, tamano), Image.BILINEAR)
+    pixeles = gris.tobytes()
+    ancho = tamano + 1
+    huella = 0
+    for fila in range(tamano):
+        base = fila * ancho
+        for col in range(tamano):
+            huella = (huella << 1) | (pixeles[base + col] > pixeles[base + col + 1])
+    return huella
+
+
+def distancia_hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class CacheVision:
+    """Cache de descripciones visuales indexada por hash perceptual.
+
+    Una pantalla casi idéntica (distancia de Hamming <= umbral) reutiliza la
+    descripción guardada en lugar de volver a llamar al modelo de visión.
+    Expulsa por LRU y por antigüedad (TTL) y puede persistir en disco.
+    """
+
+    def __init__(self, umbral=UMBRAL_HAMMING, max_entradas=MAX_ENTRADAS,
+                 ttl=TTL_SEGUNDOS, ruta=None):
+        self.umbral = umbral
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.ruta = ruta
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()  # huella -> (timestamp, descripcion)
+        self._lock = threading.Lock()
+        if ruta:
+            self._cargar()
+
+    def buscar(self, huella):
+        """Devuelve la descripción de la pantalla más parecida o None"""
+        with self._lock:
+            self._expirar()
+            mejor, mejor_dist = None, self.umbral + 1
+            for clave in self._entradas:
+                dist = distancia_hamming(clave, huella)
+                if dist < mejor_dist:
+                    mejor, mejor_dist = clave, dist
+                    if dist == 0:
+                        break
+            if mejor is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entradas.move_to_end(mejor)
+            return self._entradas[mejor][1]
+
+    def guardar(self, huella, descripcion):
+        with self._lock:
+            self._entradas[huella] = (time.time(), descripcion)
+            self._entradas.move_to_end(huella)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            if self.ruta:
+                self._volcar()
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': self.hits / total if total else 0.0,
+            'entradas': len(self._entradas),
+            'umbral': self.umbral
+        }
+
+    def _expirar(self):
+        if not self.ttl:
+            return
+        limite = time.time() - self.ttl
+        for clave in [c for c, (ts, _) in self._entradas.items() if ts < limite]:
+            del self._entradas[clave]
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            for clave, (ts, descripcion) in datos.items():
+                self._entradas[int(clave, 16)] = (ts, descripcion)
+            self._expirar()
+        except Exception as e:
+            print(f"Error cache visión: {e}")
+
+    def _volcar(self):
+        # Escritura atómica: un fallo a mitad nunca deja el fichero corrupto
+        temporal = self.ruta + ".tmp"
+        datos = {f"{clave:016x}": list(valor) for clave, valor in self._entradas.items()}
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
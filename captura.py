@@ -0,0 +1,298 @@
+import io
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# --- CONFIGURACIÓN ---
+TAMANO_MODELO = (800, 450)    # Lo que recibe el modelo de visión
+TAMANO_UI = (450, 250)        # Miniatura para el dashboard
+CALIDAD_MODELO = 85
+CALIDAD_UI = 50
+MAX_HILOS_MONITORES = 4       # Monitores que se capturan y codifican a la vez
+
+
+class Captura:
+    """Resultado de una captura: JPEGs listos para enviar y la imagen reducida"""
+    __slots__ = ('jpeg_modelo', 'jpeg_ui', 'imagen', 'region', 'tiempos', 'completa', 'monitor', 'ventana')
+
+    def __init__(self, jpeg_modelo, jpeg_ui, imagen, region):
+        self.jpeg_modelo = jpeg_modelo
+        self.jpeg_ui = jpeg_ui
+        self.imagen = imagen
+        self.region = region    # Geometría capturada (left/top/width/height en el escritorio virtual)
+        self.tiempos = {}       # Segundos de 'captura' (grab) y 'codificacion' (reducir + JPEG)
+        self.completa = None    # RGB a resolución real, solo con conservar_completa (OCR)
+        self.monitor = None     # Índice de mss del monitor (None: imagen subida)
+        self.ventana = False    # True si es solo la ventana activa
+
+    def geometria(self):
+        """Metadatos de dónde salió la captura, para la UI y el prompt"""
+        datos = {'monitor': self.monitor, 'ventana': self.ventana}
+        if self.region is not None:
+            datos.update({k: self.region[k] for k in ('left', 'top', 'width', 'height')})
+        return datos
+
+    def etiqueta(self):
+        """Nombre legible: 'Monitor 2 (1920x1080 en 1920,0)'"""
+        if self.region is None:
+            return "Pantalla subida"
+        nombre = "Ventana activa" if self.ventana else f"Monitor {self.monitor}"
+        if self.ventana and self.monitor is not None:
+            nombre += f" del monitor {self.monitor}"
+        r = self.region
+        return f"{nombre} ({r['width']}x{r['height']} en {r['left']},{r['top']})"
+
+
+def _ventana_windows():
+    try:
+        import win32gui
+        izquierda, arriba, derecha, abajo = win32gui.GetWindowRect(win32gui.GetForegroundWindow())
+    except Exception:
+        return None
+    return {'left': izquierda, 'top': arriba, 'width': derecha - izquierda, 'height': abajo - arriba}
+
+
+def _ventana_x11():
+    # xdotool lee _NET_ACTIVE_WINDOW; sin gestor de ventanas (Xvfb pelado) falla y se usa el monitor
+    if not os.environ.get("DISPLAY") or shutil.which("xdotool") is None:
+        return None
+    try:
+        salida = subprocess.run(["xdotool", "getactivewindow", "getwindowgeometry", "--shell"],
+                                capture_output=True, text=True, timeout=1).stdout
+        valores = dict(linea.split("=", 1) for linea in salida.splitlines() if "=" in linea)
+        return {'left': int(valores['X']), 'top': int(valores['Y']),
+                'width': int(valores['WIDTH']), 'height': int(valores['HEIGHT'])}
+    except (OSError, subprocess.SubprocessError, KeyError, ValueError):
+        return None
+
+
+def region_ventana_activa():
+    """Rectángulo de la ventana con el foco (Windows o X11); None si no se puede obtener"""
+    region = _ventana_windows() if os.name == 'nt' else _ventana_x11()
+    if region is None or region['width'] < 16 or region['height'] < 16:
+        return None
+    return region
+
+
+def monitor_de(region, monitores):
+    """Índice de mss del monitor que contiene el centro de ``region`` (o None)"""
+    x = region['left'] + region['width'] // 2
+    y = region['top'] + region['height'] // 2
+    for indice, m in enumerate(monitores[1:], 1):
+        if m['left'] <= x < m['left'] + m['width'] and m['top'] <= y < m['top'] + m['height']:
+            return indice
+    return None
+
+
+def recortar_a(region, monitor):
+    """Parte de ``region`` dentro de ``monitor`` (una ventana puede salirse de la pantalla)"""
+    izquierda, arriba = max(region['left'], monitor['left']), max(region['top'], monitor['top'])
+    derecha = min(region['left'] + region['width'], monitor['left'] + monitor['width'])
+    abajo = min(region['top'] + region['height'], monitor['top'] + monitor['height'])
+    return {'left': izquierda, 'top': arriba, 'width': derecha - izquierda, 'height': abajo - arriba}
+
+
+def englobar(regiones):
+    """Rectángulo mínimo que contiene todas las regiones"""
+    izquierda = min(r['left'] for r in regiones)
+    arriba = min(r['top'] for r in regiones)
+    derecha = max(r['left'] + r['width'] for r in regiones)
+    abajo = max(r['top'] + r['height'] for r in regiones)
+    return {'left': izquierda, 'top': arriba, 'width': derecha - izquierda, 'height': abajo - arriba}
+
+
+def tamano_encajado(ancho, alto, maximo):
+    """Tamaño que cabe en ``maximo`` manteniendo la proporción (sin ampliar)"""
+    escala = min(maximo[0] / ancho, maximo[1] / alto, 1.0)
+    return max(1, round(ancho * escala)), max(1, round(alto * escala))
+
+
+class CapturadorPantalla:
+    """Captura de pantalla en una sola pasada y con buffers reutilizados.
+
+    Mantiene una instancia de ``mss`` por hilo (sus manejadores no se pueden
+    compartir entre hilos), envuelve el buffer BGRA sin copiarlo y reduce una
+    sola vez al tamaño del modelo; la miniatura de la UI sale de esa imagen
+    ya reducida. Los canales se reordenan sobre la imagen pequeña y los
+    ``BytesIO`` se reutilizan entre capturas.
+
+    ``region`` puede ser None (los monitores de ``monitores``), ``'ventana'``
+    (ventana activa, con los monitores como respaldo) o un dict
+    ``left/top/width/height``. ``monitores`` es un índice de mss (1 es el
+    principal), una lista de índices o ``'todos'``; con varios,
+    ``capturar_todas`` los captura y codifica a la vez en un pool de hilos
+    (Pillow suelta el GIL al reducir y codificar). Con ``conservar_completa``
+    cada Captura lleva además la imagen a resolución real (para el OCR).
+    """
+
+    def __init__(self, tamano_modelo=TAMANO_MODELO, tamano_ui=TAMANO_UI,
+                 calidad_modelo=CALIDAD_MODELO, calidad_ui=CALIDAD_UI,
+                 region=None, monitores=1, conservar_completa=False):
+        self.tamano_modelo = tamano_modelo
+        self.tamano_ui = tamano_ui
+        self.calidad_modelo = calidad_modelo
+        self.calidad_ui = calidad_ui
+        self.region = region
+        self.monitores = monitores
+        self.conservar_completa = conservar_completa
+        self._local = threading.local()
+        self._pool = None
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            from mss import mss     # Solo quien captura de verdad lo necesita (no las subidas)
+            sct = self._local.sct = mss()
+            self._local.buffer_modelo = io.BytesIO()
+            self._local.buffer_ui = io.BytesIO()
+        return sct
+
+    def indices_monitores(self, sct):
+        if self.monitores == 'todos':
+            return list(range(1, len(sct.monitors)))
+        indices = [self.monitores] if isinstance(self.monitores, int) else list(self.monitores)
+        # Un monitor desconectado no rompe la captura: se queda el principal
+        return [i for i in indices if 0 < i < len(sct.monitors)] or [1]
+
+    def objetivos(self, sct):
+        """[(monitor, región, es_ventana)] que hay que capturar ahora"""
+        if self.region == 'ventana':
+            ventana = region_ventana_activa()
+            monitor = monitor_de(ventana, sct.monitors) if ventana else None
+            if monitor is not None:
+                return [(monitor, recortar_a(ventana, sct.monitors[monitor]), True)]
+        elif isinstance(self.region, dict):
+            return [(monitor_de(self.region, sct.monitors), self.region, False)]
+        return [(i, sct.monitors[i], False) for i in self.indices_monitores(sct)]
+
+    def capturar(self):
+        """Captura del primer objetivo (la ventana activa o el primer monitor configurado)"""
+        return self._capturar_objetivo(self.objetivos(self._sct())[0])
+
+    def capturar_todas(self):
+        """Una Captura por objetivo; con varios monitores, en paralelo"""
+        objetivos = self.objetivos(self._sct())
+        if len(objetivos) == 1:
+            return [self._capturar_objetivo(objetivos[0])]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=MAX_HILOS_MONITORES, thread_name_prefix="raid-monitor")
+        return list(self._pool.map(self._capturar_objetivo, objetivos))
+
+    def _capturar_objetivo(self, objetivo):
+        monitor, region, ventana = objetivo
+        sct = self._sct()       # Cada hilo del pool tiene su propio mss
+        inicio = time.perf_counter()
+        sct_img = sct.grab(region)
+        capturado = time.perf_counter()
+        captura = self.procesar(sct_img.raw, sct_img.size, region)
+        captura.monitor = monitor
+        captura.ventana = ventana
+        captura.tiempos = {'captura': capturado - inicio, 'codificacion': time.perf_counter() - capturado}
+        return captura
+
+    def muestra(self, tamano):
+        """Miniatura en grises de la pantalla, sin codificar nada (para detectar cambios)"""
+        sct = self._sct()
+        # Con varios monitores, una sola muestra del rectángulo que los engloba
+        sct_img = sct.grab(englobar([region for _, region, _ in self.objetivos(sct)]))
+        completa = Image.frombuffer("RGBX", sct_img.size, sct_img.raw, "raw", "RGBX", 0, 1)
+        # Reducir antes de pasar a grises: el orden BGR da igual para comparar muestras entre sí
+        return completa.resize(tamano, Image.BILINEAR, reducing_gap=2.0).convert("L")
+
+    def _buffers(self):
+        if getattr(self._local, 'buffer_modelo', None) is None:
+            self._local.buffer_modelo = io.BytesIO()
+            self._local.buffer_ui = io.BytesIO()
+
+    def procesar(self, bgra, tamano, region=None):
+        """Convierte un buffer BGRA crudo en la Captura (separado para poder medirlo)"""
+        self._buffers()
+
+        # Vista sin copia del buffer de mss (BGRA leído como RGBX: el cuarto byte
+        # es relleno, así Pillow no premultiplica ni lo trata como transparencia)
+        completa = Image.frombuffer("RGBX", tamano, bgra, "raw", "RGBX", 0, 1)
+        reducida = completa.resize(tamano_encajado(*tamano, self.tamano_modelo),
+                                   Image.BILINEAR, reducing_gap=2.0)
+        b, g, r, _ = reducida.split()
+        captura = self._codificar_captura(Image.merge("RGB", (r, g, b)), region)
+        if self.conservar_completa:
+            b, g, r, _ = completa.split()
+            captura.completa = Image.merge("RGB", (r, g, b))
+        return captura
+
+    def procesar_subida(self, datos):
+        """Captura a partir de una imagen (JPEG/PNG) subida por un cliente remoto"""
+        self._buffers()
+        inicio = time.perf_counter()
+        completa = Image.open(io.BytesIO(datos))
+        if not self.conservar_completa:
+            # En JPEG, draft decodifica directamente a una escala reducida
+            completa.draft("RGB", tamano_encajado(*completa.size, self.tamano_modelo))
+        completa = completa.convert("RGB")
+        imagen = completa.resize(tamano_encajado(*completa.size, self.tamano_modelo),
+                                 Image.BILINEAR, reducing_gap=2.0)
+        captura = self._codificar_captura(imagen, None)
+        if self.conservar_completa:
+            captura.completa = completa
+        captura.tiempos = {'codificacion': time.perf_counter() - inicio}
+        return captura
+
+    def codificar_recorte(self, imagen, caja):
+        """JPEG para el modelo de una zona de la imagen a resolución real"""
+        self._buffers()
+        recorte = imagen.crop(caja)
+        recorte = recorte.resize(tamano_encajado(*recorte.size, self.tamano_modelo), Image.BILINEAR, reducing_gap=2.0)
+        return self._codificar(recorte, io.BytesIO(), self.calidad_modelo)
+
+    def _codificar_captura(self, imagen, region):
+        jpeg_modelo = self._codificar(imagen, self._local.buffer_modelo, self.calidad_modelo)
+        miniatura = imagen.resize(tamano_encajado(*imagen.size, self.tamano_ui), Image.BILINEAR)
+        jpeg_ui = self._codificar(miniatura, self._local.buffer_ui, self.calidad_ui)
+        return Captura(jpeg_modelo, jpeg_ui, imagen, region)
+
+    @staticmethod
+    def _codificar(imagen, buffer, calidad):
+        buffer.seek(0)
+        buffer.truncate()
+        imagen.save(buffer, format='JPEG', quality=calidad)
+        return buffer.getvalue()
+
+
+class CapturadorArchivos(CapturadorPantalla):
+    """Capturador que devuelve capturas guardadas (PNG/JPEG) en ronda, sin pantalla.
+
+    Para pruebas y benchmarks: los ficheros se leen una vez y cada
+    ``capturar()`` pasa el siguiente por el mismo camino que una captura
+    subida por un cliente, así que mide la misma codificación.
+    """
+
+    def __init__(self, rutas, **opciones):
+        super().__init__(**opciones)
+        self._imagenes = []
+        for ruta in ([rutas] if isinstance(rutas, str) else rutas):
+            with open(ruta, 'rb') as f:
+                self._imagenes.append(f.read())
+        if not self._imagenes:
+            raise ValueError("CapturadorArchivos necesita al menos una imagen")
+        self._siguiente = 0
+        self._lock = threading.Lock()
+
+    def capturar(self):
+        with self._lock:
+            datos = self._imagenes[self._siguiente % len(self._imagenes)]
+            self._siguiente += 1
+        return self.procesar_subida(datos)
+
+    def capturar_todas(self):
+        return [self.capturar()]
+
+    def muestra(self, tamano):
+        """Miniatura en grises de la imagen que dará la próxima ``capturar()``"""
+        with self._lock:
+            datos = self._imagenes[self._siguiente % len(self._imagenes)]
+        return Image.open(io.BytesIO(datos)).convert("L").resize(tamano, Image.BILINEAR)
@@ -1,16 +1,26 @@
 import asyncio
-import ollama
 import pyvts
-import pyttsx3
-import threading
-import random
-import time
+import queue
+from prompts import ensamblar_mensajes
+from modelos import GestorModelos
+from servicio_ollama import obtener_servicio
+from stt import crear_motor
+from tts import crear_motor_tts, VozEnCola
+from segmentador import segmentar
+from lipsync import AnimadorBoca
+from arranque import Arranque, calibrar_reconocedor
 
 # --- CONFIGURACIÓN ---
 MODELO_OLLAMA = "phi3"
 NOMBRE_IA = "Neuro-Local"
 PUERTO_VTS = 8001
 USAR_MICROFONO = True 
+MOTOR_STT = "vosk"   # 'vosk' / 'whisper' (locales) o 'google' (red)
+MOTOR_TTS = "auto"   # 'auto', 'sapi' (Windows), 'piper', 'espeak' o 'pyttsx3'
+PERSONA = 'Eres Neuro-Local, una VTuber IA graciosa, un poco loca y sarcástica como Neuro-sama. Habla en español, sé divertida, corta y responde solo 1-2 frases. A veces sé "malvada" y caótica.'
+
+servicio_ollama = obtener_servicio()
+gestor_modelos = GestorModelos({MODELO_OLLAMA: "60m"})
 
 # Intentamos importar la librería de reconocimiento de voz
 try:
@@ -20,25 +30,32 @@ except ImportError:
     HAY_MICROFONO = False
     print("⚠️ Librería 'SpeechRecognition' no encontrada. Usando modo TEXTO.")
 
-# --- INICIALIZAR VOZ (TTS) ---
-engine = pyttsx3.init()
-engine.setProperty('rate', 155) # Un poco más rápido para que hable fluido
+# --- VOZ (TTS) ---
+# La voz se sintetiza a PCM y el animador mueve la boca con ese mismo audio
+cola_voz = queue.Queue()
 
-voices = engine.getProperty('voices')
-for voice in voices:
-    if "spanish" in voice.name.lower() or "es-es" in voice.id.lower():
-        engine.setProperty('voice', voice.id)
-        break
+async def hablar(texto):
+    for frase in segmentar(texto):
+        cola_voz.put(frase)
+    # Esperar a que termine de sonar sin bloquear el bucle (el animador sigue enviando)
+    await asyncio.get_running_loop().run_in_executor(None, cola_voz.join)
 
-def hablar_tts_thread(texto):
-    try:
-        engine.say(texto)
-        engine.runAndWait()
-    except RuntimeError:
-        pass
+def preparar_microfono():
+    """Motor STT, reconocedor y micro calibrado (con la calibración guardada si es reciente)"""
+    motor_stt = crear_motor(MOTOR_STT)
+    recognizer = sr.Recognizer()
+    mic = sr.Microphone(sample_rate=motor_stt.frecuencia)
+    with mic as source:
+        if calibrar_reconocedor(recognizer, source, f"sr:{motor_stt.frecuencia}"):
+            print("Ruido de fondo calibrado (queda guardado para el próximo arranque).")
+        # Ajustes para que detecte mejor el silencio
+        recognizer.dynamic_energy_threshold = True
+        recognizer.energy_threshold = max(recognizer.energy_threshold, 300)  # Nivel mínimo de ruido para activar
+        recognizer.pause_threshold = 0.6   # Pausa corta marca el fin de la frase
+    return recognizer, mic, motor_stt
 
 # --- FUNCIÓN: OÍDO MEJORADO (SIN INTERRUPCIONES) ---
-def escuchar_usuario(recognizer, microphone):
+def escuchar_usuario(recognizer, microphone, motor_stt):
     # Usamos \r para sobreescribir la linea y no llenar la consola
     print(f"\r🎤 {NOMBRE_IA} escuchando...      ", end="", flush=True)
     
@@ -50,8 +67,10 @@ def escuchar_usuario(recognizer, microphone):
             audio = recognizer.listen(source, timeout=3, phrase_time_limit=5)
         
         print(f"\r⏳ Procesando audio...          ", end="", flush=True)
-        # Usamos Google porque es rápido y ligero
-        texto = recognizer.recognize_google(audio, language="es-ES")
+        # Reconocimiento local (sin ida y vuelta a internet)
+        texto = motor_stt.transcribir_audio(audio)
+        if not texto:
+            return None
         print(f"\n🗣️ TÚ: {texto}")
         return texto
 
@@ -72,23 +91,16 @@ async def main():
         "developer": "TuNombre",
         "authentication_token_path": "./token.txt"
     }
-    myvts = pyvts.vts(plugin_info=plugin_info)
+    vts_api_info = {"version": "1.0", "name": "VTubeStudioPublicAPI", "host": "localhost", "port": PUERTO_VTS}
+    myvts = pyvts.vts(plugin_info=plugin_info, vts_api_info=vts_api_info)
     
     print(f"--- INICIANDO {NOMBRE_IA} (MODO FLUIDO) ---")
-    
-    # Setup del Micrófono
-    recognizer = None
-    mic = None
-    if USAR_MICROFONO and HAY_MICROFONO:
-        recognizer = sr.Recognizer()
-        mic = sr.Microphone()
-        with mic as source:
-            print("Calibrando ruido de fondo (Espere 1 seg)...")
-            recognizer.adjust_for_ambient_noise(source, duration=1)
-            # Ajustes para que detecte mejor el silencio
-            recognizer.dynamic_energy_threshold = True 
-            recognizer.energy_threshold = 300  # Nivel mínimo de ruido para activar
-            recognizer.pause_threshold = 0.6   # Pausa corta marca el fin de la frase
+    # Modelo, voz y micro se preparan en hilos mientras se conecta el avatar
+    arranque = Arranque()
+    arranque.tarea('modelos', gestor_modelos.calentar, [MODELO_OLLAMA], True)
+    motor_tts = arranque.tarea('voz', crear_motor_tts, MOTOR_TTS)
+    micro = arranque.tarea('micro', preparar_microfono) if USAR_MICROFONO and HAY_MICROFONO else None
+    arranque.lanzadas(al_estar_listo=lambda a: print(a.resumen()))
     
     print("Conectando con VTube Studio...")
     try:
@@ -97,9 +109,22 @@ async def main():
         await myvts.request_authenticate()
         print("✓ Avatar conectado.")
     except Exception:
-        print("❌ Error: Abre VTube Studio primero (Puerto 8001).")
+        print(f"❌ Error: Abre VTube Studio primero (Puerto {PUERTO_VTS}).")
         return
 
+    # Setup del Micrófono
+    recognizer = None
+    mic = None
+    motor_stt = None
+    if micro is not None:
+        recognizer, mic, motor_stt = await asyncio.wrap_future(micro)
+
+    # A partir de aquí el animador es el único que usa la conexión con VTS
+    animador = AnimadorBoca(myvts)
+    tarea_boca = asyncio.create_task(animador.ejecutar())
+    VozEnCola(await asyncio.wrap_future(motor_tts), cola_voz,
+              al_callar=animador.callar, al_sonar=animador.hablar).iniciar()
+
     # 2. BUCLE INFINITO
     print("\n------------------------------------------------")
     print(f"¡Sistema Activo! Simplemente háblale.")
@@ -112,7 +137,7 @@ async def main():
         if USAR_MICROFONO and HAY_MICROFONO:
             # Ejecutamos escucha en segundo plano
             loop = asyncio.get_event_loop()
-            prompt = await loop.run_in_executor(None, escuchar_usuario, recognizer, mic)
+            prompt = await loop.run_in_executor(None, escuchar_usuario, recognizer, mic, motor_stt)
             
             # ¡LA CLAVE! Si prompt es None (silencio/ruido), volvemos al inicio INMEDIATAMENTE
             if not prompt: 
@@ -124,35 +149,28 @@ async def main():
         if prompt and prompt.lower() in ["salir", "exit", "adiós"]:
             despedida = "¡Hasta la próxima!"
             print(f"🤖 {NOMBRE_IA}: {despedida}")
-            threading.Thread(target=hablar_tts_thread, args=(despedida,)).start()
+            await hablar(despedida)
             break
 
         # B. PENSAR (OLLAMA)
         # print(f"({NOMBRE_IA} pensando...)") 
         try:
-            resp = ollama.chat(model=MODELO_OLLAMA, messages=[
-                {'role': 'system', 'content': 'Eres Neuro-Local, una VTuber IA graciosa, un poco loca y sarcástica como Neuro-sama. Habla en español, sé divertida, corta y responde solo 1-2 frases. A veces sé "malvada" y caótica.'},
-                {'role': 'user', 'content': prompt}
-            ])
+            resp = await servicio_ollama.achat(
+                model=MODELO_OLLAMA,
+                messages=ensamblar_mensajes(estables=[PERSONA], historial=[], volatiles=[], prompt=prompt),
+                keep_alive=gestor_modelos.keep_alive(MODELO_OLLAMA)
+            )
+            gestor_modelos.registrar(MODELO_OLLAMA, resp)
             texto_ia = resp['message']['content']
         except Exception:
             texto_ia = "¿Qué?"
 
         print(f"🤖 {NOMBRE_IA}: {texto_ia}")
 
-        # C. HABLAR Y ANIMAR
-        tts_thread = threading.Thread(target=hablar_tts_thread, args=(texto_ia,))
-        tts_thread.start()
-
-        # Animación de boca mientras habla
-        while tts_thread.is_alive():
-            apertura = random.uniform(0.0, 0.6)
-            await myvts.request(myvts.vts_request.requestSetParameterValue("MouthOpen", apertura))
-            await asyncio.sleep(0.1)
-            
-        await myvts.request(myvts.vts_request.requestSetParameterValue("MouthOpen", 0.0))
-        tts_thread.join()
+        # C. HABLAR (la boca sigue la amplitud real del audio)
+        await hablar(texto_ia)
 
+    tarea_boca.cancel()
     await myvts.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+import threading
+
+from memoria_vectorial import estimar_tokens
+
+# --- CONFIGURACIÓN ---
+PRESUPUESTO_HISTORIAL = 600   # Tokens de historial literal que entran en cada prompt
+MARGEN_PLEGADO = 2            # Se pliega cuando el historial crudo supera presupuesto * margen
+
+
+def tokens_mensajes(mensajes):
+    return sum(estimar_tokens(m['content']) + 4 for m in mensajes)
+
+
+class VentanaContexto:
+    """Historial que cabe en un presupuesto de tokens más un resumen acumulado.
+
+    ``mensajes()`` devuelve solo los mensajes recientes que caben en el
+    presupuesto; el resto se resume con ``resumir`` en segundo plano
+    (``plegar_si_hace_falta``) y se recorta del almacén, así que ni el prompt
+    ni la memoria en disco crecen sin límite. El resumen se guarda en la propia
+    memoria y nunca se calcula en el camino de la respuesta.
+    """
+
+    def __init__(self, almacen, resumir, presupuesto_tokens=PRESUPUESTO_HISTORIAL,
+                 margen=MARGEN_PLEGADO):
+        self.almacen = almacen
+        self.resumir = resumir
+        self.presupuesto_tokens = presupuesto_tokens
+        self.margen = margen
+        self._plegando = threading.Lock()
+
+    @property
+    def resumen(self):
+        return self.almacen.memoria['resumen_historial']
+
+    def _max_mensajes(self):
+        # Cada mensaje cuesta al menos 4 tokens: la ventana nunca pasa de estos
+        return self.presupuesto_tokens // 4 + 1
+
+    def mensajes(self, historial=None):
+        """Los mensajes más recientes que caben en el presupuesto (al menos uno)"""
+        if historial is None:
+            # Una sola copia de la cola: un plegado concurrente no mueve los índices
+            historial = self.almacen.cola_historial(self._max_mensajes())
+        usados, inicio = 0, len(historial)
+        while inicio > 0:
+            coste = tokens_mensajes([historial[inicio - 1]])
+            if usados + coste > self.presupuesto_tokens and inicio < len(historial):
+                break
+            usados += coste
+            inicio -= 1
+        return historial[inicio:]
+
+    @staticmethod
+    def _excede(historial, limite):
+        """Si el historial pasa de ``limite`` tokens, contando desde el final (sin recorrerlo entero)"""
+        usados = 0
+        for i in range(len(historial) - 1, -1, -1):
+            usados += tokens_mensajes([historial[i]])
+            if usados > limite:
+                return True
+        return False
+
+    def plegar_si_hace_falta(self):
+        """Resume los mensajes que ya no entran en la ventana y los quita del almacén"""
+        if not self._plegando.acquire(blocking=False):
+            return False
+        try:
+            historial = self.almacen.memoria['historial_corto']
+            if not self._excede(historial, self.presupuesto_tokens * self.margen):
+                return False
+            # Conservar literal solo lo que cabe en la ventana; plegar pares completos.
+            # Solo este método pliega, así que mientras tanto el historial solo crece
+            total = len(historial)
+            cola = historial[max(0, total - self._max_mensajes()):total]
+            cuantos = total - len(self.mensajes(cola))
+            cuantos -= cuantos % 2
+            if cuantos <= 0:
+                return False
+            resumen = self.resumir(self.resumen, historial[:cuantos])
+            self.almacen.plegar_historial(resumen, cuantos)
+            self.almacen.guardar()
+            return True
+        finally:
+            self._plegando.release()
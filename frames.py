@@ -0,0 +1,33 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- CONFIGURACIÓN ---
+MAX_FRAMES = 16   # Capturas recientes por sesión que se pueden pedir por HTTP
+
+
+class AlmacenFrames:
+    """Últimas capturas JPEG de una sesión, servidas por ``/frame/<sesión>/<id>``.
+
+    El id es un hash del contenido, así que sirve también como ETag y el
+    navegador puede cachear cada frame para siempre: el evento de Socket.IO
+    solo lleva la referencia, nunca la imagen.
+    """
+
+    def __init__(self, max_frames=MAX_FRAMES):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def guardar(self, jpeg):
+        frame_id = hashlib.blake2b(jpeg, digest_size=12).hexdigest()
+        with self._lock:
+            self._frames[frame_id] = jpeg
+            self._frames.move_to_end(frame_id)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return frame_id
+
+    def obtener(self, frame_id):
+        with self._lock:
+            return self._frames.get(frame_id)
@@ -0,0 +1,258 @@
+import json
+from array import array
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+ROLES = ('user', 'assistant', 'system')   # Los roles se guardan como índice en esta tabla
+MIN_COMPACTAR = 1024          # Mensajes plegados mínimos antes de liberar su hueco en la arena
+MAX_RECIENTES = 256           # Últimos mensajes que se guardan ya decodificados (la ventana del prompt)
+
+_SANGRIA = b"        "
+_PREFIJO = b'{"role": "'
+_MEDIO = b'", "content": '
+_CODIFICADOR = json.JSONEncoder(ensure_ascii=False)   # json.dumps con opciones crea uno por llamada
+_COMA, _LLAVE, _COMILLA, _SALTO = b',}"\n'
+_SALTO_B = b"\n"
+
+
+class Historial:
+    """Lista de mensajes ``{'role', 'content'}`` en una representación compacta.
+
+    El rol es un byte (índice en una tabla de roles internados) y el
+    contenido vive en una arena de bytes solo de añadir, ya escapado como
+    literal JSON: se lee con ``json.loads`` al pedirlo y se vuelca a disco
+    copiando bytes, sin pasar por objetos. No hay un dict ni un str por
+    mensaje; los dicts se crean solo para los mensajes que se piden.
+
+    Se usa como una lista: ``len``, índices, cortes, iteración, ``append``
+    y ``del historial[:n]`` (lo que hace el plegado). Lo plegado se salta
+    con un desplazamiento y la arena se compacta cuando es más de la mitad.
+    Los últimos ``MAX_RECIENTES`` mensajes se guardan además como dicts, así
+    que leer la cola para el prompt no decodifica nada. Los lectores pueden
+    ir sin lock mientras un único escritor añade: los datos se publican
+    antes que el rol, que es el que da la longitud.
+    """
+    __slots__ = ('_tabla', '_indices', '_bloque')
+
+    def __init__(self, mensajes=()):
+        self._tabla = list(ROLES)
+        self._indices = {rol: i for i, rol in enumerate(self._tabla)}
+        # (roles, inicios, arena, primero, recientes): se sustituye entero al compactar.
+        # recientes: {posición en roles: dict} de los mensajes más nuevos
+        self._bloque = (array('B'), array('Q', [0]), bytearray(), 0, {})
+        for mensaje in mensajes:
+            self.append(mensaje)
+
+    # --- ESCRITURA ---
+    def _rol(self, rol):
+        indice = self._indices.get(rol)
+        if indice is None:
+            if len(self._tabla) == 255:     # 255 queda para "sin rol" al trocear
+                raise ValueError("demasiados roles distintos")
+            indice = self._indices[rol] = len(self._tabla)
+            self._tabla.append(rol)
+        return indice
+
+    def agregar_literal(self, rol, literal, mensaje=None):
+        """Añade un mensaje cuyo contenido ya es un literal JSON (bytes con comillas)"""
+        roles, inicios, arena, _, recientes = self._bloque
+        posicion = len(roles)
+        if mensaje is not None:
+            recientes[posicion] = mensaje
+        _podar(recientes, posicion)
+        arena.extend(literal)
+        inicios.append(len(arena))
+        roles.append(self._rol(rol))
+
+    def agregar(self, rol, contenido):
+        self.agregar_literal(rol, _CODIFICADOR.encode(contenido).encode('utf-8'),
+                             {'role': rol, 'content': contenido})
+
+    def append(self, mensaje):
+        self.agregar(mensaje['role'], mensaje['content'])
+
+    def agregar_lineas(self, bloque):
+        """Añade de golpe los mensajes de ``bloque`` (líneas completas de ``lineas()``).
+
+        Las líneas se trocean con NumPy sin un objeto por mensaje; las que no
+        encajan en el patrón (un rol nuevo) pasan por ``partir_linea``. Para en
+        la primera línea que no es un mensaje y devuelve su posición en
+        ``bloque`` (``len(bloque)`` si todas lo eran).
+        """
+        datos = np.frombuffer(bloque, dtype=np.uint8)
+        fines = np.flatnonzero(datos == _SALTO)
+        comienzos = np.concatenate(([0], fines[:-1] + 1))
+        hecho = 0
+        while hecho < len(fines):
+            troceo = self._trocear_rapido(bloque, datos, comienzos, fines) if not hecho else None
+            validas, roles, desde, hasta = troceo or self._trocear(datos, comienzos[hecho:], fines[hecho:])
+            cuantas = len(validas) if validas.all() else int(np.argmin(validas))
+            self._agregar_troceadas(datos, roles[:cuantas], desde[:cuantas], hasta[:cuantas])
+            hecho += cuantas
+            if hecho == len(fines):
+                break
+            partes = partir_linea(bloque[comienzos[hecho]:fines[hecho]])
+            if partes is None:
+                return int(comienzos[hecho])
+            self.agregar_literal(*partes)
+            hecho += 1
+        return len(bloque)
+
+    def _trocear_rapido(self, bloque, datos, comienzos, fines):
+        """Como ``_trocear`` si todas las líneas son mensajes de roles conocidos, si no None.
+
+        Se comprueba contando patrones con ``bytes.count``: dentro de un literal
+        JSON no hay comillas sin escapar, así que cada '{"role": "<rol>", ...'
+        es la cabecera de una línea. Con eso basta la primera letra del rol.
+        """
+        patrones = [rol.encode('utf-8') for rol in self._tabla]
+        if len({p[:1] for p in patrones}) < len(patrones) or not all(patrones):
+            return None
+        cabecera = _SANGRIA + _PREFIJO
+        if bloque.count(_SALTO_B + cabecera) + bloque.startswith(cabecera) != len(fines) \
+                or sum(bloque.count(_PREFIJO + p + _MEDIO) for p in patrones) != len(fines):
+            return None
+        por_letra = np.full(256, 255, dtype=np.uint8)
+        largos = np.zeros(256, dtype=np.int64)
+        for indice, patron in enumerate(patrones):
+            por_letra[patron[0]] = indice
+            largos[indice] = len(patron) + len(_MEDIO)
+        inicio_rol = comienzos + len(cabecera)
+        roles = por_letra[datos[inicio_rol]]
+        desde = inicio_rol + largos[roles]
+        cierre = fines - 1 - (datos[fines - 1] == _COMA)
+        validas = (datos[cierre] == _LLAVE) & (datos[cierre - 1] == _COMILLA) & (desde < cierre)
+        return validas, roles, desde, cierre
+
+    def _trocear(self, datos, comienzos, fines):
+        """Por línea: si es un mensaje con rol conocido, su rol y dónde empieza y acaba el literal"""
+        def iguales(posiciones, patron):
+            ventana = np.minimum(posiciones[:, None] + np.arange(len(patron)), len(datos) - 1)
+            return (datos[ventana] == np.frombuffer(patron, dtype=np.uint8)).all(axis=1)
+
+        largo = fines - comienzos
+        validas = (largo > len(_SANGRIA) + len(_PREFIJO)) & iguales(comienzos, _SANGRIA + _PREFIJO)
+        # Final '"}' o '"},'
+        cierre = fines - 1 - (datos[fines - 1] == _COMA)
+        validas &= (datos[cierre] == _LLAVE) & (datos[cierre - 1] == _COMILLA)
+        roles = np.full(len(fines), 255, dtype=np.uint8)
+        desde = np.zeros(len(fines), dtype=np.int64)
+        inicio_rol = comienzos + len(_SANGRIA) + len(_PREFIJO)
+        for indice, rol in enumerate(self._tabla):
+            patron = rol.encode('utf-8') + _MEDIO
+            encaja = validas & (roles == 255) & (largo >= len(_SANGRIA) + len(_PREFIJO) + len(patron) + 2) \
+                & iguales(inicio_rol, patron)
+            roles[encaja] = indice
+            desde[encaja] = inicio_rol[encaja] + len(patron)
+        validas &= (roles != 255) & (desde < cierre)
+        return validas, roles, desde, cierre
+
+    def _agregar_troceadas(self, datos, roles_nuevos, desde, hasta):
+        if not len(roles_nuevos):
+            return
+        roles, inicios, arena, _, recientes = self._bloque
+        # Máscara de los bytes de los literales: +1 donde empieza cada uno, -1 donde acaba
+        marcas = np.zeros(len(datos) + 1, dtype=np.int8)
+        marcas[desde] = 1
+        marcas[hasta] = -1
+        _podar(recientes, len(roles) + len(roles_nuevos))
+        base = len(arena)
+        arena.extend(datos[np.cumsum(marcas[:-1], dtype=np.int8).astype(bool)])
+        inicios.frombytes((base + np.cumsum(hasta - desde)).astype(np.uint64).tobytes())
+        roles.frombytes(roles_nuevos.tobytes())
+
+    def __delitem__(self, corte):
+        if not isinstance(corte, slice) or corte.start not in (None, 0) or corte.step not in (None, 1):
+            raise TypeError("Historial solo permite borrar desde el principio (del h[:n])")
+        roles, inicios, arena, primero, recientes = self._bloque
+        primero = min(len(roles), primero + len(range(*corte.indices(len(roles) - primero))))
+        if primero >= MIN_COMPACTAR and primero * 2 >= len(roles):
+            # Bloque nuevo: quien esté leyendo el anterior lo sigue viendo entero
+            base = inicios[primero]
+            inicios = array('Q', (i - base for i in inicios[primero:]))
+            recientes = {i - primero: m for i, m in list(recientes.items()) if i >= primero}
+            roles, arena, primero = roles[primero:], arena[base:], 0
+        self._bloque = (roles, inicios, arena, primero, recientes)
+
+    def copia(self):
+        """Historial independiente con los mismos mensajes (copia de bytes, sin decodificar)"""
+        roles, inicios, arena, primero, recientes = self._bloque
+        otro = Historial()
+        otro._tabla = list(self._tabla)
+        otro._indices = dict(self._indices)
+        otro._bloque = (roles[:], inicios[:], bytearray(arena), primero, dict(recientes))
+        return otro
+
+    # --- LECTURA ---
+    def __len__(self):
+        roles, _, _, primero, _ = self._bloque
+        return len(roles) - primero
+
+    def _mensaje(self, bloque, i):
+        roles, inicios, arena, primero, recientes = bloque
+        i += primero
+        mensaje = recientes.get(i)
+        if mensaje is None:
+            mensaje = {'role': self._tabla[roles[i]],
+                       'content': json.loads(arena[inicios[i]:inicios[i + 1]].decode('utf-8'))}
+            if i >= len(roles) - MAX_RECIENTES:
+                recientes[i] = mensaje
+        return mensaje
+
+    def __getitem__(self, indice):
+        bloque = self._bloque
+        total = len(bloque[0]) - bloque[3]
+        if isinstance(indice, slice):
+            # La cola (lo que se pide en cada turno) suele estar entera en recientes
+            recientes, primero = bloque[4], bloque[3]
+            return [recientes.get(i + primero) or self._mensaje(bloque, i) for i in range(*indice.indices(total))]
+        if indice < 0:
+            indice += total
+        if not 0 <= indice < total:
+            raise IndexError("índice fuera del historial")
+        return self._mensaje(bloque, indice)
+
+    def __iter__(self):
+        bloque = self._bloque
+        for i in range(len(bloque[0]) - bloque[3]):
+            yield self._mensaje(bloque, i)
+
+    def __repr__(self):
+        return f"<Historial {len(self)} mensajes, {self.bytes_ocupados()} bytes>"
+
+    def bytes_ocupados(self):
+        """Memoria de los datos (arena + roles + desplazamientos), sin la sobrecarga fija"""
+        roles, inicios, arena, _, _ = self._bloque
+        return len(arena) + roles.itemsize * len(roles) + inicios.itemsize * len(inicios)
+
+    # --- FORMATO EN DISCO ---
+    def lineas(self, sangria=b"        "):
+        """Un mensaje por línea (``{"role": ..., "content": ...}``), como bytes, sin separadores"""
+        roles, inicios, arena, primero, _ = self._bloque
+        tabla = [json.dumps(r).encode('utf-8')[1:-1] for r in self._tabla]
+        for i in range(primero, len(roles)):
+            yield b"".join((sangria, _PREFIJO, tabla[roles[i]], _MEDIO,
+                            arena[inicios[i]:inicios[i + 1]], b"}"))
+
+
+def _podar(recientes, posicion):
+    """Olvida los decodificados que ya no están entre los ``MAX_RECIENTES`` anteriores a ``posicion``"""
+    recientes.pop(posicion - MAX_RECIENTES, None)
+    # Lo que un lector guardó a la vez que se añadía se escapa del pop: barrido de vez en cuando
+    if len(recientes) > 2 * MAX_RECIENTES:
+        for i in [i for i in list(recientes) if i < posicion - MAX_RECIENTES]:
+            recientes.pop(i, None)
+
+
+def partir_linea(linea):
+    """(rol, literal del contenido) de una línea escrita por ``Historial.lineas``, o None"""
+    linea = linea.strip()
+    if linea.endswith(b","):
+        linea = linea[:-1]
+    if not (linea.startswith(_PREFIJO) and linea.endswith(b'"}')):
+        return None
+    fin_rol = linea.find(_MEDIO, len(_PREFIJO))
+    if fin_rol < 0:
+        return None
+    return linea[len(_PREFIJO):fin_rol].decode('utf-8'), linea[fin_rol + len(_MEDIO):-1]
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+FPS_LIPSYNC = 45            # Envíos por segundo a VTube Studio (30-60)
+LATENCIA_SALIDA = 0.05      # Retardo aproximado entre escribir el audio y oírlo
+RANGO_DB = 30.0             # Dinámica útil por debajo del pico de cada frase
+ATAQUE = 0.7                # Suavizado: la boca abre rápido...
+RELAJACION = 0.35           # ...y cierra algo más despacio
+ZCR_CERRADA = 0.04          # Cruces por cero típicos de vocales redondas (o, u)
+ZCR_ABIERTA = 0.20          # ...y de vocales abiertas / sibilantes (e, i, s)
+PARAMETRO_APERTURA = "MouthOpen"
+PARAMETRO_FORMA = "MouthSmile"
+
+
+def _suavizar(valores, ataque=ATAQUE, relajacion=RELAJACION):
+    salida = np.empty_like(valores)
+    actual = 0.0
+    for i, v in enumerate(valores):
+        actual += (ataque if v > actual else relajacion) * (v - actual)
+        salida[i] = actual
+    return salida
+
+
+def envolventes(audio, fps=FPS_LIPSYNC):
+    """Apertura y forma de la boca por fotograma a partir del PCM de un AudioVoz.
+
+    Apertura: RMS de cada fotograma en dB, normalizado al pico de la frase.
+    Forma: tasa de cruces por cero como aproximación barata al visema
+    (vocales redondas -> boca estrecha, abiertas/sibilantes -> sonrisa).
+    """
+    muestras = np.frombuffer(audio.pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    n = int(len(muestras) * fps / audio.frecuencia)
+    if n == 0:
+        return {PARAMETRO_APERTURA: np.zeros(0, np.float32), PARAMETRO_FORMA: np.zeros(0, np.float32)}
+    inicios = (np.arange(n) * audio.frecuencia / fps).astype(np.int64)
+    largos = np.diff(np.append(inicios, len(muestras)))
+
+    rms = np.sqrt(np.add.reduceat(muestras * muestras, inicios) / largos)
+    db = 20 * np.log10(rms + 1e-6)
+    apertura = np.clip((db - (db.max() - RANGO_DB)) / RANGO_DB, 0.0, 1.0)
+
+    cruces = np.append(np.signbit(muestras[1:]) != np.signbit(muestras[:-1]), False)
+    zcr = np.add.reduceat(cruces.astype(np.float32), inicios) / largos
+    forma = np.clip((zcr - ZCR_CERRADA) / (ZCR_ABIERTA - ZCR_CERRADA), 0.0, 1.0) * (apertura > 0.1)
+
+    return {
+        PARAMETRO_APERTURA: _suavizar(apertura.astype(np.float32)),
+        PARAMETRO_FORMA: _suavizar(forma.astype(np.float32)),
+    }
+
+
+class AnimadorBoca:
+    """Mueve la boca del avatar con la voz real a ritmo fijo sobre la conexión de pyvts.
+
+    ``hablar(audio)`` se llama desde el hilo de audio justo antes de reproducir
+    cada frase; la tarea ``ejecutar()`` envía a ``fps`` Hz un único
+    ``InjectParameterDataRequest`` con todos los parámetros del fotograma que
+    está sonando. No espera la respuesta de cada envío (otra tarea las lee),
+    así que el ritmo no depende del round trip. Mientras corre es el único
+    que usa el websocket de ``vts``.
+    """
+
+    def __init__(self, vts, fps=FPS_LIPSYNC, latencia=LATENCIA_SALIDA):
+        self.vts = vts
+        self.fps = fps
+        self.latencia = latencia
+        self.enviados = 0
+        self.errores = 0
+        self._actual = None        # (instante de inicio, envolventes); se sustituye entero
+        self._boca_cerrada = True
+
+    def hablar(self, audio):
+        env = envolventes(audio, self.fps)
+        self._actual = (time.monotonic() + self.latencia, env)
+
+    def callar(self):
+        self._actual = None
+
+    def _fotograma(self, ahora):
+        actual = self._actual
+        if actual is None:
+            return None
+        inicio, env = actual
+        k = int((ahora - inicio) * self.fps)
+        apertura = env[PARAMETRO_APERTURA]
+        if k >= len(apertura):
+            return None
+        k = max(k, 0)
+        return {nombre: float(valores[k]) for nombre, valores in env.items()}
+
+    async def _enviar(self, valores):
+        mensaje = self.vts.vts_request.BaseRequest(
+            "InjectParameterDataRequest",
+            {
+                "faceFound": False,
+                "mode": "set",
+                "parameterValues": [{"id": nombre, "value": round(v, 3)} for nombre, v in valores.items()],
+            },
+            request_id=f"boca-{self.enviados}",
+        )
+        await self.vts.websocket.send(json.dumps(mensaje))
+        self.enviados += 1
+
+    async def _leer_respuestas(self):
+        async for respuesta in self.vts.websocket:
+            datos = json.loads(respuesta)
+            if datos.get("messageType") == "APIError":
+                self.errores += 1
+                if self.errores == 1:
+                    print(f"VTS rechazó un parámetro: {datos['data'].get('message')}")
+
+    async def ejecutar(self):
+        loop = asyncio.get_running_loop()
+        lector = asyncio.create_task(self._leer_respuestas())
+        periodo = 1.0 / self.fps
+        siguiente = loop.time()
+        try:
+            while True:
+                valores = self._fotograma(time.monotonic())
+                if valores is not None:
+                    await self._enviar(valores)
+                    self._boca_cerrada = False
+                elif not self._boca_cerrada:
+                    await self._enviar({PARAMETRO_APERTURA: 0.0, PARAMETRO_FORMA: 0.0})
+                    self._boca_cerrada = True
+                # Ritmo fijo: si vamos tarde se saltan fotogramas en vez de enviarlos en ráfaga
+                siguiente += periodo
+                ahora = loop.time()
+                if siguiente < ahora:
+                    siguiente = ahora + periodo
+                await asyncio.sleep(siguiente - ahora)
+        finally:
+            lector.cancel()
@@ -0,0 +1,292 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from historial import Historial
+
+# --- CONFIGURACIÓN ---
+COMPACTAR_CADA = 200        # Operaciones en el log antes de reescribir la instantánea
+RETARDO_ESCRITURA = 0.5     # Segundos que se agrupan escrituras antes de ir a disco
+
+
+def memoria_vacia():
+    return {
+        "perfil_usuario": "Usuario nuevo",
+        "resumen_historial": "",
+        "historial_corto": Historial(),
+        "datos_aprendidos": []
+    }
+
+
+# --- FORMATO DE LA INSTANTÁNEA ---
+# JSON normal, pero con el historial al final y un mensaje por línea: así se
+# lee en streaming directamente a la arena del Historial y se escribe
+# copiando bytes, sin crear un dict por mensaje.
+CLAVE_HISTORIAL = 'historial_corto'
+LINEA_HISTORIAL = b'    "historial_corto": ['
+TAMANO_BLOQUE = 4 * 1024 * 1024     # Bytes del historial que se trocean de una vez al cargar
+
+
+def escribir_atomico(ruta, datos):
+    """Escribe la instantánea en un temporal y lo renombra: nunca deja el fichero a medias"""
+    temporal = ruta + ".tmp"
+    historial = datos.get(CLAVE_HISTORIAL) or Historial()
+    if not isinstance(historial, Historial):
+        historial = Historial(historial)
+    with open(temporal, 'wb') as f:
+        f.write(b"{\n")
+        for clave, valor in datos.items():
+            if clave != CLAVE_HISTORIAL:
+                texto = json.dumps(valor, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+                f.write(f'    {json.dumps(clave)}: {texto},\n'.encode('utf-8'))
+        f.write(LINEA_HISTORIAL)
+        separador = b"\n"
+        for linea in historial.lineas():
+            f.write(separador)
+            f.write(linea)
+            separador = b",\n"
+        f.write(b"\n    ]\n}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def leer_instantanea(ruta):
+    """Carga la instantánea; el historial va línea a línea a un Historial compacto.
+
+    Un fichero con otro formato (el ``json.dump`` de antes, o editado a mano)
+    se lee entero con ``json`` y pasa al formato nuevo en la siguiente
+    instantánea.
+    """
+    historial = Historial()
+    cabecera = []
+    with open(ruta, 'rb') as f:
+        for linea in f:
+            if linea.rstrip() == LINEA_HISTORIAL:
+                break
+            cabecera.append(linea)
+        else:
+            return _leer_entera(ruta)
+        # Bloques de líneas completas: la memoria de la carga no crece con el historial
+        resto = b""
+        while True:
+            trozo = f.read(TAMANO_BLOQUE)
+            if not trozo:
+                raise ValueError("instantánea cortada dentro del historial")
+            bloque, _, resto = (resto + trozo).rpartition(b"\n")
+            if not bloque:
+                continue
+            bloque += b"\n"
+            fin = historial.agregar_lineas(bloque)
+            if fin < len(bloque):
+                cola = bloque[fin:] + resto + f.read()
+                break
+        if cola.split() != [b"]", b"}"]:
+            return _leer_entera(ruta)
+    # Lo anterior al historial termina en coma: se cierra el objeto
+    memoria = json.loads(b"".join(cabecera).rstrip().rstrip(b",") + b"\n}")
+    memoria[CLAVE_HISTORIAL] = historial
+    return memoria
+
+
+def _leer_entera(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        memoria = json.load(f)
+    memoria[CLAVE_HISTORIAL] = Historial(memoria.get(CLAVE_HISTORIAL) or [])
+    return memoria
+
+
+class AlmacenMemoria:
+    """Memoria persistente basada en instantánea + log de operaciones (JSONL).
+
+    La instantánea es el propio ``memoria_ia.json``; cada cambio se añade como
+    una línea al log ``memoria_ia.log.jsonl`` desde un hilo escritor que agrupa
+    las escrituras. Cada ``compactar_cada`` operaciones se vuelca una
+    instantánea atómica y se vacía el log. Cada operación lleva un número de
+    secuencia y la instantánea guarda el último incluido, así que ni una línea
+    truncada por un corte ni un fallo entre instantánea y vaciado del log
+    corrompen o duplican la memoria. El historial vive en un ``Historial``
+    compacto y la instantánea se lee en streaming (``leer_instantanea``).
+    """
+
+    def __init__(self, ruta, compactar_cada=COMPACTAR_CADA, retardo=RETARDO_ESCRITURA):
+        self.ruta = ruta
+        self.ruta_log = os.path.splitext(ruta)[0] + ".log.jsonl"
+        self.compactar_cada = compactar_cada
+        self.retardo = retardo
+        self.memoria = None
+        self._pendientes = []
+        self._ops_en_log = 0
+        self._secuencia = 0
+        self._lock = threading.Lock()
+        self._lock_disco = threading.Lock()
+        self._hay_trabajo = threading.Condition(self._lock)
+        self._cerrado = False
+        self._hilo = None
+
+    # --- CARGA Y MIGRACIÓN ---
+    def cargar(self):
+        memoria = memoria_vacia()
+        if os.path.exists(self.ruta):
+            try:
+                memoria.update(leer_instantanea(self.ruta))
+                self._secuencia = memoria.pop('_secuencia', 0)
+            except ValueError as e:
+                print(f"Error memoria: instantánea ilegible ({e}), se reconstruye desde el log")
+
+        migrar = not os.path.exists(self.ruta_log)
+        reparar = False
+        if not migrar:
+            with open(self.ruta_log, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        op = json.loads(linea)
+                    except ValueError:
+                        reparar = True  # Línea incompleta de una escritura interrumpida
+                        continue
+                    self._ops_en_log += 1
+                    if op['n'] > self._secuencia:
+                        self._aplicar(memoria, op)
+                        self._secuencia = op['n']
+
+        self.memoria = memoria
+        if migrar or reparar:
+            # Primer arranque con el formato nuevo (o log dañado): instantánea limpia y log vacío
+            self._compactar()
+
+        self._hilo = threading.Thread(target=self._escritor, daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+        return memoria
+
+    @staticmethod
+    def _aplicar(memoria, op):
+        tipo = op['op']
+        if tipo == 'mensaje':
+            memoria['historial_corto'].agregar(op['role'], op['content'])
+        elif tipo == 'dato':
+            memoria['datos_aprendidos'].append(op['valor'])
+        elif tipo == 'perfil':
+            memoria['perfil_usuario'] = op['valor']
+        elif tipo == 'plegar':
+            # Los mensajes más antiguos pasan a formar parte del resumen
+            memoria['resumen_historial'] = op['resumen']
+            del memoria['historial_corto'][:op['cuantos']]
+
+    # --- OPERACIONES ---
+    def _registrar(self, op):
+        with self._lock:
+            self._secuencia += 1
+            op['n'] = self._secuencia
+            self._aplicar(self.memoria, op)
+            self._pendientes.append(op)
+            self._hay_trabajo.notify()
+
+    def agregar_mensaje(self, role, content):
+        self._registrar({'op': 'mensaje', 'role': role, 'content': content})
+
+    def agregar_dato(self, valor):
+        self._registrar({'op': 'dato', 'valor': valor})
+
+    def fijar_perfil(self, valor):
+        self._registrar({'op': 'perfil', 'valor': valor})
+
+    def plegar_historial(self, resumen, cuantos):
+        self._registrar({'op': 'plegar', 'resumen': resumen, 'cuantos': cuantos})
+
+    def cola_historial(self, n):
+        """Copia de los últimos ``n`` mensajes, tomada de una vez (un plegado a la vez no la descuadra)"""
+        with self._lock:
+            return self.memoria['historial_corto'][-n:] if n > 0 else []
+
+    def guardar(self):
+        """Pide al escritor que vuelque lo pendiente sin bloquear al llamador"""
+        with self._lock:
+            self._hay_trabajo.notify()
+
+    def compactar(self):
+        self._compactar()
+
+    def cerrar(self):
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._hay_trabajo.notify()
+        # Si no, atexit retiene el almacén (y su memoria) hasta que acabe el proceso
+        atexit.unregister(self.cerrar)
+        self._volcar()
+
+    def _instantanea(self):
+        """Copia del estado (con el lock cogido) para escribirla a disco sin él"""
+        return {**self.memoria,
+                'historial_corto': self.memoria['historial_corto'].copia(),
+                'datos_aprendidos': list(self.memoria['datos_aprendidos']),
+                '_secuencia': self._secuencia}
+
+    # --- ESCRITOR EN SEGUNDO PLANO ---
+    # Bajo ``_lock`` solo se recogen las operaciones y se copia el estado; la
+    # escritura y el fsync van fuera, así que el turno nunca espera al disco.
+    # ``_lock_disco`` ordena las escrituras (escritor, cerrar y compactar).
+    def _escritor(self):
+        while True:
+            with self._lock:
+                while not self._pendientes and not self._cerrado:
+                    self._hay_trabajo.wait()
+                if self._cerrado:
+                    break
+            # Esperar un poco para agrupar varias operaciones en una escritura
+            time.sleep(self.retardo)
+            try:
+                self._volcar()
+            except Exception as e:
+                print(f"Error guardando memoria: {e}")
+
+    def _volcar(self):
+        with self._lock_disco:
+            with self._lock:
+                if not self._pendientes:
+                    return
+                pendientes, self._pendientes = self._pendientes, []
+                instantanea = None
+                if self._ops_en_log + len(pendientes) >= self.compactar_cada:
+                    instantanea = self._instantanea()
+            try:
+                if instantanea is not None:
+                    self._escribir_instantanea(instantanea)
+                    return
+                lineas = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in pendientes)
+                with open(self.ruta_log, 'a', encoding='utf-8') as f:
+                    f.write(lineas)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._ops_en_log += len(pendientes)
+            except Exception:
+                # Se reintentan en la siguiente escritura
+                with self._lock:
+                    self._pendientes[:0] = pendientes
+                raise
+
+    def _compactar(self):
+        with self._lock_disco:
+            with self._lock:
+                # La instantánea ya incluye lo pendiente
+                instantanea = self._instantanea()
+                pendientes, self._pendientes = self._pendientes, []
+            try:
+                self._escribir_instantanea(instantanea)
+            except Exception:
+                with self._lock:
+                    self._pendientes[:0] = pendientes
+                raise
+
+    def _escribir_instantanea(self, instantanea):
+        # Primero la instantánea y después se vacía el log: las operaciones
+        # posteriores a su ``_secuencia`` aún no están en el log, siguen pendientes
+        escribir_atomico(self.ruta, instantanea)
+        with open(self.ruta_log, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._ops_en_log = 0
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+MODELO_EMBEDDINGS = "nomic-embed-text"
+UMBRAL_DUPLICADO = 0.95     # Similitud coseno a partir de la cual un dato ya se conoce
+CAPACIDAD_INICIAL = 1024
+
+
+def estimar_tokens(texto):
+    """Aproximación barata: ~4 caracteres por token"""
+    return len(texto) // 4 + 1
+
+
+def embeddings_ollama(textos, modelo=MODELO_EMBEDDINGS):
+    from servicio_ollama import obtener_servicio
+    resp = obtener_servicio().embed(model=modelo, input=textos)
+    return np.asarray(resp['embeddings'], dtype=np.float32)
+
+
+class IndiceVectorial:
+    """Índice local de recuerdos con búsqueda top-k por similitud coseno.
+
+    Los vectores se guardan normalizados en una matriz NumPy (opcionalmente un
+    memmap en disco, ``<ruta>.f32`` con su forma en ``<ruta>.meta.json``) y los
+    textos en ``<ruta>.jsonl``, ambos solo con añadidos. Los datos casi
+    idénticos a uno ya guardado se descartan.
+    """
+
+    def __init__(self, ruta=None, funcion_embedding=embeddings_ollama,
+                 umbral_duplicado=UMBRAL_DUPLICADO, capacidad=CAPACIDAD_INICIAL):
+        self.ruta = ruta
+        self.embeber = funcion_embedding
+        self.umbral_duplicado = umbral_duplicado
+        self.textos = []
+        self.dim = None
+        self._capacidad = capacidad
+        self._matriz = None
+        self._lock = threading.Lock()
+        if ruta:
+            self._cargar()
+
+    def __len__(self):
+        return len(self.textos)
+
+    # --- INSERCIÓN ---
+    def agregar(self, texto):
+        return self.agregar_varios([texto]) == 1
+
+    def agregar_varios(self, textos):
+        """Inserta textos nuevos; devuelve cuántos se añadieron (sin duplicados)"""
+        textos = [t.strip() for t in textos if t and t.strip()]
+        if not textos:
+            return 0
+        vectores = self._normalizar(self.embeber(textos))
+        with self._lock:
+            nuevos = self._filtrar_duplicados(textos, vectores)
+            if not nuevos:
+                return 0
+            n = len(self.textos)
+            self._reservar(n + len(nuevos), vectores.shape[1])
+            for i, (texto, vector) in enumerate(nuevos):
+                self._matriz[n + i] = vector
+                self.textos.append(texto)
+            if self.ruta:
+                # Vectores primero y textos después: el número de líneas manda al cargar
+                self._matriz.flush()
+                with open(self.ruta + ".jsonl", 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(t, ensure_ascii=False) + "\n" for t, _ in nuevos))
+        return len(nuevos)
+
+    def _filtrar_duplicados(self, textos, vectores):
+        if self.umbral_duplicado is None:
+            return list(zip(textos, vectores))
+        n = len(self.textos)
+        # Una sola multiplicación matricial contra todo lo ya guardado
+        if n:
+            maximos = (self._matriz[:n] @ vectores.T).max(axis=0)
+        else:
+            maximos = np.full(len(textos), -1.0, dtype=np.float32)
+        nuevos = []
+        for texto, vector, maximo in zip(textos, vectores, maximos):
+            if maximo >= self.umbral_duplicado:
+                continue
+            if any(float(v @ vector) >= self.umbral_duplicado for _, v in nuevos):
+                continue
+            nuevos.append((texto, vector))
+        return nuevos
+
+    # --- BÚSQUEDA ---
+    def buscar(self, consulta, k=8, presupuesto_tokens=200):
+        """Devuelve los k recuerdos más parecidos que caben en el presupuesto de tokens"""
+        if not self.textos:
+            return []
+        vector = self._normalizar(self.embeber([consulta]))[0]
+        with self._lock:
+            n = len(self.textos)
+            similitudes = self._matriz[:n] @ vector
+            k = min(k, n)
+            candidatos = np.argpartition(-similitudes, k - 1)[:k]
+            candidatos = candidatos[np.argsort(-similitudes[candidatos])]
+            elegidos, usados = [], 0
+            for i in candidatos:
+                coste = estimar_tokens(self.textos[i])
+                if usados + coste > presupuesto_tokens:
+                    continue
+                elegidos.append(self.textos[i])
+                usados += coste
+        return elegidos
+
+    # --- ALMACENAMIENTO ---
+    @staticmethod
+    def _normalizar(vectores):
+        vectores = np.asarray(vectores, dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        return vectores / np.maximum(normas, 1e-12)
+
+    def _reservar(self, filas, dim):
+        if self._matriz is None:
+            self.dim = dim
+        elif filas <= self._matriz.shape[0]:
+            return
+        capacidad = self._capacidad
+        while capacidad < filas:
+            capacidad *= 2
+        self._capacidad = capacidad
+        anterior = self._matriz
+        if self.ruta:
+            # Crecer el fichero y volver a mapearlo con la nueva capacidad
+            if anterior is not None:
+                anterior.flush()
+                del anterior
+            ruta_vectores = self.ruta + ".f32"
+            with open(ruta_vectores, 'ab') as f:
+                f.truncate(capacidad * self.dim * 4)
+            self._matriz = np.memmap(ruta_vectores, dtype=np.float32, mode='r+',
+                                     shape=(capacidad, self.dim))
+            with open(self.ruta + ".meta.json", 'w', encoding='utf-8') as f:
+                json.dump({'dim': self.dim, 'capacidad': capacidad}, f)
+        else:
+            self._matriz = np.zeros((capacidad, self.dim), dtype=np.float32)
+            if anterior is not None:
+                self._matriz[:anterior.shape[0]] = anterior
+
+    def _cargar(self):
+        ruta_textos, ruta_meta = self.ruta + ".jsonl", self.ruta + ".meta.json"
+        if not (os.path.exists(ruta_textos) and os.path.exists(ruta_meta)):
+            return
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(ruta_textos, 'r', encoding='utf-8') as f:
+            textos = [json.loads(linea) for linea in f if linea.strip()]
+        self.dim, self._capacidad = meta['dim'], meta['capacidad']
+        self._matriz = np.memmap(self.ruta + ".f32", dtype=np.float32, mode='r+',
+                                 shape=(self._capacidad, self.dim))
+        self.textos = textos[:self._capacidad]
@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_TOKENS_SEGUNDO = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200)
+VENTANA_PERCENTILES = 200     # Últimas observaciones por serie para p50/p95 del dashboard
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted(etiquetas.items()))
+
+
+def _formato_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pares) + "}"
+
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus (cubos, suma y cuenta)"""
+
+    def __init__(self, limites=LIMITES_SEGUNDOS, ventana=VENTANA_PERCENTILES):
+        self.limites = tuple(limites)
+        self.cubos = [0] * (len(self.limites) + 1)   # El último es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+        self.recientes = deque(maxlen=ventana)
+
+    def observar(self, valor):
+        self.cubos[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cuenta += 1
+        self.recientes.append(valor)
+
+    def resumen(self):
+        valores = list(self.recientes)
+        return {
+            'ultimo': valores[-1] if valores else None,
+            'p50': float(np.percentile(valores, 50)) if valores else None,
+            'p95': float(np.percentile(valores, 95)) if valores else None,
+            'n': self.cuenta,
+        }
+
+
+class RegistroMetricas:
+    """Histogramas y medidores con etiquetas, exportables en texto Prometheus.
+
+    ``observar(nombre, valor, **etiquetas)`` acumula en el histograma de esa
+    serie; ``medidor(nombre, funcion)`` registra un valor que se lee al
+    exportar (``funcion()`` devuelve un número o un dict de etiquetas ->
+    número). ``exportar()`` es el cuerpo de ``/metrics``.
+    """
+
+    def __init__(self, limites=LIMITES_SEGUNDOS):
+        self.limites = limites
+        self._histogramas = {}    # nombre -> {etiquetas: Histograma}
+        self._limites = {}        # nombre -> cubos propios (si no son segundos)
+        self._ayuda = {}
+        self._medidores = {}      # nombre -> funcion
+        self._lock = threading.Lock()
+
+    def describir(self, nombre, ayuda, limites=None):
+        self._ayuda[nombre] = ayuda
+        if limites is not None:
+            self._limites[nombre] = tuple(limites)
+
+    def observar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            serie = self._histogramas.setdefault(nombre, {})
+            clave = _etiquetas(etiquetas)
+            histograma = serie.get(clave)
+            if histograma is None:
+                histograma = serie[clave] = Histograma(self._limites.get(nombre, self.limites))
+            histograma.observar(valor)
+            return histograma.resumen()
+
+    def medidor(self, nombre, funcion, ayuda=None):
+        self._medidores[nombre] = funcion
+        if ayuda:
+            self._ayuda[nombre] = ayuda
+
+    def resumen(self, nombre, etiqueta):
+        """{valor de ``etiqueta``: último/p50/p95/n} de un histograma (para el dashboard)"""
+        with self._lock:
+            return {dict(clave).get(etiqueta): h.resumen()
+                    for clave, h in self._histogramas.get(nombre, {}).items()}
+
+    def exportar(self):
+        lineas = []
+        with self._lock:
+            for nombre, serie in sorted(self._histogramas.items()):
+                if nombre in self._ayuda:
+                    lineas.append(f"# HELP {nombre} {self._ayuda[nombre]}")
+                lineas.append(f"# TYPE {nombre} histogram")
+                for clave, h in sorted(serie.items()):
+                    acumulado = 0
+                    for limite, n in zip(h.limites + (float('inf'),), h.cubos):
+                        acumulado += n
+                        le = "+Inf" if limite == float('inf') else repr(limite)
+                        lineas.append(f"{nombre}_bucket{_formato_etiquetas(clave, [('le', le)])} {acumulado}")
+                    lineas.append(f"{nombre}_sum{_formato_etiquetas(clave)} {h.suma}")
+                    lineas.append(f"{nombre}_count{_formato_etiquetas(clave)} {h.cuenta}")
+        for nombre, funcion in sorted(self._medidores.items()):
+            try:
+                valor = funcion()
+            except Exception as e:
+                print(f"Error medidor {nombre}: {e}")
+                continue
+            if nombre in self._ayuda:
+                lineas.append(f"# HELP {nombre} {self._ayuda[nombre]}")
+            lineas.append(f"# TYPE {nombre} gauge")
+            if isinstance(valor, dict):
+                for etiquetas, v in sorted(valor.items()):
+                    lineas.append(f"{nombre}{_formato_etiquetas(etiquetas)} {v}")
+            else:
+                lineas.append(f"{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+class TrazaTurno:
+    """Tiempos de las etapas de un turno, con reloj monotónico.
+
+    Cada etapa se registra una sola vez y se vuelca en el acto al histograma
+    ``raid_etapa_segundos{etapa=...}``, así que lo que llega tarde (p. ej. el
+    primer audio) cuenta aunque el turno ya haya terminado. Dos tipos:
+
+    - ``span(etapa)``: duración de un bloque (captura, visión, STT...). Da un
+      dict en el que se pueden dejar detalles (tokens y tiempos de Ollama).
+    - ``marcar(etapa)``: latencia desde el origen del turno. El origen es el
+      fin de la voz (``marcar('vad_fin')``) o, si no la hubo, la creación.
+
+    ``al_registrar(etapa, segundos, detalles, resumen)`` permite mostrarlo en
+    vivo (el dashboard de la sesión).
+    """
+
+    def __init__(self, registro, al_registrar=None, reloj=time.monotonic):
+        self.registro = registro
+        self.al_registrar = al_registrar
+        self.reloj = reloj
+        self.inicio = reloj()
+        self.origen = self.inicio
+        self.etapas = {}
+        self.detalles = {}
+        self._lock = threading.Lock()
+
+    def marcar(self, etapa, detalles=None):
+        ahora = self.reloj()
+        if etapa == 'vad_fin':
+            # Lo que duró la frase (con la cola del VAD); desde aquí se miden las latencias
+            segundos, self.origen = ahora - self.inicio, ahora
+        else:
+            segundos = ahora - self.origen
+        self._registrar(etapa, segundos, detalles)
+
+    @contextmanager
+    def span(self, etapa):
+        detalles = {}
+        inicio = self.reloj()
+        yield detalles
+        self._registrar(etapa, self.reloj() - inicio, detalles)
+
+    def registrar(self, etapa, segundos, detalles=None):
+        """Duración medida fuera (p. ej. la que trae la propia captura)"""
+        self._registrar(etapa, segundos, detalles)
+
+    def _registrar(self, etapa, segundos, detalles):
+        with self._lock:
+            if etapa in self.etapas:
+                return
+            self.etapas[etapa] = segundos
+            if detalles:
+                self.detalles[etapa] = detalles
+        resumen = self.registro.observar('raid_etapa_segundos', segundos, etapa=etapa)
+        if self.al_registrar is not None:
+            try:
+                self.al_registrar(etapa, segundos, detalles, resumen)
+            except Exception:
+                pass
+
+    def informe(self):
+        with self._lock:
+            return {'etapas': dict(self.etapas), 'detalles': dict(self.detalles)}
@@ -0,0 +1,83 @@
+import threading
+
+from servicio_ollama import obtener_servicio
+
+# --- CONFIGURACIÓN ---
+KEEP_ALIVE_DEFECTO = "30m"     # Cuánto mantiene Ollama un modelo cargado tras usarlo
+
+
+def _campo(respuesta, clave):
+    try:
+        return respuesta[clave] or 0
+    except (KeyError, TypeError):
+        return 0
+
+
+class GestorModelos:
+    """Mantiene residentes los modelos de Ollama y mide sus tiempos.
+
+    ``calentar()`` carga los modelos al arrancar (petición vacía) para que el
+    primer turno no pague la carga; ``keep_alive(modelo)`` se pasa en cada
+    llamada para que Ollama no los descargue en los ratos muertos y
+    ``registrar()`` separa el tiempo de carga del de evaluación usando los
+    metadatos de la respuesta y, si hay ``metricas`` (RegistroMetricas), los
+    acumula en sus histogramas.
+    """
+
+    def __init__(self, keep_alive=None, keep_alive_defecto=KEEP_ALIVE_DEFECTO, metricas=None):
+        self._keep_alive = dict(keep_alive or {})
+        self.keep_alive_defecto = keep_alive_defecto
+        self.metricas = metricas
+        self.tiempos = {}
+        self._lock = threading.Lock()
+
+    def keep_alive(self, modelo):
+        return self._keep_alive.get(modelo, self.keep_alive_defecto)
+
+    def calentar(self, modelos, esperar=False):
+        """Carga los modelos en paralelo; por defecto no bloquea"""
+        hilos = [threading.Thread(target=self._calentar_uno, args=(m,), daemon=True) for m in modelos]
+        for hilo in hilos:
+            hilo.start()
+        if esperar:
+            for hilo in hilos:
+                hilo.join()
+
+    def _calentar_uno(self, modelo):
+        try:
+            print(f"Calentando {modelo}...")
+            resp = obtener_servicio().generate(model=modelo, prompt="", keep_alive=self.keep_alive(modelo))
+            self.registrar(modelo, resp, mostrar=True)
+        except Exception as e:
+            print(f"Error calentando {modelo}: {e}")
+
+    def registrar(self, modelo, respuesta, mostrar=False):
+        """Guarda los tiempos de carga/evaluación de la última respuesta (o último chunk)"""
+        tiempos = {
+            'carga_ms': _campo(respuesta, 'load_duration') / 1e6,
+            'prompt_tokens': _campo(respuesta, 'prompt_eval_count'),
+            'prompt_ms': _campo(respuesta, 'prompt_eval_duration') / 1e6,
+            'eval_tokens': _campo(respuesta, 'eval_count'),
+            'eval_ms': _campo(respuesta, 'eval_duration') / 1e6,
+        }
+        with self._lock:
+            self.tiempos[modelo] = tiempos
+        if self.metricas is not None:
+            self._observar(modelo, tiempos)
+        if mostrar:
+            print(f"[{modelo}] carga {tiempos['carga_ms']:.0f} ms | "
+                  f"prompt {tiempos['prompt_tokens']} tok en {tiempos['prompt_ms']:.0f} ms | "
+                  f"eval {tiempos['eval_tokens']} tok en {tiempos['eval_ms']:.0f} ms")
+        return tiempos
+
+    def _observar(self, modelo, tiempos):
+        for fase in ('carga', 'prompt', 'eval'):
+            if tiempos[f'{fase}_ms']:
+                self.metricas.observar('raid_ollama_segundos', tiempos[f'{fase}_ms'] / 1000, modelo=modelo, fase=fase)
+        if tiempos['eval_tokens'] and tiempos['eval_ms']:
+            self.metricas.observar('raid_ollama_tokens_por_segundo',
+                                   tiempos['eval_tokens'] / (tiempos['eval_ms'] / 1000), modelo=modelo)
+
+    def informe(self):
+        with self._lock:
+            return {modelo: dict(t) for modelo, t in self.tiempos.items()}
@@ -0,0 +1,178 @@
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+TAMANO_TESELA = 320           # Lado nominal de las teselas, en píxeles de la pantalla real
+UMBRAL_BORDE = 48             # Salto de gris entre vecinos que cuenta como borde
+MIN_BORDES_TEXTO = 0.01       # Fracción mínima de bordes en una tesela con texto
+MAX_FILAS_ACTIVAS = 0.9       # Texto: entre línea y línea quedan filas sin bordes (una foto no)
+MAX_ALTO_LINEA = 60           # Texto: al menos una línea cada tantos píxeles de alto
+MAX_BORDES_VACIA = 0.002      # Por debajo (y con pocos tonos): tesela lisa, ni texto ni imagen
+IDIOMA_OCR = "spa+eng"
+HILOS_OCR = 4
+MAX_CACHE_TESELAS = 512
+MAX_CARACTERES = 1500         # Texto leído máximo que se pasa al prompt
+
+
+# --- MOTORES ---
+class MotorOCR:
+    nombre = "base"
+
+    def leer(self, imagen):
+        """Texto de una imagen PIL en grises (líneas separadas por saltos)"""
+        raise NotImplementedError
+
+
+class MotorTesseract(MotorOCR):
+    """Tesseract local (CPU) vía pytesseract; cada llamada es un proceso, así que paraleliza bien"""
+    nombre = "tesseract"
+
+    def __init__(self, idioma=IDIOMA_OCR):
+        import pytesseract
+        if shutil.which(pytesseract.pytesseract.tesseract_cmd) is None:
+            raise RuntimeError("no se encuentra el ejecutable de tesseract")
+        self.pytesseract = pytesseract
+        self.idioma = idioma
+
+    def leer(self, imagen):
+        # psm 6: un bloque de texto uniforme, lo normal dentro de una tesela
+        return self.pytesseract.image_to_string(imagen, lang=self.idioma, config="--psm 6")
+
+
+MOTORES = {
+    'tesseract': MotorTesseract,
+}
+
+
+def crear_motor_ocr(nombre, **opciones):
+    return MOTORES[nombre](**opciones)
+
+
+# --- TESELAS ---
+def _cortes(actividad, tamano):
+    """Límites de las teselas en un eje, movidos a la fila/columna vacía más cercana.
+
+    Cortar por donde no hay nada evita partir líneas de texto o palabras.
+    """
+    cortes = [0]
+    while cortes[-1] + tamano < len(actividad):
+        nominal = cortes[-1] + tamano
+        margen = tamano // 4
+        inicio, fin = max(cortes[-1] + tamano // 2, nominal - margen), min(len(actividad), nominal + margen)
+        vacias = np.flatnonzero(~actividad[inicio:fin])
+        cortes.append(inicio + int(vacias[np.argmin(np.abs(vacias + inicio - nominal))]) if len(vacias) else nominal)
+    cortes.append(len(actividad))
+    return cortes
+
+
+def clasificar_tesela(gris):
+    """'texto', 'imagen' o 'vacia' según la densidad y el reparto en líneas de los bordes"""
+    bordes = np.abs(np.diff(gris.astype(np.int16), axis=1)) > UMBRAL_BORDE
+    densidad = float(bordes.mean()) if bordes.size else 0.0
+    histograma = np.bincount(gris.ravel() >> 4, minlength=16)
+    tonos = int(np.count_nonzero(histograma > 0.01 * gris.size))
+    if densidad < MAX_BORDES_VACIA and tonos <= 2:
+        return 'vacia'
+    # Texto (código, documentos): bandas de bordes separadas por el interlineado
+    filas = bordes.any(axis=1)
+    bandas = int(filas[0]) + np.count_nonzero(filas[1:] & ~filas[:-1])
+    es_texto = densidad >= MIN_BORDES_TEXTO and filas.mean() <= MAX_FILAS_ACTIVAS \
+        and bandas >= gris.shape[0] / MAX_ALTO_LINEA
+    return 'texto' if es_texto else 'imagen'
+
+
+class AnalisisPantalla:
+    """Pantalla a resolución real troceada en teselas clasificadas"""
+    __slots__ = ('gris', 'teselas')
+
+    def __init__(self, gris, teselas):
+        self.gris = gris            # Imagen PIL 'L' a resolución real
+        self.teselas = teselas      # [((izq, arriba, der, abajo), tipo)] en orden de lectura
+
+    def fraccion(self, tipo):
+        area = self.gris.size[0] * self.gris.size[1]
+        return sum((c[2] - c[0]) * (c[3] - c[1]) for c, t in self.teselas if t == tipo) / area
+
+    def caja(self, tipo):
+        """Rectángulo que engloba las teselas de ese tipo (o None)"""
+        cajas = [c for c, t in self.teselas if t == tipo]
+        if not cajas:
+            return None
+        return (min(c[0] for c in cajas), min(c[1] for c in cajas),
+                max(c[2] for c in cajas), max(c[3] for c in cajas))
+
+
+class LectorPantalla:
+    """OCR por teselas a resolución real, en paralelo y con cache por tesela.
+
+    ``analizar(imagen)`` trocea la pantalla (cortando por filas y columnas
+    vacías) y clasifica cada tesela en texto, imagen o vacía con NumPy.
+    ``leer(analisis)`` pasa por el motor solo las teselas de texto cuyo
+    contenido no esté ya en la cache (clave: hash de los píxeles), así que
+    al editar o hacer scroll en una zona solo se relee lo que cambió.
+    """
+
+    def __init__(self, motor, tamano=TAMANO_TESELA, hilos=HILOS_OCR,
+                 max_cache=MAX_CACHE_TESELAS, max_caracteres=MAX_CARACTERES):
+        self.motor = motor
+        self.tamano = tamano
+        self.max_cache = max_cache
+        self.max_caracteres = max_caracteres
+        self.leidas = 0
+        self.reutilizadas = 0
+        self._cache = OrderedDict()    # hash de la tesela -> texto
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="raid-ocr")
+
+    def analizar(self, imagen):
+        gris = imagen.convert("L")
+        pixeles = np.asarray(gris)
+        # Filas/columnas con algún borde: entre ellas están los huecos por donde cortar
+        bordes = np.abs(np.diff(pixeles.astype(np.int16), axis=1)) > UMBRAL_BORDE
+        filas = np.concatenate((bordes.any(axis=1), [False]))[:pixeles.shape[0]]
+        columnas = np.concatenate((bordes.any(axis=0), [False]))
+        cortes_y = _cortes(filas, self.tamano)
+        cortes_x = _cortes(columnas, self.tamano)
+        teselas = []
+        for arriba, abajo in zip(cortes_y, cortes_y[1:]):
+            for izquierda, derecha in zip(cortes_x, cortes_x[1:]):
+                tipo = clasificar_tesela(pixeles[arriba:abajo, izquierda:derecha])
+                teselas.append(((izquierda, arriba, derecha, abajo), tipo))
+        return AnalisisPantalla(gris, teselas)
+
+    def _leer_tesela(self, recorte):
+        clave = hashlib.blake2b(recorte.tobytes(), digest_size=16, key=repr(recorte.size).encode()).digest()
+        with self._lock:
+            texto = self._cache.get(clave)
+            if texto is not None:
+                self._cache.move_to_end(clave)
+                self.reutilizadas += 1
+                return texto
+        texto = " ".join(linea.strip() for linea in self.motor.leer(recorte).splitlines() if linea.strip())
+        with self._lock:
+            self._cache[clave] = texto
+            self.leidas += 1
+            while len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        return texto
+
+    def leer(self, analisis):
+        """Texto de las teselas de texto en orden de lectura, recortado a ``max_caracteres``"""
+        recortes = [analisis.gris.crop(caja) for caja, tipo in analisis.teselas if tipo == 'texto']
+        textos = [t for t in self._pool.map(self._leer_tesela, recortes) if t]
+        return "\n".join(textos)[:self.max_caracteres]
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.leidas + self.reutilizadas
+            return {
+                'teselas_leidas': self.leidas,
+                'teselas_reutilizadas': self.reutilizadas,
+                'ratio_cache': self.reutilizadas / total if total else 0.0,
+                'entradas': len(self._cache),
+            }
@@ -0,0 +1,242 @@
+"""Servidor falso de la API HTTP de Ollama para probar y medir sin modelos.
+
+Atiende ``/api/chat`` y ``/api/generate`` (con y sin streaming, con los
+metadatos de tiempos que manda Ollama), ``/api/embed`` (vectores
+deterministas por bolsa de palabras, así la búsqueda de recuerdos tiene
+sentido) y ``/api/tags``. Las respuestas son textos enlatados elegidos por
+reglas sobre el último mensaje, troceados en tokens que se envían con
+retardos configurables. Uso:
+
+    python ollama_simulado.py --puerto 11434 --retardo-token 0.02
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+# (fragmento del último mensaje, respuesta); ``{n}`` es el número de petición
+REGLAS = [
+    ("Describe", "A code editor with a Python file open and a terminal below it."),
+    ("aprendiste", "Le gusta programar\nTema {n}"),
+    ("Resumen previo", "El usuario programa en Python y pregunta por lo que ve en pantalla."),
+]
+RESPUESTA_DEFECTO = "Veo que estás con el editor abierto, ¿quieres que te ayude con ese código?"
+DIMENSION_EMBEDDING = 256
+
+
+def _ahora():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def trocear(texto):
+    """Tokens aproximados: cada palabra con su espacio delante"""
+    return re.findall(r'\s*\S+', texto) or [""]
+
+
+class ServidorOllamaSimulado:
+    """Ollama de mentira en un hilo propio.
+
+    ``retardo_carga`` se paga la primera vez que se pide cada modelo (como
+    cargarlo en memoria), ``retardo_primer_token`` en cada petición (el
+    prompt) y ``retardo_token`` por token generado. ``peticiones`` cuenta las
+    recibidas por ruta y modelo.
+    """
+
+    def __init__(self, puerto=11434, retardo_primer_token=0.15, retardo_token=0.02,
+                 retardo_carga=0.0, retardo_embed=0.01, reglas=None,
+                 respuesta_defecto=RESPUESTA_DEFECTO, dimension=DIMENSION_EMBEDDING):
+        self.puerto = puerto
+        self.retardo_primer_token = retardo_primer_token
+        self.retardo_token = retardo_token
+        self.retardo_carga = retardo_carga
+        self.retardo_embed = retardo_embed
+        self.reglas = REGLAS if reglas is None else reglas
+        self.respuesta_defecto = respuesta_defecto
+        self.dimension = dimension
+        self.peticiones = {}           # (ruta, modelo) -> número
+        self._cargados = set()
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.puerto}"
+
+    def iniciar(self):
+        simulado = self
+
+        class Manejador(_Manejador):
+            servidor_simulado = simulado
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", self.puerto), Manejador)
+        self._servidor.daemon_threads = True
+        self.puerto = self._servidor.server_address[1]   # Por si se pidió el 0 (libre)
+        threading.Thread(target=self._servidor.serve_forever, daemon=True, name="ollama-simulado").start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    # --- RESPUESTAS ---
+    def _contar(self, ruta, modelo):
+        with self._lock:
+            clave = (ruta, modelo or "")
+            self.peticiones[clave] = n = self.peticiones.get(clave, 0) + 1
+            nuevo = modelo not in self._cargados
+            self._cargados.add(modelo)
+            return n, nuevo
+
+    def respuesta(self, texto, n):
+        for fragmento, respuesta in self.reglas:
+            if fragmento in texto:
+                return respuesta.replace("{n}", str(n))
+        return self.respuesta_defecto.replace("{n}", str(n))
+
+    def embedding(self, texto):
+        """Bolsa de palabras con hashing: textos con palabras comunes se parecen"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for palabra in re.findall(r'\w+', texto.lower()):
+            vector[zlib.crc32(palabra.encode()) % self.dimension] += 1.0
+        norma = np.linalg.norm(vector)
+        return (vector / norma if norma else vector + 1.0 / np.sqrt(self.dimension)).tolist()
+
+    def estadisticas(self):
+        with self._lock:
+            return {f"{ruta} {modelo}": n for (ruta, modelo), n in sorted(self.peticiones.items())}
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # Keep-alive, como el pool de conexiones del cliente
+    servidor_simulado = None
+
+    def log_message(self, *_):
+        pass
+
+    def _json(self, datos, estado=200):
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _trozo(self, datos):
+        linea = (json.dumps(datos) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(linea), linea))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json({"models": [{"name": m, "model": m} for m in sorted(self.servidor_simulado._cargados)]})
+        elif self.path == "/api/version":
+            self._json({"version": "0.0.0-simulado"})
+        else:
+            self._json({"error": "no encontrado"}, 404)
+
+    def do_POST(self):
+        try:
+            peticion = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self._json({"error": "json no válido"}, 400)
+        if self.path == "/api/embed":
+            return self._embed(peticion)
+        if self.path in ("/api/chat", "/api/generate"):
+            return self._generar(peticion, chat=self.path == "/api/chat")
+        self._json({"error": "no encontrado"}, 404)
+
+    def _embed(self, peticion):
+        simulado = self.servidor_simulado
+        simulado._contar("/api/embed", peticion.get("model"))
+        textos = peticion.get("input") or []
+        textos = [textos] if isinstance(textos, str) else textos
+        time.sleep(simulado.retardo_embed)
+        self._json({"model": peticion.get("model"), "embeddings": [simulado.embedding(t) for t in textos]})
+
+    def _generar(self, peticion, chat):
+        simulado = self.servidor_simulado
+        modelo = peticion.get("model")
+        n, nuevo = simulado._contar(self.path, modelo)
+        if chat:
+            mensajes = peticion.get("messages") or [{}]
+            entrada = mensajes[-1].get("content") or ""
+        else:
+            entrada = peticion.get("prompt") or ""
+        carga = simulado.retardo_carga if nuevo else 0.0
+        # Un generate con prompt vacío solo carga el modelo (calentar)
+        tokens = trocear(simulado.respuesta(entrada, n)) if chat or entrada else []
+
+        def chunk(texto, hecho):
+            datos = {"model": modelo, "created_at": _ahora(), "done": hecho}
+            if chat:
+                datos["message"] = {"role": "assistant", "content": texto}
+            else:
+                datos["response"] = texto
+            return datos
+
+        def final(texto=""):
+            datos = chunk(texto, True)
+            datos.update({
+                "done_reason": "stop",
+                "total_duration": int((carga + simulado.retardo_primer_token + len(tokens) * simulado.retardo_token) * 1e9),
+                "load_duration": int(carga * 1e9),
+                "prompt_eval_count": len(trocear(entrada)),
+                "prompt_eval_duration": int(simulado.retardo_primer_token * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(len(tokens) * simulado.retardo_token * 1e9),
+            })
+            return datos
+
+        time.sleep(carga + simulado.retardo_primer_token)
+        if not peticion.get("stream", True):
+            time.sleep(len(tokens) * simulado.retardo_token)
+            return self._json(final("".join(tokens)))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(simulado.retardo_token)
+                self._trozo(chunk(token, False))
+            self._trozo(final())
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # El cliente canceló (barge-in)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--puerto", type=int, default=11434)
+    parser.add_argument("--retardo-primer-token", type=float, default=0.15)
+    parser.add_argument("--retardo-token", type=float, default=0.02)
+    parser.add_argument("--retardo-carga", type=float, default=0.0)
+    parser.add_argument("--retardo-embed", type=float, default=0.01)
+    args = parser.parse_args()
+
+    servidor = ServidorOllamaSimulado(args.puerto, args.retardo_primer_token, args.retardo_token,
+                                      args.retardo_carga, args.retardo_embed).iniciar()
+    print(f"Ollama simulado en {servidor.url} (OLLAMA_HOST={servidor.url})")
+    visto = {}
+    try:
+        while True:
+            time.sleep(5)
+            actual = servidor.estadisticas()
+            if actual != visto:
+                print(actual)
+                visto = actual
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
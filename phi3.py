@@ -1,4 +1,4 @@
-import ollama
+from servicio_ollama import obtener_servicio
 
 # Definimos el modelo que instalaste
 MODELO = "phi3" 
@@ -8,7 +8,7 @@ print("Enviando mensaje de prueba...")
 
 try:
     # Enviamos un mensaje simple
-    respuesta = ollama.chat(model=MODELO, messages=[
+    respuesta = obtener_servicio().chat(model=MODELO, messages=[
         {
             'role': 'user',
             'content': 'Hola, ¿puedes escucharme? Responde con una frase corta y divertida.'
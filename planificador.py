@@ -0,0 +1,282 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from servicio_ollama import GeneracionCancelada
+
+# --- CONFIGURACIÓN ---
+MAX_CONCURRENTES = 3          # Peticiones simultáneas al Ollama compartido
+LIMITES_MODELO = {}           # Máximo simultáneo por modelo, p. ej. {"moondream:1.8b": 1}
+PRIORIDADES = ('chat', 'vision', 'aprendizaje')   # De más a menos urgente
+ENVEJECIMIENTO = 30.0         # Segundos de espera tras los que cualquier petición pasa delante
+MAX_PENDIENTES_SESION = 4     # Cola máxima por sesión y prioridad antes de rechazar
+MAX_PENDIENTES = 64           # Cola máxima total
+MAX_LOTE = 4                  # Trabajos de fondo que se agrupan en una sola llamada
+ESPERA_LOTE = 20.0            # Segundos máximos que un trabajo de fondo espera a su lote
+
+
+class Saturado(Exception):
+    """El planificador no admite más peticiones ahora mismo (back-pressure)"""
+
+
+class _Espera:
+    __slots__ = ('sesion', 'modelo', 'prioridad', 'inicio', 'concedido')
+
+    def __init__(self, sesion, modelo, prioridad):
+        self.sesion = sesion
+        self.modelo = modelo
+        self.prioridad = prioridad
+        self.inicio = time.monotonic()
+        self.concedido = threading.Event()
+
+
+class PlanificadorOllama:
+    """Reparte los huecos de un backend compartido por prioridad, modelo y sesión.
+
+    Como mucho ``max_concurrentes`` peticiones a la vez y ``limites_modelo``
+    por modelo. Cuando se libera un hueco pasa la petición más urgente
+    (``chat`` > ``vision`` > ``aprendizaje``); dentro de una prioridad los
+    huecos se conceden por turnos (round-robin) entre sesiones, así que un
+    usuario con muchas peticiones no deja sin servicio a los demás. Lo que
+    lleva más de ``envejecimiento`` segundos esperando pasa delante de todo
+    para que el trabajo de fondo no se quede sin hacer nunca. Si una cola
+    está llena, ``turno()`` lanza ``Saturado`` en vez de encolar sin límite.
+    """
+
+    def __init__(self, max_concurrentes=MAX_CONCURRENTES, limites_modelo=None,
+                 max_pendientes_sesion=MAX_PENDIENTES_SESION, max_pendientes=MAX_PENDIENTES,
+                 envejecimiento=ENVEJECIMIENTO):
+        self.max_concurrentes = max_concurrentes
+        self.limites_modelo = dict(LIMITES_MODELO if limites_modelo is None else limites_modelo)
+        self.max_pendientes_sesion = max_pendientes_sesion
+        self.max_pendientes = max_pendientes
+        self.envejecimiento = envejecimiento
+        self._lock = threading.Lock()
+        # prioridad -> sesión -> deque de esperas; el orden de las sesiones es el de la ronda
+        self._colas = {p: OrderedDict() for p in PRIORIDADES}
+        self._activos = 0
+        self._activos_modelo = {}
+        self._pendientes = 0
+        self._rechazadas = 0
+        self._admitidas = {p: 0 for p in PRIORIDADES}
+        self._esperas = {p: deque(maxlen=1000) for p in PRIORIDADES}
+        self._local = threading.local()
+
+    @contextmanager
+    def con_prioridad(self, prioridad):
+        """Prioridad por defecto de las peticiones de este hilo (p. ej. trabajo de fondo)"""
+        anterior = getattr(self._local, 'prioridad', None)
+        self._local.prioridad = prioridad
+        try:
+            yield
+        finally:
+            self._local.prioridad = anterior
+
+    @contextmanager
+    def turno(self, sesion, modelo=None, prioridad=None, cancelacion=None):
+        """Bloquea hasta tener hueco; ``cancelacion`` (Event) abandona la cola"""
+        prioridad = prioridad or getattr(self._local, 'prioridad', None) or PRIORIDADES[0]
+        self._entrar(_Espera(sesion, modelo, prioridad), cancelacion)
+        try:
+            yield
+        finally:
+            self._salir(modelo)
+
+    # --- ADMISIÓN ---
+    def _cabe(self, modelo):
+        limite = self.limites_modelo.get(modelo)
+        return self._activos < self.max_concurrentes and \
+            (limite is None or self._activos_modelo.get(modelo, 0) < limite)
+
+    def _ocupar(self, espera):
+        self._activos += 1
+        self._activos_modelo[espera.modelo] = self._activos_modelo.get(espera.modelo, 0) + 1
+        self._admitidas[espera.prioridad] += 1
+        self._esperas[espera.prioridad].append(time.monotonic() - espera.inicio)
+
+    def _entrar(self, espera, cancelacion):
+        with self._lock:
+            if not self._pendientes and self._cabe(espera.modelo):
+                self._ocupar(espera)
+                return
+            colas = self._colas[espera.prioridad]
+            cola = colas.get(espera.sesion)
+            if (cola is not None and len(cola) >= self.max_pendientes_sesion) \
+                    or self._pendientes >= self.max_pendientes:
+                self._rechazadas += 1
+                raise Saturado(f"demasiadas peticiones pendientes ({espera.sesion})")
+            if cola is None:
+                cola = colas[espera.sesion] = deque()
+            cola.append(espera)
+            self._pendientes += 1
+            # Puede haber hueco para este modelo aunque otros estén esperando el suyo
+            self._despachar()
+
+        while not espera.concedido.wait(0.1):
+            if cancelacion is not None and cancelacion.is_set():
+                with self._lock:
+                    if not espera.concedido.is_set():
+                        self._quitar(espera)
+                        raise GeneracionCancelada()
+                # Se concedió justo a la vez: hay que devolver el hueco
+                self._salir(espera.modelo)
+                raise GeneracionCancelada()
+
+    def _quitar(self, espera):
+        colas = self._colas[espera.prioridad]
+        cola = colas[espera.sesion]
+        cola.remove(espera)
+        self._pendientes -= 1
+        if not cola:
+            del colas[espera.sesion]
+
+    def _salir(self, modelo):
+        with self._lock:
+            self._activos -= 1
+            self._activos_modelo[modelo] -= 1
+            self._despachar()
+
+    def _siguiente(self):
+        """La espera que debe pasar ahora (o None si ninguna cabe)"""
+        ahora = time.monotonic()
+        # Primero lo que ha envejecido demasiado, sea de la prioridad que sea
+        viejas = [cola[0] for colas in self._colas.values() for cola in colas.values()
+                  if ahora - cola[0].inicio > self.envejecimiento and self._cabe(cola[0].modelo)]
+        if viejas:
+            return min(viejas, key=lambda e: e.inicio)
+        for prioridad in PRIORIDADES:
+            for cola in self._colas[prioridad].values():
+                if self._cabe(cola[0].modelo):
+                    return cola[0]
+        return None
+
+    def _despachar(self):
+        while self._pendientes and self._activos < self.max_concurrentes:
+            espera = self._siguiente()
+            if espera is None:
+                return
+            colas = self._colas[espera.prioridad]
+            cola = colas.pop(espera.sesion)
+            cola.popleft()
+            if cola:
+                colas[espera.sesion] = cola   # Al final de la ronda
+            self._pendientes -= 1
+            self._ocupar(espera)
+            espera.concedido.set()
+
+    # --- MÉTRICAS ---
+    def estadisticas(self):
+        with self._lock:
+            por_prioridad = {}
+            for p in PRIORIDADES:
+                esperas = list(self._esperas[p])
+                por_prioridad[p] = {
+                    'pendientes': sum(len(c) for c in self._colas[p].values()),
+                    'admitidas': self._admitidas[p],
+                    'espera_media': float(np.mean(esperas)) if esperas else 0.0,
+                    'espera_p95': float(np.percentile(esperas, 95)) if esperas else 0.0,
+                    'espera_max': max(esperas, default=0.0),
+                }
+            return {
+                'activos': self._activos,
+                'activos_por_modelo': {m: n for m, n in self._activos_modelo.items() if n},
+                'limites_modelo': self.limites_modelo,
+                'pendientes': self._pendientes,
+                'rechazadas': self._rechazadas,
+                'por_prioridad': por_prioridad,
+                'pendientes_por_sesion': {
+                    s: sum(len(self._colas[p].get(s, ())) for p in PRIORIDADES)
+                    for s in set().union(*self._colas.values())
+                },
+            }
+
+
+class MicroLotes:
+    """Agrupa trabajos de fondo por clave y los procesa de varios en varios.
+
+    ``procesar(contexto, items)`` se llama en un hilo propio cuando una clave
+    junta ``max_lote`` trabajos o el más antiguo lleva ``espera_max``
+    segundos esperando; así, p. ej., varios turnos se resumen en una sola
+    llamada al modelo en vez de una por turno.
+    """
+
+    def __init__(self, procesar, max_lote=MAX_LOTE, espera_max=ESPERA_LOTE):
+        self.procesar = procesar
+        self.max_lote = max_lote
+        self.espera_max = espera_max
+        self._lotes = OrderedDict()   # clave -> [instante del primero, contexto, items]
+        self._en_curso = set()        # Claves cuyo lote se está procesando ahora
+        self._cond = threading.Condition()
+        self._lotes_procesados = 0
+        self._items_procesados = 0
+        threading.Thread(target=self._bucle, daemon=True, name="micro-lotes").start()
+
+    def agregar(self, clave, item, contexto=None):
+        with self._cond:
+            lote = self._lotes.get(clave)
+            nuevo = lote is None
+            if nuevo:
+                lote = self._lotes[clave] = [time.monotonic(), contexto, []]
+            lote[2].append(item)
+            # Un lote nuevo fija un plazo; uno lleno hay que procesarlo ya
+            if nuevo or len(lote[2]) >= self.max_lote:
+                self._cond.notify_all()
+
+    def vaciar(self, clave=None, descartar=False):
+        """Procesa (o descarta) ya lo pendiente de una clave o de todas.
+
+        Espera además a que termine el lote de esa clave que esté en curso,
+        así que al volver nada de ella sigue ejecutándose.
+        """
+        with self._cond:
+            claves = [clave] if clave is not None else list(self._lotes)
+            lotes = [(c, self._lotes.pop(c)) for c in claves if c in self._lotes]
+            while any(c in self._en_curso for c in claves):
+                self._cond.wait()
+            for c, _ in lotes:
+                self._en_curso.add(c)
+        for c, (_, contexto, items) in lotes:
+            self._ejecutar(c, contexto, [] if descartar else items)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                listo = None
+                while listo is None:
+                    ahora = time.monotonic()
+                    for clave, (inicio, _, items) in self._lotes.items():
+                        if clave in self._en_curso:
+                            continue
+                        if len(items) >= self.max_lote or ahora - inicio >= self.espera_max:
+                            listo = clave
+                            break
+                    else:
+                        primero = min((l[0] for c, l in self._lotes.items() if c not in self._en_curso), default=None)
+                        self._cond.wait(None if primero is None else max(0.05, primero + self.espera_max - ahora))
+                _, contexto, items = self._lotes.pop(listo)
+                self._en_curso.add(listo)
+            self._ejecutar(listo, contexto, items)
+
+    def _ejecutar(self, clave, contexto, items):
+        try:
+            if items:
+                self.procesar(contexto, items)
+        except Exception as e:
+            print(f"Error en lote de fondo: {e}")
+        with self._cond:
+            self._en_curso.discard(clave)
+            if items:
+                self._lotes_procesados += 1
+                self._items_procesados += len(items)
+            self._cond.notify_all()
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                'pendientes': sum(len(l[2]) for l in self._lotes.values()),
+                'lotes_procesados': self._lotes_procesados,
+                'items_por_lote': self._items_procesados / self._lotes_procesados if self._lotes_procesados else 0.0,
+            }
@@ -0,0 +1,32 @@
+# --- ENSAMBLADO DE PROMPTS ---
+# Ollama reutiliza la caché KV del prefijo común entre peticiones. Para
+# aprovecharla, los mensajes se ordenan de lo más estable a lo más volátil:
+# persona e instrucciones -> perfil y resumen -> historial -> contexto del
+# turno (recuerdos, pantalla) pegado al último mensaje del usuario. Así un
+# cambio de pantalla solo invalida el final del prompt.
+
+
+def unir_segmentos(segmentos):
+    """Une los segmentos no vacíos en un único texto"""
+    return " ".join(s.strip() for s in segmentos if s and s.strip())
+
+
+def ensamblar_mensajes(estables, historial, volatiles, prompt, imagenes=None):
+    """Construye la lista de mensajes para ``ollama.chat``.
+
+    ``estables`` van al system prompt (cambian rara vez), ``historial`` son los
+    mensajes previos tal cual y ``volatiles`` (lo que cambia en cada turno) se
+    anteponen a la pregunta del usuario, al final de todo.
+    """
+    mensajes = []
+    sistema = unir_segmentos(estables)
+    if sistema:
+        mensajes.append({'role': 'system', 'content': sistema})
+    mensajes.extend(historial)
+
+    contexto = unir_segmentos(volatiles)
+    ultimo = {'role': 'user', 'content': f"{contexto}\n\n{prompt}" if contexto else prompt}
+    if imagenes:
+        ultimo['images'] = imagenes
+    mensajes.append(ultimo)
+    return mensajes
@@ -0,0 +1,148 @@
+import time
+
+# --- CONFIGURACIÓN ---
+MIN_PRIMERA = 5           # Caracteres mínimos para soltar una cláusula en una coma
+OBJETIVO_INICIAL = 40     # Tamaño buscado para el segundo trozo
+CRECIMIENTO = 2.0         # Cada trozo siguiente puede ser así de mayor...
+MAX_CARACTERES = 200      # ...hasta este tope (también fuerza el corte en comas)
+CARACTERES_POR_SEGUNDO = 14   # Velocidad de habla estimada para saber cuánto audio queda
+MARGEN_AUDIO = 1.5        # Con menos audio pendiente que esto se corta en cuanto se pueda
+
+FUERTES = ".!?…\n"
+SUAVES = ",;:"
+CIERRES = "\"'»”’)]"
+APERTURAS = "¡¿"
+ABREVIATURAS = frozenset("""
+    sr sra srta sres srs dr dra dres d dña don lic ing arq prof profa
+    etc ej p pág págs núm nº art cap vol ud uds vd vds aprox tel av avda
+    c cía s.a ee.uu min máx mín km kg cm mm aa.hh dpto depto gral
+""".split())
+
+
+class SegmentadorFrases:
+    """Corta el texto que va llegando del LLM en trozos pronunciables para el TTS.
+
+    Recorre cada carácter una sola vez (O(n) sobre todo el stream). No corta
+    en abreviaturas ("Sr.", "p. ej."), iniciales, decimales ("3.5", "2,75")
+    ni dentro de puntos suspensivos. El primer trozo sale en cuanto hay una
+    cláusula decente (basta una coma) para que la voz empiece cuanto antes;
+    después el tamaño buscado crece para hacer menos llamadas al TTS, salvo
+    que el audio ya emitido esté a punto de acabarse (estimado a
+    ``caracteres_por_segundo``), en cuyo caso se vuelve a cortar pronto.
+    ``reloj`` permite simular el tiempo en benchmarks.
+    """
+
+    def __init__(self, min_primera=MIN_PRIMERA, objetivo_inicial=OBJETIVO_INICIAL,
+                 crecimiento=CRECIMIENTO, max_caracteres=MAX_CARACTERES,
+                 caracteres_por_segundo=CARACTERES_POR_SEGUNDO, margen_audio=MARGEN_AUDIO,
+                 reloj=time.monotonic):
+        self.min_primera = min_primera
+        self.crecimiento = crecimiento
+        self.max_caracteres = max_caracteres
+        self.caracteres_por_segundo = caracteres_por_segundo
+        self.margen_audio = margen_audio
+        self.reloj = reloj
+        self.objetivo = objetivo_inicial
+        self.emitidas = 0
+        self._fin_audio = 0.0     # Cuándo se acabaría de decir lo ya emitido
+        self._texto = ""          # Solo lo pendiente de emitir
+        self._pos = 0             # Hasta dónde ya se ha analizado _texto
+        self._corte_fuerte = 0    # Último fin de frase aún no emitido
+        self._corte_suave = 0     # Última coma aún no emitida
+
+    def agregar(self, delta):
+        """Añade un trozo del stream; devuelve la lista de frases ya listas para hablar"""
+        self._texto += delta
+        return self._escanear(final=False)
+
+    def terminar(self):
+        """Fin del stream: devuelve todo lo que quedaba pendiente"""
+        listas = self._escanear(final=True)
+        self._emitir(len(self._texto), listas)
+        return listas
+
+    def _escanear(self, final):
+        listas = []
+        t = self._texto
+        i = self._pos
+        while i < len(t):
+            c = t[i]
+            if c in FUERTES or c in SUAVES:
+                fin = self._fin_de_corte(t, i, final)
+                if fin is None:
+                    break  # Falta el siguiente carácter para decidir
+                if fin:
+                    if self._decidir(fin, c in FUERTES):
+                        self._emitir(fin, listas)
+                        t, i = self._texto, 0
+                        continue
+                    i = fin
+                    continue
+            elif i >= self.max_caracteres * 1.5:
+                # Nada donde cortar: mejor un corte en un espacio que un trozo enorme
+                corte = self._corte_fuerte or self._corte_suave or (t.rfind(" ", 0, i) + 1) or i
+                self._emitir(corte, listas)
+                t = self._texto
+                i -= corte
+                continue
+            i += 1
+        self._pos = i
+        return listas
+
+    def _fin_de_corte(self, t, i, final):
+        """Fin (exclusivo) del corte en ``t[i]``, 0 si no es un corte o None si aún no se sabe"""
+        n = len(t)
+        c = t[i]
+        j = i + 1
+        if c == '\n':
+            return j
+        if c == '.':
+            while j < n and t[j] == '.':
+                j += 1
+            if j - i == 1:
+                k = i
+                while k > 0 and (t[k - 1].isalpha() or t[k - 1] == '.'):
+                    k -= 1
+                palabra = t[k:i]
+                if palabra.lower() in ABREVIATURAS or (len(palabra) == 1 and palabra.isupper()):
+                    return 0
+        while j < n and t[j] in CIERRES:
+            j += 1
+        if j == n:
+            return j if final else None
+        # "3.5", "2,75", "www.ejemplo.com"... solo es corte si sigue un espacio
+        if t[j].isspace() or (c in "!?…" and t[j] in APERTURAS):
+            return j
+        return 0
+
+    def _decidir(self, fin, fuerte):
+        largo = fin
+        if fuerte:
+            self._corte_fuerte = fin
+        else:
+            self._corte_suave = fin
+        if self.emitidas == 0 or self._fin_audio - self.reloj() < self.margen_audio:
+            # Primera frase o la voz se va a quedar sin nada que decir
+            return largo >= (2 if fuerte else self.min_primera)
+        if fuerte:
+            return largo >= self.objetivo
+        return largo >= self.max_caracteres
+
+    def _emitir(self, fin, listas):
+        frase = self._texto[:fin].strip()
+        self._texto = self._texto[fin:]
+        self._corte_fuerte = self._corte_suave = 0
+        if not any(ch.isalnum() for ch in frase):
+            return  # Puntuación suelta ("...", "¡"): no merece una llamada al TTS
+        listas.append(frase)
+        ahora = self.reloj()
+        self._fin_audio = max(ahora, self._fin_audio) + len(frase) / self.caracteres_por_segundo
+        if self.emitidas:
+            self.objetivo = min(self.max_caracteres, int(self.objetivo * self.crecimiento))
+        self.emitidas += 1
+
+
+def segmentar(texto, **opciones):
+    """Atajo para un texto ya completo"""
+    segmentador = SegmentadorFrases(**opciones)
+    return segmentador.agregar(texto) + segmentador.terminar()
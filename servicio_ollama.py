@@ -0,0 +1,171 @@
+import asyncio
+import concurrent.futures
+import queue
+import threading
+
+# --- CONFIGURACIÓN ---
+HOST_OLLAMA = None          # None: usa OLLAMA_HOST o http://127.0.0.1:11434
+TIMEOUT_PETICION = 120      # Segundos máximos por petición completa
+TIMEOUT_LECTURA = 30        # Segundos máximos sin recibir nada de Ollama
+MAX_CONEXIONES = 8
+
+_FIN = object()
+
+
+class GeneracionCancelada(Exception):
+    """La petición se canceló (barge-in o cierre) antes de terminar"""
+
+
+class Generacion:
+    """Respuesta en streaming de Ollama consumible desde cualquier hilo.
+
+    Se itera como el stream de ``ollama.chat`` y ``cancelar()`` corta la
+    petición HTTP en curso: la iteración termina sin más chunks.
+    """
+
+    def __init__(self):
+        self.cancelada = False
+        self._cola = queue.Queue()
+        self._futuro = None
+
+    def __iter__(self):
+        while True:
+            item = self._cola.get()
+            if item is _FIN:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def cancelar(self):
+        self.cancelada = True
+        if self._futuro is not None:
+            self._futuro.cancel()
+        self._cola.put(_FIN)
+
+
+class ServicioOllama:
+    """Cliente único de Ollama compartido por todo el proceso.
+
+    Un ``AsyncClient`` con pool de conexiones HTTP vive en un bucle asyncio
+    propio (hilo de fondo). Desde hilos normales se usa con los métodos
+    síncronos (``chat``, ``chat_stream``, ``generate``, ``embed``) y desde
+    otro bucle asyncio con ``achat``. Toda petición tiene timeout y puede
+    cancelarse, una a una o todas con ``cancelar_todo()``. ``ollama`` (y
+    httpx/pydantic detrás) no se importa hasta la primera petición.
+    """
+
+    def __init__(self, host=HOST_OLLAMA, timeout=TIMEOUT_PETICION,
+                 timeout_lectura=TIMEOUT_LECTURA, max_conexiones=MAX_CONEXIONES):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._loop.run_forever, daemon=True, name="ollama-async")
+        self._hilo.start()
+        self._opciones_cliente = (host, timeout_lectura, max_conexiones)
+        self._cliente = None
+        self._activas = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    import httpx
+                    import ollama
+                    host, timeout_lectura, max_conexiones = self._opciones_cliente
+                    self._cliente = ollama.AsyncClient(
+                        host=host,
+                        timeout=httpx.Timeout(timeout_lectura, connect=5.0),
+                        limits=httpx.Limits(max_connections=max_conexiones, max_keepalive_connections=max_conexiones)
+                    )
+        return self._cliente
+
+    # --- INFRAESTRUCTURA ---
+    def _limite(self, timeout):
+        return self.timeout if timeout is None else timeout
+
+    def _lanzar(self, corrutina, timeout, limitar=True):
+        """Programa la corrutina en el bucle del servicio y devuelve un Future cancelable"""
+        if limitar:
+            corrutina = asyncio.wait_for(corrutina, self._limite(timeout))
+        futuro = asyncio.run_coroutine_threadsafe(corrutina, self._loop)
+        with self._lock:
+            self._activas.add(futuro)
+        futuro.add_done_callback(self._olvidar)
+        return futuro
+
+    def _olvidar(self, futuro):
+        with self._lock:
+            self._activas.discard(futuro)
+
+    def _esperar(self, futuro):
+        try:
+            return futuro.result()
+        except concurrent.futures.CancelledError:
+            raise GeneracionCancelada()
+
+    def cancelar_todo(self):
+        """Aborta todas las peticiones en vuelo (p. ej. cuando el usuario interrumpe)"""
+        with self._lock:
+            activas = list(self._activas)
+        for futuro in activas:
+            futuro.cancel()
+        return len(activas)
+
+    # --- API SÍNCRONA (hilos) ---
+    def chat(self, timeout=None, **kwargs):
+        return self._esperar(self._lanzar(self.cliente.chat(**kwargs), timeout))
+
+    def generate(self, timeout=None, **kwargs):
+        return self._esperar(self._lanzar(self.cliente.generate(**kwargs), timeout))
+
+    def embed(self, timeout=None, **kwargs):
+        return self._esperar(self._lanzar(self.cliente.embed(**kwargs), timeout))
+
+    def chat_stream(self, timeout=None, **kwargs):
+        """Como ``ollama.chat(stream=True)`` pero devuelve una Generacion cancelable"""
+        generacion = Generacion()
+
+        async def recibir():
+            async for chunk in await self.cliente.chat(stream=True, **kwargs):
+                generacion._cola.put(chunk)
+
+        async def consumir():
+            try:
+                # El límite va aquí dentro: agotarlo es un error, no una cancelación del usuario
+                await asyncio.wait_for(recibir(), self._limite(timeout))
+            except asyncio.TimeoutError:
+                generacion._cola.put(TimeoutError(f"Ollama no terminó en {self._limite(timeout)} s"))
+            except asyncio.CancelledError:
+                generacion.cancelada = True
+                raise
+            except Exception as e:
+                generacion._cola.put(e)
+            finally:
+                generacion._cola.put(_FIN)
+
+        generacion._futuro = self._lanzar(consumir(), timeout, limitar=False)
+        return generacion
+
+    # --- API ASÍNCRONA (otros bucles asyncio) ---
+    async def achat(self, timeout=None, **kwargs):
+        futuro = self._lanzar(self.cliente.chat(**kwargs), timeout)
+        try:
+            return await asyncio.wrap_future(futuro)
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+
+
+_servicio = None
+_servicio_lock = threading.Lock()
+
+
+def obtener_servicio():
+    """Instancia compartida del servicio (se crea en el primer uso)"""
+    global _servicio
+    with _servicio_lock:
+        if _servicio is None:
+            _servicio = ServicioOllama()
+        return _servicio
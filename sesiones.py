@@ -0,0 +1,185 @@
+import queue
+import re
+import shutil
+import threading
+import time
+
+# --- CONFIGURACIÓN ---
+TTL_SESION = 1800            # Segundos sin clientes ni actividad antes de liberar una sesión
+
+
+def id_seguro(usuario):
+    """Id de sesión apto como nombre de carpeta a partir de lo que mande el cliente"""
+    return re.sub(r'[^\w.-]', '_', usuario.strip())[:64] or "anonimo"
+
+
+class Sesion:
+    """Estado de una conversación: memoria, historial, voz y turno en curso.
+
+    Cada sesión emite solo a su sala de Socket.IO (``sala``), así que varios
+    usuarios comparten el proceso sin verse entre sí. Los componentes
+    (almacén, índice, ventana, canal, voz) los crea quien construye la sesión.
+    """
+
+    def __init__(self, id, almacen, indice, ventana, canal, emitir, cache_vision, frames,
+                 carpeta=None, efimera=False, remota=True):
+        self.id = id
+        self.sala = f"sesion:{id}"
+        self.almacen = almacen
+        self.memoria = almacen.memoria
+        self.indice = indice
+        self.ventana = ventana
+        self.canal = canal
+        self.cache_vision = cache_vision    # Propia: una pantalla de otro usuario nunca responde por esta
+        self.frames = frames                # Capturas servidas en /frame/<id de sesión>/<id de frame>
+        self.carpeta = carpeta
+        self.efimera = efimera          # Sin usuario: se borra al liberarla
+        self.remota = remota            # Entrada/salida por el socket, no por el micro local
+        self._emitir = emitir
+        self.sids = set()
+        self.ultimo_uso = time.monotonic()
+
+        # Voz
+        self.cola_voz = queue.Queue()
+        self.esta_hablando = threading.Event()
+        self.voz_libre = threading.Event()   # Lo contrario de esta_hablando, para esperar sin sondear
+        self.voz_libre.set()
+        self.voz = None                 # VozEnCola
+
+        # Turno en curso y barge-in
+        self.turno_actual = None        # Future del turno que se está generando/hablando
+        self.cancelacion = None         # threading.Event del turno actual
+        self.generacion = None          # Generacion (stream) de Ollama en curso
+        self.traza = None               # TrazaTurno del último turno (el primer audio llega tarde)
+        self.ultima_captura = None      # [(captura, url_frame, huella)] subida por el cliente
+        self.vigilante = None           # VigilantePantalla (solo la sesión local, si está activo)
+        self.al_cerrar = []             # Se llaman antes de cerrar el almacén (p. ej. aprendizaje pendiente)
+
+    def emitir(self, evento, datos):
+        try:
+            self._emitir(evento, datos, to=self.sala)
+        except Exception:
+            pass
+
+    def tocar(self):
+        self.ultimo_uso = time.monotonic()
+
+    def turno_en_curso(self):
+        return self.esta_hablando.is_set() or (self.turno_actual is not None and not self.turno_actual.done())
+
+    def vaciar_cola_voz(self):
+        while True:
+            try:
+                self.cola_voz.get_nowait()
+            except queue.Empty:
+                break
+            self.cola_voz.task_done()
+
+    def interrumpir(self):
+        """Barge-in: aborta la generación en curso y todo lo que quedaba por decir"""
+        if self.cancelacion is not None:
+            self.cancelacion.set()
+        if self.generacion is not None:
+            self.generacion.cancelar()
+        self.vaciar_cola_voz()
+        if self.voz is not None:
+            self.voz.interrumpir()
+
+    def cerrar(self):
+        self.interrumpir()
+        if self.vigilante is not None:
+            self.vigilante.detener()
+        self.cola_voz.put(None)     # Termina los hilos de VozEnCola
+        self.canal.cerrar()
+        for funcion in self.al_cerrar:
+            try:
+                funcion(self)
+            except Exception as e:
+                print(f"Error cerrando sesión {self.id}: {e}")
+        self.almacen.cerrar()
+        if self.efimera and self.carpeta:
+            shutil.rmtree(self.carpeta, ignore_errors=True)
+
+
+class GestorSesiones:
+    """Sesiones vivas por id y qué conexión (sid) está en cada una.
+
+    ``crear(id, efimera)`` construye una sesión nueva la primera vez que se
+    pide. Las sesiones registradas como fijas (la local) nunca se liberan;
+    el resto se cierra tras ``ttl`` segundos sin clientes ni turnos.
+    """
+
+    def __init__(self, crear, ttl=TTL_SESION):
+        self.crear = crear
+        self.ttl = ttl
+        self._sesiones = {}
+        self._fijas = set()
+        self._por_sid = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sesion, fija=False):
+        with self._lock:
+            self._sesiones[sesion.id] = sesion
+            if fija:
+                self._fijas.add(sesion.id)
+        return sesion
+
+    def obtener(self, id, efimera=False, fija=False):
+        with self._lock:
+            sesion = self._sesiones.get(id)
+            if sesion is None:
+                sesion = self._sesiones[id] = self.crear(id, efimera)
+            if fija:
+                self._fijas.add(id)
+            sesion.tocar()
+            return sesion
+
+    def conectar(self, sid, id, efimera=False):
+        sesion = self.obtener(id, efimera)
+        with self._lock:
+            sesion.sids.add(sid)
+            self._por_sid[sid] = sesion
+        return sesion
+
+    def desconectar(self, sid):
+        with self._lock:
+            sesion = self._por_sid.pop(sid, None)
+            if sesion is not None:
+                sesion.sids.discard(sid)
+                sesion.tocar()
+            return sesion
+
+    def de_sid(self, sid):
+        return self._por_sid.get(sid)
+
+    def buscar(self, id):
+        """La sesión viva con ese id, sin crearla"""
+        with self._lock:
+            return self._sesiones.get(id)
+
+    def vivas(self):
+        with self._lock:
+            return list(self._sesiones.values())
+
+    def cerrar_inactivas(self):
+        ahora = time.monotonic()
+        with self._lock:
+            cerrar = [s for id, s in self._sesiones.items()
+                      if id not in self._fijas and not s.sids and not s.turno_en_curso()
+                      and (s.efimera or ahora - s.ultimo_uso > self.ttl)]
+            for sesion in cerrar:
+                del self._sesiones[sesion.id]
+        for sesion in cerrar:
+            sesion.cerrar()
+        return len(cerrar)
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                id: {'clientes': len(s.sids), 'hablando': s.esta_hablando.is_set(),
+                     'turno_en_curso': s.turno_en_curso(), 'inactiva': round(time.monotonic() - s.ultimo_uso)}
+                for id, s in self._sesiones.items()
+            }
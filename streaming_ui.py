@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+
+# --- CONFIGURACIÓN ---
+INTERVALO_COALESCENCIA = 0.04   # Segundos entre envíos de deltas (~25 por segundo)
+
+
+class CanalStreaming:
+    """Envía la respuesta parcial a la UI como deltas numerados y agrupados.
+
+    En vez de reenviar el texto completo en cada token, acumula lo nuevo y lo
+    emite como ``stream_delta`` (``id``, ``seq``, ``offset``, ``delta``) como
+    mucho una vez por ``intervalo``; el primer delta sale sin esperar. Un
+    cliente que se (re)conecta o detecta un hueco pide ``sincronizar`` y
+    recibe el texto acumulado en un ``stream_sync``.
+
+    ``emitir(evento, datos, to=None)`` es normalmente ``socketio.emit``.
+    ``iniciar()`` devuelve el id del stream; pasándolo a ``agregar`` y
+    ``terminar``, un turno ya interrumpido no toca el stream del siguiente.
+    """
+
+    def __init__(self, emitir, intervalo=INTERVALO_COALESCENCIA):
+        self._emitir = emitir
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._hay_datos = threading.Event()
+        self._hilo = None
+        self._cerrado = False
+        self._id = None
+        self._partes = []       # Trozos recibidos: += sobre un str sería cuadrático
+        self._largo = 0
+        self._enviadas = 0      # Trozos ya emitidos...
+        self._enviado = 0       # ...y caracteres que suman
+        self._seq = 0
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None and not self._cerrado:
+                self._hilo = threading.Thread(target=self._bucle, daemon=True, name="ui-streaming")
+                self._hilo.start()
+            self._id = uuid.uuid4().hex[:12]
+            self._partes, self._largo, self._enviadas, self._enviado, self._seq = [], 0, 0, 0, 0
+            self._emitir('stream_start', {'id': self._id})
+            return self._id
+
+    def agregar(self, delta, id=None):
+        with self._lock:
+            if self._id is None or not delta or (id is not None and id != self._id):
+                return
+            self._partes.append(delta)
+            self._largo += len(delta)
+            if self._seq == 0:
+                self._volcar()  # El primer trozo sin esperar: es lo que más se nota
+            else:
+                self._hay_datos.set()
+
+    def terminar(self, texto_final=None, id=None):
+        with self._lock:
+            if self._id is None or (id is not None and id != self._id):
+                return
+            self._volcar()
+            texto = "".join(self._partes) if texto_final is None else texto_final
+            self._emitir('stream_end', {'id': self._id, 'seq': self._seq, 'msg': texto})
+            self._id = None
+
+    def sincronizar(self, destino=None):
+        """Reenvía el estado completo del stream en curso (reconexión o hueco de seq)"""
+        with self._lock:
+            if self._id is None:
+                return
+            self._volcar()
+            self._emitir('stream_sync', {'id': self._id, 'seq': self._seq, 'msg': "".join(self._partes)},
+                         to=destino)
+
+    def cerrar(self):
+        """Termina el hilo de envío (al cerrar la sesión dueña del canal)"""
+        with self._lock:
+            self._cerrado = True
+            self._id = None
+        self._hay_datos.set()
+
+    def _bucle(self):
+        while True:
+            self._hay_datos.wait()
+            if self._cerrado:
+                return
+            time.sleep(self.intervalo)
+            with self._lock:
+                self._hay_datos.clear()
+                self._volcar()
+
+    def _volcar(self):
+        if self._id is None or self._enviado >= self._largo:
+            return
+        self._seq += 1
+        self._emitir('stream_delta', {
+            'id': self._id,
+            'seq': self._seq,
+            'offset': self._enviado,
+            'delta': "".join(self._partes[self._enviadas:])
+        })
+        self._enviadas, self._enviado = len(self._partes), self._largo
@@ -0,0 +1,177 @@
+import json
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+FRECUENCIA_STT = 16000          # Todos los motores reciben PCM 16 bits mono a 16 kHz
+IDIOMA_STT = "es"
+RUTA_MODELO_VOSK = "modelos/vosk-model-small-es-0.42"
+MODELO_WHISPER = "base"         # tiny / base / small (CPU, int8)
+INTERVALO_PARCIAL_WHISPER = 0.8 # Segundos de audio nuevo entre hipótesis parciales
+
+
+# --- INTERFAZ ---
+class SesionSTT:
+    """Reconocimiento de una frase: se alimenta con PCM según llega y se finaliza al acabar"""
+
+    def alimentar(self, pcm):
+        """Añade audio; devuelve la hipótesis parcial actual (o None si no cambió)"""
+        raise NotImplementedError
+
+    def finalizar(self):
+        """Texto definitivo de la frase ('' si no se entendió nada)"""
+        raise NotImplementedError
+
+
+class MotorSTT:
+    nombre = "base"
+    frecuencia = FRECUENCIA_STT
+
+    def nueva_sesion(self):
+        raise NotImplementedError
+
+    def transcribir(self, pcm):
+        """Atajo para una frase ya grabada entera"""
+        sesion = self.nueva_sesion()
+        sesion.alimentar(pcm)
+        return sesion.finalizar()
+
+    def transcribir_audio(self, audio):
+        """Transcribe un ``speech_recognition.AudioData`` convirtiéndolo al formato del motor"""
+        return self.transcribir(audio.get_raw_data(convert_rate=self.frecuencia, convert_width=2))
+
+
+# --- GOOGLE (RED, SIN STREAMING) ---
+class _SesionGoogle(SesionSTT):
+    def __init__(self, motor):
+        self.motor = motor
+        self._trozos = []
+
+    def alimentar(self, pcm):
+        self._trozos.append(pcm)
+        return None
+
+    def finalizar(self):
+        import speech_recognition as sr
+        audio = sr.AudioData(b"".join(self._trozos), self.motor.frecuencia, 2)
+        try:
+            return self.motor.recognizer.recognize_google(audio, language=self.motor.idioma)
+        except sr.UnknownValueError:
+            return ""
+
+
+class MotorGoogle(MotorSTT):
+    """El reconocedor original: envía la frase entera a Google al terminar"""
+    nombre = "google"
+
+    def __init__(self, idioma="es-ES"):
+        import speech_recognition as sr
+        self.recognizer = sr.Recognizer()
+        self.idioma = idioma
+
+    def nueva_sesion(self):
+        return _SesionGoogle(self)
+
+
+# --- VOSK (LOCAL, STREAMING REAL) ---
+class _SesionVosk(SesionSTT):
+    def __init__(self, motor):
+        import vosk
+        self._rec = vosk.KaldiRecognizer(motor.modelo, motor.frecuencia)
+        self._textos = []
+        self._parcial = ""
+
+    def alimentar(self, pcm):
+        if self._rec.AcceptWaveform(pcm):
+            # Vosk cerró un segmento por su cuenta (pausa interna)
+            texto = json.loads(self._rec.Result()).get('text', '')
+            if texto:
+                self._textos.append(texto)
+            parcial = ""
+        else:
+            parcial = json.loads(self._rec.PartialResult()).get('partial', '')
+        actual = " ".join(self._textos + ([parcial] if parcial else []))
+        if actual == self._parcial:
+            return None
+        self._parcial = actual
+        return actual
+
+    def finalizar(self):
+        texto = json.loads(self._rec.FinalResult()).get('text', '')
+        return " ".join(self._textos + ([texto] if texto else [])).strip()
+
+
+class MotorVosk(MotorSTT):
+    """Kaldi vía Vosk: decodifica mientras se habla, así que finalizar es casi inmediato"""
+    nombre = "vosk"
+
+    def __init__(self, ruta_modelo=RUTA_MODELO_VOSK):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.modelo = vosk.Model(ruta_modelo)
+
+    def nueva_sesion(self):
+        return _SesionVosk(self)
+
+
+# --- FASTER-WHISPER (LOCAL, CPU) ---
+class _SesionWhisper(SesionSTT):
+    def __init__(self, motor):
+        self.motor = motor
+        self._audio = bytearray()
+        self._decodificado_hasta = 0
+
+    def _decodificar(self):
+        muestras = np.frombuffer(bytes(self._audio), dtype=np.int16).astype(np.float32) / 32768.0
+        segmentos, _ = self.motor.modelo.transcribe(
+            muestras, language=self.motor.idioma, beam_size=1, vad_filter=False,
+            condition_on_previous_text=False
+        )
+        return " ".join(s.text.strip() for s in segmentos).strip()
+
+    def alimentar(self, pcm):
+        self._audio.extend(pcm)
+        # Whisper no es incremental: re-decodificar cada cierto audio nuevo da los parciales
+        bytes_intervalo = int(self.motor.intervalo_parcial * self.motor.frecuencia) * 2
+        if len(self._audio) - self._decodificado_hasta < bytes_intervalo:
+            return None
+        self._decodificado_hasta = len(self._audio)
+        return self._decodificar()
+
+    def finalizar(self):
+        if not self._audio:
+            return ""
+        return self._decodificar()
+
+
+class MotorWhisper(MotorSTT):
+    """faster-whisper en CPU (int8); parciales por re-decodificación periódica"""
+    nombre = "whisper"
+
+    def __init__(self, modelo=MODELO_WHISPER, idioma=IDIOMA_STT,
+                 intervalo_parcial=INTERVALO_PARCIAL_WHISPER, hilos=4):
+        from faster_whisper import WhisperModel
+        self.modelo = WhisperModel(modelo, device="cpu", compute_type="int8", cpu_threads=hilos)
+        self.idioma = idioma
+        self.intervalo_parcial = intervalo_parcial
+
+    def nueva_sesion(self):
+        return _SesionWhisper(self)
+
+
+MOTORES = {
+    'google': MotorGoogle,
+    'vosk': MotorVosk,
+    'whisper': MotorWhisper,
+}
+
+
+def crear_motor(nombre, respaldo='google', **opciones):
+    """Crea el motor pedido; si no está instalado (o falta el modelo) usa el de respaldo"""
+    try:
+        return MOTORES[nombre](**opciones)
+    except Exception as e:
+        if not respaldo or respaldo == nombre:
+            raise
+        print(f"STT '{nombre}' no disponible ({e}). Usando '{respaldo}'.")
+        return MOTORES[respaldo]()
@@ -0,0 +1,321 @@
+import io
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+# --- CONFIGURACIÓN ---
+VOZ_ESPEAK = "es"
+VELOCIDAD_ESPEAK = 165
+MODELO_PIPER = "modelos/es_ES-davefx-medium.onnx"
+MAX_CACHE_AUDIO = 64
+MS_BLOQUE_REPRODUCCION = 40   # Trozos pequeños para poder cortar la voz al instante
+FRASES_FRECUENTES = [
+    "Vaya, me ha costado ver eso.",
+    "¡Hola!",
+    "¡Hasta la próxima!",
+]
+
+
+class AudioVoz:
+    """PCM 16 bits mono listo para reproducir"""
+    __slots__ = ('pcm', 'frecuencia')
+
+    def __init__(self, pcm, frecuencia):
+        self.pcm = pcm
+        self.frecuencia = frecuencia
+
+    @property
+    def duracion(self):
+        return len(self.pcm) / 2 / self.frecuencia
+
+
+def audio_desde_wav(datos):
+    with wave.open(io.BytesIO(datos), 'rb') as w:
+        pcm = w.readframes(w.getnframes())
+        if w.getnchannels() > 1 or w.getsampwidth() != 2:
+            import numpy as np
+            muestras = np.frombuffer(pcm, dtype=np.int16).reshape(-1, w.getnchannels())
+            pcm = muestras.mean(axis=1).astype(np.int16).tobytes()
+        return AudioVoz(pcm, w.getframerate())
+
+
+# --- MOTORES ---
+class MotorTTS:
+    nombre = "base"
+
+    def sintetizar(self, texto):
+        """Devuelve un AudioVoz con la frase ya sintetizada (no reproduce nada)"""
+        raise NotImplementedError
+
+
+class MotorEspeak(MotorTTS):
+    """espeak-ng local (Linux/Windows/macOS), muy rápido"""
+    nombre = "espeak"
+
+    def __init__(self, voz=VOZ_ESPEAK, velocidad=VELOCIDAD_ESPEAK):
+        self.binario = shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.binario:
+            raise RuntimeError("espeak-ng no está instalado")
+        self.voz = voz
+        self.velocidad = velocidad
+
+    def sintetizar(self, texto):
+        salida = subprocess.run(
+            [self.binario, "-v", self.voz, "-s", str(self.velocidad), "--stdout", texto],
+            capture_output=True, check=True
+        ).stdout
+        return audio_desde_wav(salida)
+
+
+class MotorPiper(MotorTTS):
+    """Piper (voces neuronales ONNX) en CPU"""
+    nombre = "piper"
+
+    def __init__(self, modelo=MODELO_PIPER):
+        self.binario = shutil.which("piper")
+        if not self.binario:
+            raise RuntimeError("piper no está instalado")
+        if not os.path.exists(modelo):
+            raise RuntimeError(f"no se encuentra el modelo de Piper {modelo}")
+        self.modelo = modelo
+        with open(modelo + ".json", 'r', encoding='utf-8') as f:
+            self.frecuencia = json.load(f)['audio']['sample_rate']
+
+    def sintetizar(self, texto):
+        pcm = subprocess.run(
+            [self.binario, "--model", self.modelo, "--output_raw"],
+            input=texto.encode('utf-8'), capture_output=True, check=True
+        ).stdout
+        return AudioVoz(pcm, self.frecuencia)
+
+
+class MotorSapi(MotorTTS):
+    """Voz nativa de Windows (SAPI5) renderizada a memoria en vez de a los altavoces"""
+    nombre = "sapi"
+    FORMATO_22KHZ_16BIT_MONO = 22
+
+    def __init__(self):
+        if sys.platform != "win32":
+            raise RuntimeError("SAPI solo existe en Windows")
+        self._local = threading.local()
+
+    def _voz(self):
+        # Los objetos COM pertenecen al hilo que los crea
+        if getattr(self._local, 'voz', None) is None:
+            import pythoncom
+            import win32com.client
+            pythoncom.CoInitialize()
+            voz = win32com.client.Dispatch("SAPI.SpVoice")
+            voces = voz.GetVoices()
+            for i in range(voces.Count):
+                if "Spanish" in voces.Item(i).GetDescription():
+                    voz.Voice = voces.Item(i)
+                    break
+            self._local.voz = voz
+        return self._local.voz
+
+    def sintetizar(self, texto):
+        import win32com.client
+        voz = self._voz()
+        memoria = win32com.client.Dispatch("SAPI.SpMemoryStream")
+        memoria.Format.Type = self.FORMATO_22KHZ_16BIT_MONO
+        voz.AudioOutputStream = memoria
+        voz.Speak(texto)
+        return AudioVoz(bytes(memoria.GetData()), 22050)
+
+
+class MotorPyttsx3(MotorTTS):
+    """pyttsx3 (SAPI / NSSpeech / espeak según el sistema) volcado a un WAV temporal"""
+    nombre = "pyttsx3"
+
+    def __init__(self, velocidad=155):
+        import pyttsx3
+        self.motor = pyttsx3.init()
+        self.motor.setProperty('rate', velocidad)
+        for voz in self.motor.getProperty('voices'):
+            if "spanish" in voz.name.lower() or "es-es" in voz.id.lower():
+                self.motor.setProperty('voice', voz.id)
+                break
+        self._lock = threading.Lock()
+
+    def sintetizar(self, texto):
+        with self._lock, tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "frase.wav")
+            self.motor.save_to_file(texto, ruta)
+            self.motor.runAndWait()
+            with open(ruta, 'rb') as f:
+                return audio_desde_wav(f.read())
+
+
+MOTORES = {
+    'sapi': MotorSapi,
+    'piper': MotorPiper,
+    'espeak': MotorEspeak,
+    'pyttsx3': MotorPyttsx3,
+}
+
+
+def crear_motor_tts(nombre="auto", **opciones):
+    """Crea el motor pedido; 'auto' prueba SAPI en Windows y Piper/espeak-ng en Linux"""
+    if nombre != "auto":
+        return MOTORES[nombre](**opciones)
+    orden = ['sapi', 'piper', 'espeak', 'pyttsx3'] if sys.platform == "win32" else ['piper', 'espeak', 'pyttsx3']
+    for candidato in orden:
+        try:
+            return MOTORES[candidato]()
+        except Exception as e:
+            print(f"TTS '{candidato}' no disponible ({e}).")
+    raise RuntimeError("No hay ningún motor de voz disponible")
+
+
+# --- CACHE Y REPRODUCCIÓN ---
+class CacheAudio:
+    """LRU de frases ya sintetizadas (saludos, mensajes de error...)"""
+
+    def __init__(self, motor, max_entradas=MAX_CACHE_AUDIO):
+        self.motor = motor
+        self.max_entradas = max_entradas
+        self._audios = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, texto):
+        with self._lock:
+            audio = self._audios.get(texto)
+            if audio is not None:
+                self._audios.move_to_end(texto)
+                return audio
+        audio = self.motor.sintetizar(texto)
+        with self._lock:
+            self._audios[texto] = audio
+            while len(self._audios) > self.max_entradas:
+                self._audios.popitem(last=False)
+        return audio
+
+    def precalentar(self, frases=FRASES_FRECUENTES):
+        for frase in frases:
+            try:
+                self.obtener(frase)
+            except Exception as e:
+                print(f"Error precalentando voz: {e}")
+
+
+class SalidaAudio:
+    """Salida PyAudio persistente; reproduce en bloques pequeños para poder cortar"""
+
+    def __init__(self):
+        import pyaudio
+        self._pa = pyaudio.PyAudio()
+        self._formato = pyaudio.paInt16
+        self._stream = None
+        self._frecuencia = None
+
+    def reproducir(self, audio, cortar=None):
+        if self._frecuencia != audio.frecuencia:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = self._pa.open(format=self._formato, channels=1,
+                                         rate=audio.frecuencia, output=True)
+            self._frecuencia = audio.frecuencia
+        bloque = audio.frecuencia * MS_BLOQUE_REPRODUCCION // 1000 * 2
+        for i in range(0, len(audio.pcm), bloque):
+            if cortar is not None and cortar():
+                return False
+            self._stream.write(audio.pcm[i:i + bloque])
+        return True
+
+
+class SalidaRemota:
+    """Salida para clientes remotos: envía el PCM por el socket y espera lo que dura.
+
+    Esperar la duración mantiene el significado de ``task_done()`` ("ya ha
+    sonado") y permite cortar igual que con los altavoces.
+    """
+
+    def __init__(self, emitir):
+        self.emitir = emitir
+        self._seq = 0
+
+    def reproducir(self, audio, cortar=None):
+        self._seq += 1
+        self.emitir('tts_audio', {'seq': self._seq, 'frecuencia': audio.frecuencia, 'pcm': audio.pcm})
+        fin = time.monotonic() + audio.duracion
+        while time.monotonic() < fin:
+            if cortar is not None and cortar():
+                self.emitir('tts_cortar', {'seq': self._seq})
+                return False
+            time.sleep(MS_BLOQUE_REPRODUCCION / 1000)
+        return True
+
+
+class VozEnCola:
+    """Consume una cola de frases: sintetiza la siguiente mientras suena la actual.
+
+    Un hilo sintetiza (con cache) hacia una cola de audio corta y otro
+    reproduce, así que entre frases no hay hueco de síntesis. ``task_done()``
+    de la cola de textos se llama al terminar de *sonar* cada frase, de modo
+    que ``cola.join()`` sigue significando "ya ha terminado de hablar".
+    ``interrumpir()`` corta la frase en curso y descarta lo ya sintetizado.
+    ``al_sonar(audio)`` recibe cada frase justo antes de reproducirla (lip-sync).
+    """
+
+    def __init__(self, motor, cola_textos, al_hablar=None, al_callar=None,
+                 cache=None, salida=None, prefetch=2, al_sonar=None):
+        self.cola_textos = cola_textos
+        self.cache = cache or CacheAudio(motor)
+        self.salida = salida or SalidaAudio()
+        self.al_hablar = al_hablar
+        self.al_callar = al_callar
+        self.al_sonar = al_sonar
+        self._cola_audio = queue.Queue(maxsize=prefetch)
+        self._generacion = 0
+
+    def iniciar(self):
+        threading.Thread(target=self._sintetizar, daemon=True, name="tts-sintesis").start()
+        threading.Thread(target=self._reproducir, daemon=True, name="tts-salida").start()
+        return self
+
+    def interrumpir(self):
+        # Lo ya sintetizado pertenece a la generación anterior y se descarta al llegar
+        self._generacion += 1
+
+    def _sintetizar(self):
+        while True:
+            frase = self.cola_textos.get()
+            if frase is None:
+                self._cola_audio.put(None)
+                return
+            generacion = self._generacion
+            try:
+                audio = self.cache.obtener(frase)
+            except Exception as e:
+                print(f"Error voz: {e}")
+                audio = None
+            self._cola_audio.put((generacion, audio))
+
+    def _reproducir(self):
+        while True:
+            item = self._cola_audio.get()
+            if item is None:
+                return
+            generacion, audio = item
+            try:
+                if audio is not None and generacion == self._generacion:
+                    if self.al_hablar:
+                        self.al_hablar()
+                    if self.al_sonar:
+                        self.al_sonar(audio)
+                    self.salida.reproducir(audio, cortar=lambda: generacion != self._generacion)
+            except Exception as e:
+                print(f"Error voz: {e}")
+            finally:
+                self.cola_textos.task_done()
+                if self.cola_textos.unfinished_tasks == 0 and self.al_callar:
+                    self.al_callar()
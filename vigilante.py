@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+INTERVALO = 2.0               # Segundos entre muestras de la pantalla
+PRESUPUESTO_CPU = 0.05        # Fracción de un núcleo que puede gastar el muestreo
+TAMANO_MUESTRA = (64, 36)     # Miniatura en grises con la que se comparan las pantallas
+UMBRAL_PIXEL = 24             # Diferencia de gris (0-255) para contar un píxel como cambiado
+UMBRAL_CAMBIO = 0.03          # Fracción de píxeles cambiados que cuenta como pantalla nueva
+MAX_LINEA_TIEMPO = 10         # Descripciones recientes que se conservan
+
+
+def fraccion_cambiada(a, b, umbral_pixel=UMBRAL_PIXEL):
+    """Fracción de píxeles que difieren más de ``umbral_pixel`` entre dos miniaturas uint8"""
+    return float(np.count_nonzero(np.abs(a.astype(np.int16) - b) > umbral_pixel)) / a.size
+
+
+class Observacion:
+    """Una pantalla descrita por el modelo de visión"""
+    __slots__ = ('instante', 'descripcion', 'url_frame', 'muestra', 'hasta')
+
+    def __init__(self, instante, descripcion, url_frame, muestra):
+        self.instante = instante        # time.time() de la captura
+        self.descripcion = descripcion
+        self.url_frame = url_frame
+        self.muestra = muestra          # Miniatura en grises con la que se detectan cambios
+        self.hasta = None               # time.time() de la última muestra igual antes de un cambio
+
+
+class VigilantePantalla:
+    """Mira la pantalla en segundo plano y la describe solo cuando cambia.
+
+    Cada ``intervalo`` segundos toma una miniatura en grises
+    (``capturador.muestra``) y la compara con la de la última pantalla
+    descrita; si difiere más de ``umbral_cambio`` y ya no se está moviendo
+    (dos muestras seguidas iguales, así un scroll se describe al pararse),
+    captura todos los objetivos y llama a ``describir(capturas)``, que
+    devuelve ``(descripcion, url_frame)``. Las descripciones quedan en una línea de
+    tiempo corta, así que al llegar una pregunta la pantalla actual suele
+    estar ya descrita (``vigente()``), o la que había cuando el usuario
+    empezó a hablar (``en(instante)``). Si muestrear cuesta más de
+    ``presupuesto_cpu`` de un núcleo, el intervalo se alarga.
+    """
+
+    def __init__(self, capturador, describir, intervalo=INTERVALO, presupuesto_cpu=PRESUPUESTO_CPU,
+                 umbral_cambio=UMBRAL_CAMBIO, umbral_pixel=UMBRAL_PIXEL, tamano=TAMANO_MUESTRA,
+                 max_linea=MAX_LINEA_TIEMPO):
+        self.capturador = capturador
+        self.describir = describir
+        self.intervalo = intervalo
+        self.presupuesto_cpu = presupuesto_cpu
+        self.umbral_cambio = umbral_cambio
+        self.umbral_pixel = umbral_pixel
+        self.tamano = tamano
+        self.linea = deque(maxlen=max_linea)
+        self.muestras = 0
+        self.cambios = 0
+        self.descripciones = 0
+        self._cpu = 0.0
+        self._inicio = None
+        self._vigente = False       # La última muestra coincide con la última descripción
+        self._ultima_muestra = 0.0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        self._inicio = time.monotonic()
+        threading.Thread(target=self._bucle, daemon=True, name="vigilante-pantalla").start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+
+    # --- CONSULTA ---
+    def vigente(self, max_edad=None):
+        """Observación de la pantalla actual si ya está descrita (o None)"""
+        max_edad = 2 * self.intervalo if max_edad is None else max_edad
+        with self._lock:
+            if not self._vigente or not self.linea or time.monotonic() - self._ultima_muestra > max_edad:
+                return None
+            return self.linea[-1]
+
+    def en(self, instante, max_edad=None):
+        """Observación que estaba en pantalla en ``instante`` (time.time()), o None si no se sabe.
+
+        Vale la última descrita antes de ``instante`` si la pantalla no había
+        cambiado aún; si sigue sin cambiar, el muestreo tiene que estar al día.
+        """
+        max_edad = 2 * self.intervalo if max_edad is None else max_edad
+        with self._lock:
+            for observacion in reversed(self.linea):
+                if observacion.instante > instante:
+                    continue
+                if observacion.hasta is None:
+                    return observacion if time.monotonic() - self._ultima_muestra <= max_edad else None
+                return observacion if instante <= observacion.hasta else None
+            return None
+
+    def linea_tiempo(self):
+        with self._lock:
+            return [{'instante': o.instante, 'hasta': o.hasta, 'descripcion': o.descripcion,
+                     'frame': o.url_frame} for o in self.linea]
+
+    def estadisticas(self):
+        activo = time.monotonic() - self._inicio if self._inicio else 0.0
+        return {
+            'muestras': self.muestras,
+            'cambios': self.cambios,
+            'descripciones': self.descripciones,
+            'cpu': self._cpu / activo if activo else 0.0,
+            'vigente': self._vigente,
+            'linea_tiempo': self.linea_tiempo(),
+        }
+
+    # --- BUCLE ---
+    def _muestrear(self):
+        return np.asarray(self.capturador.muestra(self.tamano), dtype=np.uint8)
+
+    def _bucle(self):
+        previa = None
+        instante_previa = None
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            cpu = time.thread_time()
+            try:
+                instante = time.time()
+                muestra = self._muestrear()
+                self.muestras += 1
+                with self._lock:
+                    referencia = self.linea[-1].muestra if self.linea else None
+                cambio = referencia is None or \
+                    fraccion_cambiada(muestra, referencia, self.umbral_pixel) > self.umbral_cambio
+                estable = previa is not None and \
+                    fraccion_cambiada(muestra, previa, self.umbral_pixel) <= self.umbral_cambio
+                previa = muestra
+                with self._lock:
+                    # Hasta cuándo se sabe que seguía la pantalla descrita: la última muestra igual
+                    if cambio and self.linea and self.linea[-1].hasta is None:
+                        self.linea[-1].hasta = instante_previa if instante_previa is not None else 0.0
+                    self._vigente = not cambio
+                    self._ultima_muestra = time.monotonic()
+                instante_previa = instante
+                if cambio:
+                    self.cambios += 1
+                if cambio and (estable or referencia is None):
+                    self._describir(muestra)
+            except Exception as e:
+                print(f"Error vigilante: {e}")
+            # Lo que se espera a Ollama no cuenta como CPU; el muestreo y la captura sí
+            coste = time.thread_time() - cpu
+            self._cpu += coste
+            espera = max(self.intervalo, coste / self.presupuesto_cpu) - (time.monotonic() - inicio)
+            self._parar.wait(max(0.0, espera))
+
+    def _describir(self, muestra):
+        instante = time.time()
+        descripcion, url_frame = self.describir(self.capturador.capturar_todas())
+        self.descripciones += 1
+        with self._lock:
+            # Vigente solo cuando la próxima muestra confirme que la pantalla no cambió entretanto
+            self.linea.append(Observacion(instante, descripcion, url_frame, muestra))
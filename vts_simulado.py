@@ -0,0 +1,107 @@
+"""Servidor falso de la API de VTube Studio para probar sin la aplicación.
+
+Responde a la autenticación, acepta ``InjectParameterDataRequest`` (guardando
+cada fotograma recibido) y devuelve ``APIError`` para lo demás. Uso:
+
+    python vts_simulado.py --puerto 8001
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import websockets
+
+
+class ServidorVTSSimulado:
+    def __init__(self, puerto=8001, retardo=0.0):
+        self.puerto = puerto
+        self.retardo = retardo         # Simula lo que tarda VTS en contestar
+        self.fotogramas = []           # (instante, {parametro: valor})
+        self._servidor = None
+
+    async def iniciar(self):
+        self._servidor = await websockets.serve(self._atender, "localhost", self.puerto)
+        return self
+
+    async def detener(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+
+    async def _atender(self, ws, *_):
+        try:
+            async for mensaje in ws:
+                respuesta = self._responder(json.loads(mensaje))
+                if self.retardo:
+                    # Latencia sin serializar: VTS no espera a contestar uno para leer el siguiente
+                    asyncio.create_task(self._contestar_tarde(ws, respuesta))
+                else:
+                    await ws.send(json.dumps(respuesta))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _contestar_tarde(self, ws, respuesta):
+        await asyncio.sleep(self.retardo)
+        try:
+            await ws.send(json.dumps(respuesta))
+        except websockets.ConnectionClosed:
+            pass
+
+    def _responder(self, peticion):
+        tipo = peticion.get("messageType")
+        datos = peticion.get("data") or {}
+        if tipo == "AuthenticationTokenRequest":
+            tipo_resp, resp = "AuthenticationTokenResponse", {"authenticationToken": "token-simulado"}
+        elif tipo == "AuthenticationRequest":
+            tipo_resp, resp = "AuthenticationResponse", {"authenticated": True, "reason": ""}
+        elif tipo == "InjectParameterDataRequest":
+            valores = {p["id"]: p["value"] for p in datos.get("parameterValues", [])}
+            self.fotogramas.append((time.perf_counter(), valores))
+            tipo_resp, resp = "InjectParameterDataResponse", {}
+        else:
+            tipo_resp, resp = "APIError", {"errorID": 0, "message": f"{tipo} no simulado"}
+        return {
+            "apiName": "VTubeStudioPublicAPI",
+            "apiVersion": "1.0",
+            "timestamp": int(time.time() * 1000),
+            "requestID": peticion.get("requestID", ""),
+            "messageType": tipo_resp,
+            "data": resp,
+        }
+
+    def estadisticas(self, desde=0):
+        fotogramas = self.fotogramas[desde:]
+        if len(fotogramas) < 2:
+            return {'mensajes': len(fotogramas)}
+        instantes = np.array([t for t, _ in fotogramas])
+        intervalos = np.diff(instantes)
+        return {
+            'mensajes': len(fotogramas),
+            'parametros_por_mensaje': float(np.mean([len(v) for _, v in fotogramas])),
+            'hz': float(len(intervalos) / (instantes[-1] - instantes[0])),
+            'jitter_ms': float(np.std(intervalos) * 1000),
+        }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--puerto", type=int, default=8001)
+    parser.add_argument("--retardo", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = await ServidorVTSSimulado(args.puerto, args.retardo).iniciar()
+    print(f"VTS simulado en ws://localhost:{args.puerto}")
+    visto = 0
+    while True:
+        await asyncio.sleep(5)
+        if len(servidor.fotogramas) > visto:
+            print(servidor.estadisticas(visto))
+            visto = len(servidor.fotogramas)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass